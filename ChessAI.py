@@ -0,0 +1,282 @@
+#computer opponent
+#negamax alpha-beta with iterative deepening, quiescence search and move ordering
+
+import time
+import ChessTranspositionTable
+from ChessEngine import captureOrder
+from ChessEvaluation import pieceValues
+from ChessTranspositionTable import EXACT,LOWER,UPPER
+
+CHECKMATE=100000
+MAX_PLY=64
+MATE_BOUND=CHECKMATE-MAX_PLY-256  # scores past it are mates, tablebase mates included
+
+'''
+Mate scores count plies from the root; the table stores them relative to the node so they stay valid
+when the position is reached at another ply
+'''
+def scoreToTT(score,ply):
+    if score>=MATE_BOUND:
+        return score+ply
+    if score<=-MATE_BOUND:
+        return score-ply
+    return score
+
+def scoreFromTT(score,ply):
+    if score>=MATE_BOUND:
+        return score-ply
+    if score<=-MATE_BOUND:
+        return score+ply
+    return score
+
+
+class Searcher():
+    '''
+    Initialize the searcher.
+    - timeLimit: seconds per move; the search stops at the first node checked after it runs out
+    - maxDepth: deepest iteration of iterative deepening
+    - info: called with a dict (depth, score, nodes, nps, seconds, pv, tt) after every completed iteration
+    - ttSizeMB: memory for the transposition table (0 disables it); it is kept between searches
+    - stopEvent: a threading.Event that ends the search early when set (checked along with the clock),
+      so a search on another thread can be interrupted
+    - tablebases: a ChessTablebase.Tablebases; positions it covers are scored exactly instead of searched,
+      and a root position it covers is answered without a search
+    '''
+    def __init__(self,timeLimit=1.0,maxDepth=MAX_PLY,info=None,ttSizeMB=16,stopEvent=None,tablebases=None):
+        self.timeLimit=timeLimit
+        self.stopEvent=stopEvent
+        self.tablebases=tablebases
+        self.maxDepth=min(maxDepth,MAX_PLY)
+        self.info=info
+        self.tt=ChessTranspositionTable.TranspositionTable(ttSizeMB) if ttSizeMB>0 else None
+        self.history={}  # (piece, endRow, endCol) -> bonus for quiet moves that caused cutoffs
+        self.newSearch()
+
+    def newSearch(self):
+        self.nodes=0
+        self.stopped=False
+        self.killers=[[None,None] for i in range(MAX_PLY+1)]
+        self.pvTable=[[] for i in range(MAX_PLY+2)]
+        self.bestMove=None
+        self.rootMoveIDs=None
+        self.score=0
+        self.depth=0
+        self.pv=[]
+
+    '''
+    Iterative deepening search of the position. Returns the best move found (None if there are no legal moves).
+    The GameState is left exactly as it was passed in
+    - rootMoveIDs: only search these root moves (by moveID), used to split the root between processes
+    - startDepth: first iteration of iterative deepening
+    - timeLimit: seconds for this search instead of self.timeLimit (float('inf') searches until stopEvent is set)
+    '''
+    def search(self,gs,rootMoveIDs=None,startDepth=1,timeLimit=None):
+        timeLimit=self.timeLimit if timeLimit is None else timeLimit
+        self.newSearch()
+        self.rootMoveIDs=set(rootMoveIDs) if rootMoveIDs else None
+        if self.tt is not None:
+            self.tt.newSearch()
+            self.tt.resetStats()
+        self.startTime=time.perf_counter()
+        self.deadline=self.startTime+timeLimit
+        checkMate,staleMate=gs.checkMate,gs.staleMate
+        rootMoves=gs.getValidMoves()
+        if self.rootMoveIDs is not None:
+            rootMoves=[move for move in rootMoves if move.moveID in self.rootMoveIDs]
+        if len(rootMoves)==0:
+            gs.checkMate,gs.staleMate=checkMate,staleMate
+            return None
+        self.bestMove=rootMoves[0]
+        if self.tablebases is not None and self.rootMoveIDs is None:
+            best=self.tablebases.bestMove(gs)
+            if best is not None:
+                move,wdl,plies=best
+                self.bestMove=move
+                self.pv=[move]
+                self.score=self.tablebaseScore(wdl,plies,0)
+                self.report()
+                gs.checkMate,gs.staleMate=checkMate,staleMate
+                return move
+        for depth in range(min(startDepth,self.maxDepth),self.maxDepth+1):
+            score=self.negamax(gs,depth,-CHECKMATE-1,CHECKMATE+1,0)
+            if self.stopped:
+                break#an unfinished iteration can't be trusted, keep the previous result
+            self.depth=depth
+            self.score=score
+            self.pv=list(self.pvTable[0])
+            if self.pv:
+                self.bestMove=self.pv[0]
+            self.report()
+            if abs(score)>=MATE_BOUND:#mate found, searching deeper won't change the move
+                break
+            if time.perf_counter()-self.startTime>timeLimit/2:#the next iteration would not finish
+                break
+        gs.checkMate,gs.staleMate=checkMate,staleMate
+        return self.bestMove
+
+    '''
+    Search score of a tablebase result at ply
+    '''
+    def tablebaseScore(self,wdl,plies,ply):
+        if wdl==0:
+            return 0
+        return CHECKMATE-ply-plies if wdl>0 else -CHECKMATE+ply+plies
+
+    def report(self):
+        if self.info is None:
+            return
+        seconds=time.perf_counter()-self.startTime
+        self.info({'depth':self.depth,'score':self.score,'nodes':self.nodes,'seconds':seconds,
+                   'nps':self.nodes/seconds if seconds>0 else 0,
+                   'pv':[move.getChessNotation() for move in self.pv],
+                   'tt':self.tt.stats() if self.tt is not None else None})
+
+    '''
+    Stop when the time is up or stopEvent is set. Checked every 1024 nodes to keep the clock off the hot path
+    '''
+    def checkTime(self):
+        if self.nodes&1023==0 and (time.perf_counter()>self.deadline or
+                                   (self.stopEvent is not None and self.stopEvent.is_set())):
+            self.stopped=True
+
+    '''
+    Order moves: hash/previous best move, captures by MVV-LVA, killer moves, then quiet moves by history score
+    '''
+    def orderMoves(self,moves,ply,bestMoveID):
+        killers=self.killers[ply]
+        history=self.history
+        def moveScore(move):
+            if move.moveID==bestMoveID:
+                return 10000000
+            if move.pieceCaptured!='--':
+                return 1000000+pieceValues[move.pieceCaptured[1]]*10-pieceValues[move.pieceMoved[1]]//10
+            if move.isPawnPromotion:
+                return 900000
+            if move==killers[0]:
+                return 800000
+            if move==killers[1]:
+                return 700000
+            return history.get((move.pieceMoved,move.endRow,move.endCol),0)
+        moves.sort(key=moveScore,reverse=True)
+
+    def negamax(self,gs,depth,alpha,beta,ply):
+        self.pvTable[ply]=[]
+        if ply>0 and (gs.halfmoveClock>=100 or gs.repetitionCounts[gs.zobristKey]>=2):
+            return 0#a repetition inside the search is scored as a draw right away
+        if self.tablebases is not None and ply>0 and gs.pieceCount()<=self.tablebases.maxPieces:
+            result=self.tablebases.probe(gs)
+            if result is not None:
+                return self.tablebaseScore(result[0],result[1],ply)
+        if depth<=0 or ply>=MAX_PLY:
+            return self.quiescence(gs,alpha,beta,ply)
+        self.nodes+=1
+        self.checkTime()
+        if self.stopped:
+            return 0
+        key=gs.zobristKey
+        bestMoveID=self.pv[ply].moveID if ply<len(self.pv) else 0
+        if self.tt is not None:
+            entry=self.tt.probe(key)
+            if entry is not None:
+                ttDepth,ttScore,ttBound,ttMoveID=entry
+                if ttMoveID:
+                    bestMoveID=ttMoveID
+                if ply>0 and ttDepth>=depth:#never cut at the root, it has to produce a move and PV
+                    ttScore=scoreFromTT(ttScore,ply)
+                    if ttBound==EXACT:
+                        return ttScore
+                    if ttBound==LOWER and ttScore>=beta:
+                        return beta
+                    if ttBound==UPPER and ttScore<=alpha:
+                        return alpha
+        if ply==0:
+            moves=gs.getValidMoves()
+            if len(moves)==0:
+                return -CHECKMATE if gs.checkMate else 0
+            if self.rootMoveIDs is not None:
+                moves=[move for move in moves if move.moveID in self.rootMoveIDs]
+            self.orderMoves(moves,ply,bestMoveID)
+        else:#staged: the later stages are only generated if no earlier move cuts off
+            moves=gs.getStagedMoves(bestMoveID,self.killers[ply],self.history)
+        bound=UPPER
+        bestMoveID=0
+        searched=0
+        for move in moves:
+            searched+=1
+            gs.makeMove(move)
+            score=-self.negamax(gs,depth-1,-beta,-alpha,ply+1)
+            gs.undoMove()
+            if self.stopped:
+                return 0
+            if score>alpha:
+                alpha=score
+                bound=EXACT
+                bestMoveID=move.moveID
+                self.pvTable[ply]=[move]+self.pvTable[ply+1]
+                if score>=beta:
+                    if move.pieceCaptured=='--':
+                        killers=self.killers[ply]
+                        if move!=killers[0]:
+                            killers[1]=killers[0]
+                            killers[0]=move
+                        historyKey=(move.pieceMoved,move.endRow,move.endCol)
+                        self.history[historyKey]=self.history.get(historyKey,0)+depth*depth
+                    if self.tt is not None:
+                        self.tt.store(key,depth,scoreToTT(beta,ply),LOWER,bestMoveID)
+                    return beta
+        if searched==0:
+            return -CHECKMATE+ply if gs.inCheck() else 0
+        if self.tt is not None:
+            self.tt.store(key,depth,scoreToTT(alpha,ply),bound,bestMoveID)
+        return alpha
+
+    '''
+    Search captures only until the position is quiet, so the evaluation isn't taken in the middle of an exchange
+    '''
+    def quiescence(self,gs,alpha,beta,ply):
+        self.nodes+=1
+        self.checkTime()
+        if self.stopped:
+            return 0
+        inCheck=gs.inCheck()
+        if not inCheck:
+            standPat=gs.evaluate()
+            if standPat>=beta:
+                return beta
+            if standPat>alpha:
+                alpha=standPat
+        if inCheck:#in check every evasion is searched, otherwise only captures and promotions
+            moves=gs.getValidMoves()
+            if len(moves)==0:
+                return -CHECKMATE+ply
+            self.orderMoves(moves,ply,0)
+        else:#a stalemate without captures is not seen here, the stand pat score is kept
+            moves=gs.getValidMoves(quiets=False)
+            moves.sort(key=captureOrder,reverse=True)
+        if ply>=MAX_PLY:
+            return alpha
+        for move in moves:
+            gs.makeMove(move)
+            score=-self.quiescence(gs,-beta,-alpha,ply+1)
+            gs.undoMove()
+            if self.stopped:
+                return 0
+            if score>=beta:
+                return beta
+            if score>alpha:
+                alpha=score
+        return alpha
+
+'''
+Pick a move for the side to move within timeLimit seconds
+'''
+def findBestMove(gs,timeLimit=1.0,info=None,ttSizeMB=16):
+    return Searcher(timeLimit=timeLimit,info=info,ttSizeMB=ttSizeMB).search(gs)
+
+'''
+Print the search progress of one iteration
+'''
+def printInfo(info):
+    tt=info.get('tt')
+    print('depth %d  score %d  nodes %d  nps %.0f  time %.2fs%s  pv %s'%(info['depth'],info['score'],info['nodes'],
+          info['nps'],info['seconds'],'  tt hits %.0f%%'%(tt['hitRate']*100) if tt else '',' '.join(info['pv'])))
@@ -0,0 +1,252 @@
+#batch position encoding for dataset generation (needs NumPy)
+#many positions are packed into one array and evaluated, attacked and counted with whole-array operations
+#instead of walking GameState.board square by square
+
+import re
+import numpy as np
+import ChessEngine
+import ChessEvaluation
+
+PLANE_PIECES=('wp','wN','wB','wR','wQ','wK','bp','bN','bB','bR','bQ','bK')
+PLANE_INDEX={piece:i for i,piece in enumerate(PLANE_PIECES)}
+FEN_INDEX={ch:PLANE_INDEX[piece] for ch,piece in ChessEngine.fenPieces.items()}
+SIDE_PLANE=12  # all ones when White is to move
+CASTLING_PLANES=(13,14,15,16)  # white kingside, white queenside, black kingside, black queenside; all ones if allowed
+ENPASSANT_PLANE=17  # one-hot on the en passant target square
+NUM_PLANES=18
+
+FEN_CHARS='1PNBRQKpnbrqk'
+
+'''
+Evaluation weights per plane, negative for Black (the numbers GameState.evaluate keeps running totals of)
+'''
+MATERIAL_WEIGHTS=np.array([ChessEvaluation.MATERIAL[piece] for piece in PLANE_PIECES],dtype=np.int32)
+MIDGAME_WEIGHTS=np.array([ChessEvaluation.MIDGAME[piece] for piece in PLANE_PIECES],dtype=np.int32)
+ENDGAME_WEIGHTS=np.array([ChessEvaluation.ENDGAME[piece] for piece in PLANE_PIECES],dtype=np.int32)
+PHASE_WEIGHTS=np.array([ChessEvaluation.PHASE[piece] for piece in PLANE_PIECES],dtype=np.int32)
+
+FILE_MASKS={dc:np.uint64(sum(1<<(r*8+c) for r in range(8) for c in range(8) if 0<=c-dc<8)) for dc in range(-2,3)}
+RANK_3=np.uint64(0xff<<40)
+RANK_6=np.uint64(0xff<<16)
+
+'''
+Move every square of a uint64 board array by (dr, dc); squares pushed off the board are dropped
+'''
+def shiftBitboard(b,dr,dc):
+    amount=dr*8+dc
+    b=b<<np.uint64(amount) if amount>0 else b>>np.uint64(-amount)
+    return b&FILE_MASKS[dc]
+
+'''
+Number of set bits of every board in a uint64 array
+'''
+def popcount(b):
+    return np.unpackbits(b.view(np.uint8).reshape(len(b),8),axis=1).sum(axis=1,dtype=np.int32)
+
+
+class PositionBatch():
+    '''
+    Initialize a batch of N positions.
+    - planes: uint8 array N x NUM_PLANES x 8 x 8; planes 0-11 are the pieces in PLANE_PIECES order
+      (row 0 is the 8th rank, like GameState.board), then the side to move, castling and en passant planes
+    - clocks: int32 array N x 2 of halfmove clock and fullmove number
+    '''
+    def __init__(self,planes,clocks):
+        self.planes=planes
+        self.clocks=clocks
+
+    def __len__(self):
+        return len(self.planes)
+
+    '''
+    Encode a list of GameStates
+    '''
+    @classmethod
+    def fromStates(cls,states):
+        n=len(states)
+        planes=np.zeros((n,NUM_PLANES,8,8),dtype=np.uint8)
+        clocks=np.zeros((n,2),dtype=np.int32)
+        index,plane,rows,cols=[],[],[],[]
+        flags=np.zeros((n,5),dtype=np.uint8)
+        for i,gs in enumerate(states):
+            board=gs.board
+            for color in 'wb':
+                for r,c in gs.pieceLocations[color]:
+                    index.append(i)
+                    plane.append(PLANE_INDEX[board[r][c]])
+                    rows.append(r)
+                    cols.append(c)
+            rights=gs.currentCastlingRight
+            flags[i]=(gs.whiteToMove,rights.wks,rights.wqs,rights.bks,rights.bqs)
+            if gs.enpassantPossible:
+                planes[i,ENPASSANT_PLANE,gs.enpassantPossible[0],gs.enpassantPossible[1]]=1
+            clocks[i]=(gs.halfmoveClock,gs.fullmoveNumber)
+        planes[index,plane,rows,cols]=1
+        planes[:,SIDE_PLANE:ENPASSANT_PLANE]=flags[:,:,None,None]
+        return cls(planes,clocks)
+
+    '''
+    Encode a list of FEN strings directly, without building GameStates
+    '''
+    @classmethod
+    def fromFens(cls,fens):
+        n=len(fens)
+        planes=np.zeros((n,NUM_PLANES,8,8),dtype=np.uint8)
+        clocks=np.zeros((n,2),dtype=np.int32)
+        index,plane,rows,cols=[],[],[],[]
+        flags=np.zeros((n,5),dtype=np.uint8)
+        for i,fen in enumerate(fens):
+            fields=fen.split()
+            r,c=0,0
+            for ch in fields[0]:
+                if ch=='/':
+                    r,c=r+1,0
+                elif ch.isdigit():
+                    c+=int(ch)
+                else:
+                    index.append(i)
+                    plane.append(FEN_INDEX[ch])
+                    rows.append(r)
+                    cols.append(c)
+                    c+=1
+            castling=fields[2]
+            flags[i]=(fields[1]=='w','K' in castling,'Q' in castling,'k' in castling,'q' in castling)
+            if fields[3]!='-':
+                planes[i,ENPASSANT_PLANE,ChessEngine.Move.ranksToRows[fields[3][1]],ChessEngine.Move.filesToCols[fields[3][0]]]=1
+            clocks[i]=(int(fields[4]) if len(fields)>4 else 0,int(fields[5]) if len(fields)>5 else 1)
+        planes[index,plane,rows,cols]=1
+        planes[:,SIDE_PLANE:ENPASSANT_PLANE]=flags[:,:,None,None]
+        return cls(planes,clocks)
+
+    '''
+    Decode every position back to a FEN string
+    '''
+    def toFens(self):
+        squares=(self.planes[:,:12]*np.arange(1,13,dtype=np.uint8)[None,:,None,None]).sum(axis=1,dtype=np.uint8)
+        rowBytes=squares.reshape(len(self),64).tobytes()
+        rowFens={}  # the same rows keep coming up, so each is written out once
+        whiteToMove=self.planes[:,SIDE_PLANE,0,0]
+        castling=self.planes[:,CASTLING_PLANES[0]:ENPASSANT_PLANE,0,0]
+        epIndex,epRow,epCol=np.nonzero(self.planes[:,ENPASSANT_PLANE])
+        enpassant=['-']*len(self)
+        for i,r,c in zip(epIndex,epRow,epCol):
+            enpassant[i]=ChessEngine.Move.colsToFiles[c]+ChessEngine.Move.rowsToRanks[r]
+        fens=[]
+        for i in range(len(self)):
+            ranks=[]
+            for start in range(i*64,i*64+64,8):
+                row=rowBytes[start:start+8]
+                rank=rowFens.get(row)
+                if rank is None:
+                    rank=rowFens[row]=re.sub('1+',lambda m:str(len(m.group(0))),''.join(FEN_CHARS[square] for square in row))
+                ranks.append(rank)
+            rights=''.join(flag for flag,allowed in zip('KQkq',castling[i]) if allowed) or '-'
+            fens.append('%s %s %s %s %d %d'%('/'.join(ranks),'w' if whiteToMove[i] else 'b',rights,enpassant[i],
+                                           self.clocks[i,0],self.clocks[i,1]))
+        return fens
+
+    '''
+    Decode every position back to a GameState
+    '''
+    def toStates(self,stateClass=ChessEngine.GameState):
+        return [stateClass(fen=fen) for fen in self.toFens()]
+
+    def whiteToMove(self):
+        return self.planes[:,SIDE_PLANE,0,0].astype(bool)
+
+    '''
+    Material balance (White minus Black) of every position, int32 array N
+    '''
+    def material(self):
+        return self.planes[:,:12].sum(axis=(2,3),dtype=np.int32)@MATERIAL_WEIGHTS
+
+    '''
+    Middlegame and endgame piece-square scores (White minus Black) of every position, two int32 arrays N
+    '''
+    def pstScores(self):
+        pieces=self.planes[:,:12].reshape(len(self),12*64).astype(np.int32)
+        return pieces@MIDGAME_WEIGHTS.reshape(-1),pieces@ENDGAME_WEIGHTS.reshape(-1)
+
+    '''
+    Game phase of every position, from ChessEvaluation.TOTAL_PHASE (all pieces on) down to 0
+    '''
+    def phase(self):
+        return np.minimum(self.planes[:,:12].sum(axis=(2,3),dtype=np.int32)@PHASE_WEIGHTS,ChessEvaluation.TOTAL_PHASE)
+
+    '''
+    Static evaluation from the side to move's point of view, equal to GameState.evaluate for each position
+    '''
+    def evaluate(self):
+        midgame,endgame=self.pstScores()
+        phase=self.phase()
+        score=self.material()+(midgame*phase+endgame*(ChessEvaluation.TOTAL_PHASE-phase))//ChessEvaluation.TOTAL_PHASE
+        return np.where(self.whiteToMove(),score,-score)
+
+    '''
+    Every piece plane as a 64-bit board per position: uint64 N x 12, bit r*8+c is the square r, c
+    '''
+    def bitboards(self):
+        bits=np.packbits(self.planes[:,:12].reshape(len(self),12,64),axis=2,bitorder='little')
+        return bits.view('<u8').reshape(len(self),12)
+
+    '''
+    Attacks of one colour as lists of uint64 N boards, one per pawn capture direction and one per
+    piece move offset or slider direction. No square is attacked twice within one board, so summing
+    their bits gives attack counts. Sliders stop at the first occupied square, which is counted
+    '''
+    def colorAttacks(self,color,boards):
+        empty=~np.bitwise_or.reduce(boards,axis=1)
+        first=0 if color=='w' else 6
+        pawns,knights,bishops,rooks,queens,kings=(boards[:,first+i] for i in range(6))
+        forward=-1 if color=='w' else 1
+        pawnAttacks=[shiftBitboard(pawns,forward,-1),shiftBitboard(pawns,forward,1)]
+        pieceAttacks=[shiftBitboard(knights,dr,dc) for dr,dc in ChessEngine.KNIGHT_DIRECTIONS]
+        pieceAttacks+=[shiftBitboard(kings,dr,dc) for dr,dc in ChessEngine.KING_DIRECTIONS]
+        for directions,sliders in ((ChessEngine.ROOK_DIRECTIONS,rooks|queens),(ChessEngine.BISHOP_DIRECTIONS,bishops|queens)):
+            for dr,dc in directions:
+                attacked=ray=shiftBitboard(sliders,dr,dc)
+                for step in range(6):
+                    ray=shiftBitboard(ray&empty,dr,dc)
+                    attacked=attacked|ray
+                pieceAttacks.append(attacked)
+        return pawnAttacks,pieceAttacks
+
+    '''
+    Attack planes: uint8 N x 2 x 8 x 8, the number of white (0) and black (1) pieces attacking each square,
+    the same counts an AttackMap keeps
+    '''
+    def attacks(self):
+        boards=self.bitboards()
+        planes=np.zeros((len(self),2,64),dtype=np.uint8)
+        for i,color in enumerate('wb'):
+            pawnAttacks,pieceAttacks=self.colorAttacks(color,boards)
+            for attacked in pawnAttacks+pieceAttacks:
+                planes[:,i]+=np.unpackbits(attacked.view(np.uint8).reshape(len(self),8),axis=1,bitorder='little')
+        return planes.reshape(len(self),2,8,8)
+
+    '''
+    Pseudo-legal move counts (pins, checks and castling ignored) of White (0) and Black (1): int32 N x 2.
+    For the side to move this is len(gs.getAllPossibleMoves()); en passant only counts for the side to move
+    '''
+    def mobility(self):
+        boards=self.bitboards()
+        white=np.bitwise_or.reduce(boards[:,:6],axis=1)
+        black=np.bitwise_or.reduce(boards[:,6:],axis=1)
+        empty=~(white|black)
+        whiteToMove=self.whiteToMove()
+        enpassant=np.packbits(self.planes[:,ENPASSANT_PLANE].reshape(len(self),64),axis=1,bitorder='little')
+        enpassant=enpassant.view('<u8').reshape(len(self))
+        result=np.zeros((len(self),2),dtype=np.int32)
+        for i,(color,own,enemy,rank) in enumerate((('w',white,black,RANK_3),('b',black,white,RANK_6))):
+            pawnAttacks,pieceAttacks=self.colorAttacks(color,boards)
+            forward=-1 if color=='w' else 1
+            single=shiftBitboard(boards[:,0 if color=='w' else 6],forward,0)&empty
+            double=shiftBitboard(single&rank,forward,0)&empty
+            targets=enemy|np.where(whiteToMove if color=='w' else ~whiteToMove,enpassant,np.uint64(0))
+            counts=popcount(single)+popcount(double)
+            for attacked in pawnAttacks:
+                counts+=popcount(attacked&targets)
+            for attacked in pieceAttacks:
+                counts+=popcount(attacked&~own)
+            result[:,i]=counts
+        return result
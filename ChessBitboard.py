@@ -0,0 +1,544 @@
+#bitboard backend for GameState
+#one 64-bit int per piece type and colour, square index = row*8+col (a8=0, h1=63)
+
+import ChessEngine
+
+'''
+Precomputed attack tables
+'''
+def squareBit(r,c):
+    return 1<<(r*8+c)
+
+def buildStepAttacks(directions):
+    table=[]
+    for sq in range(64):
+        r,c=divmod(sq,8)
+        attacks=0
+        for dr,dc in directions:
+            if 0<=r+dr<8 and 0<=c+dc<8:
+                attacks|=squareBit(r+dr,c+dc)
+        table.append(attacks)
+    return table
+
+KNIGHT_ATTACKS=buildStepAttacks(ChessEngine.KNIGHT_DIRECTIONS)
+KING_ATTACKS=buildStepAttacks(ChessEngine.KING_DIRECTIONS)
+PAWN_ATTACKS={'w':buildStepAttacks(((-1,-1),(-1,1))),'b':buildStepAttacks(((1,-1),(1,1)))}
+
+#ray directions; the first four grow the square index (nearest blocker is the lowest bit), the rest shrink it
+RAY_DIRECTIONS=((1,0),(0,1),(1,1),(1,-1),(-1,0),(0,-1),(-1,-1),(-1,1))
+RAYS=[]
+for dr,dc in RAY_DIRECTIONS:
+    rays=[]
+    for sq in range(64):
+        r,c=divmod(sq,8)
+        ray=0
+        nr,nc=r+dr,c+dc
+        while 0<=nr<8 and 0<=nc<8:
+            ray|=squareBit(nr,nc)
+            nr,nc=nr+dr,nc+dc
+        rays.append(ray)
+    RAYS.append(rays)
+ROOK_RAYS=(0,1,4,5)
+BISHOP_RAYS=(2,3,6,7)
+ROOK_LINES=[RAYS[0][sq]|RAYS[1][sq]|RAYS[4][sq]|RAYS[5][sq] for sq in range(64)]
+BISHOP_LINES=[RAYS[2][sq]|RAYS[3][sq]|RAYS[6][sq]|RAYS[7][sq] for sq in range(64)]
+
+#squares strictly between two squares on a common line, 0 otherwise
+BETWEEN=[[0]*64 for i in range(64)]
+for a in range(64):
+    for rays in RAYS:
+        ray=rays[a]
+        while ray:
+            b=(ray&-ray).bit_length()-1
+            BETWEEN[a][b]=rays[a]&~rays[b]&~(1<<b)
+            ray&=ray-1
+
+SQUARES=[divmod(sq,8) for sq in range(64)]
+
+MOVE_CACHE=ChessEngine.Move.cache
+
+'''
+The shared Move from square index start to end for the pieces in the mailbox, from the same cache as
+Move.interned (the first time, the Move is built from a board view of the mailbox)
+'''
+def internedMove(start,end,mailbox,isEnpassantMove=False,isCastleMove=False):
+    startSq,endSq=SQUARES[start],SQUARES[end]
+    move=MOVE_CACHE.get((startSq,endSq,mailbox[start],mailbox[end],isEnpassantMove,isCastleMove))
+    if move is None:
+        board=[mailbox[i:i+8] for i in range(0,64,8)]
+        move=ChessEngine.Move.interned(startSq,endSq,board,isEnpassantMove,isCastleMove)
+    return move
+
+'''
+Square indexes of the set bits, lowest first
+'''
+def bitSquares(bits):
+    squares=[]
+    while bits:
+        bit=bits&-bits
+        bits^=bit
+        squares.append(bit.bit_length()-1)
+    return squares
+
+'''
+Sliding attacks from sq given the occupancy, classical ray lookup
+'''
+def slidingAttacks(sq,occupied,directions):
+    attacks=0
+    for d in directions:
+        ray=RAYS[d][sq]
+        blockers=ray&occupied
+        if blockers:
+            if d<4:
+                blocker=(blockers&-blockers).bit_length()-1
+            else:
+                blocker=blockers.bit_length()-1
+            ray^=RAYS[d][blocker]
+        attacks|=ray
+    return attacks
+
+def rookAttacks(sq,occupied):
+    return slidingAttacks(sq,occupied,ROOK_RAYS)
+
+def bishopAttacks(sq,occupied):
+    return slidingAttacks(sq,occupied,BISHOP_RAYS)
+
+
+#castling rights as bits, in the order of GameState.castlingZobrist: 1 white kingside, 2 white queenside,
+#4 black kingside, 8 black queenside. A move from or to a king or rook starting square keeps only the rights
+#of CASTLING_KEPT on that square
+CASTLING_BITS=(('wks',1),('wqs',2),('bks',4),('bqs',8))
+CASTLING_KEPT=[15]*64
+CASTLING_KEPT[7*8+4]=15^3
+CASTLING_KEPT[7*8+7]=15^1
+CASTLING_KEPT[7*8+0]=15^2
+CASTLING_KEPT[0*8+4]=15^12
+CASTLING_KEPT[0*8+7]=15^4
+CASTLING_KEPT[0*8+0]=15^8
+
+ZOBRIST_CASTLING=ChessEngine.ZOBRIST_CASTLING
+ZOBRIST_BLACK_TO_MOVE=ChessEngine.ZOBRIST_BLACK_TO_MOVE
+ZOBRIST_SQUARES={piece:[key for row in rows for key in row] for piece,rows in ChessEngine.ZOBRIST_PIECES.items()}
+
+class BitboardGameState(ChessEngine.GameState):
+    '''
+    Initialize the game state with a bitboard backend.
+    - Same API as GameState (makeMove, undoMove, getValidMoves, ...), so it can stand in for it anywhere.
+    - bitboards: piece ('wp', 'bK', ...) -> 64-bit int
+    - occupied: 'w'/'b' -> 64-bit int of all pieces of that colour
+    - mailbox: the piece on every square (index row*8+col), which a generated Move records
+    - castling: the castling rights as CASTLING_BITS
+    - undoLog: (castling, enpassantPossible, halfmoveClock) before every move in moveLog
+    The bitboards and mailbox are the position: move generation, makeMove and undoMove use nothing else.
+    board, pieceLocations and currentCastlingRight are built from them when first read after a move (for
+    ChessMain.drawPieces, getFen, ...) and must not be modified in place
+    '''
+    def __init__(self,checkConsistency=False,fen=None):
+        ChessEngine.GameState.__init__(self,checkConsistency=checkConsistency,fen=fen)
+        self.undoLog=[]
+
+    '''
+    Build a BitboardGameState holding the same position as a GameState
+    '''
+    @classmethod
+    def fromGameState(cls,gs):
+        return cls(checkConsistency=gs.checkConsistency,fen=gs.getFen())
+
+    def loadFen(self,fen):
+        ChessEngine.GameState.loadFen(self,fen)
+        self.undoLog=[]
+
+    def copy(self):
+        gs=ChessEngine.GameState.copy(self)
+        gs.undoLog=[]
+        return gs
+
+    @property
+    def board(self):
+        if self.boardView is None:
+            mailbox=self.mailbox
+            self.boardView=[mailbox[i:i+8] for i in range(0,64,8)]
+        return self.boardView
+
+    @board.setter
+    def board(self,board):
+        self.mailbox=[piece for row in board for piece in row]
+        self.boardView=None
+        self.locationsView=None
+        self.rebuildBitboards()
+
+    @property
+    def pieceLocations(self):
+        if self.locationsView is None:
+            self.locationsView={color:{SQUARES[sq] for sq in bitSquares(self.occupied[color])} for color in 'wb'}
+        return self.locationsView
+
+    @pieceLocations.setter
+    def pieceLocations(self,locations):#they follow from the bitboards, an assignment only drops the cached view
+        self.locationsView=None
+
+    def rebuildPieceLocations(self):
+        self.locationsView=None
+
+    @property
+    def currentCastlingRight(self):
+        castling=self.castling
+        return ChessEngine.CastleRights(bool(castling&1),bool(castling&4),bool(castling&2),bool(castling&8))
+
+    @currentCastlingRight.setter
+    def currentCastlingRight(self,rights):
+        self.castling=sum(bit for name,bit in CASTLING_BITS if getattr(rights,name))
+
+    '''
+    Recompute every bitboard from the mailbox
+    '''
+    def rebuildBitboards(self):
+        self.bitboards={color+kind:0 for color in 'wb' for kind in 'pRNBQK'}
+        self.occupied={'w':0,'b':0}
+        for sq,piece in enumerate(self.mailbox):
+            if piece!='--':
+                self.bitboards[piece]|=1<<sq
+                self.occupied[piece[0]]|=1<<sq
+
+    '''
+    Raise if the bitboards disagree with the mailbox (used by the checkConsistency mode)
+    '''
+    def verifyBitboards(self):
+        bitboards,occupied=self.bitboards,self.occupied
+        self.rebuildBitboards()
+        if (bitboards,occupied)!=(self.bitboards,self.occupied):
+            raise RuntimeError('bitboards out of sync with the mailbox after '+
+                               (self.moveLog[-1].getChessNotation() if self.moveLog else 'setup'))
+
+    def pieceAt(self,r,c):
+        return self.mailbox[r*8+c]
+
+    def pieces(self):
+        mailbox=self.mailbox
+        return [(mailbox[sq],)+SQUARES[sq] for color in 'wb' for sq in bitSquares(self.occupied[color])]
+
+    def pieceCount(self):
+        return (self.occupied['w']|self.occupied['b']).bit_count()
+
+    def castlingZobrist(self):
+        return ZOBRIST_CASTLING[self.castling]
+
+    def enpassantZobrist(self):
+        if not self.enpassantPossible:
+            return 0
+        r,c=self.enpassantPossible
+        ally,enemy=('w','b') if self.whiteToMove else ('b','w')
+        if PAWN_ATTACKS[enemy][r*8+c]&self.bitboards[ally+'p']:
+            return ChessEngine.ZOBRIST_ENPASSANT[c]
+        return 0
+
+    '''
+    Make a move on the bitboards and mailbox, with the same key, evaluation, clock and rights updates as
+    GameState.makeMove. The rights, en passant square and clock it replaces go on undoLog together
+    '''
+    def makeMove(self,move):
+        bitboards,occupied,mailbox=self.bitboards,self.occupied,self.mailbox
+        moved=move.pieceMoved
+        color=moved[0]
+        start=move.startRow*8+move.startCol
+        end=move.endRow*8+move.endCol
+        #take out the old castling rights and en passant file, put the new ones back in at the end
+        key=self.zobristKey^ZOBRIST_CASTLING[self.castling]^ZOBRIST_BLACK_TO_MOVE
+        if self.enpassantPossible:
+            key^=self.enpassantZobrist()
+        placed=color+'Q' if move.isPawnPromotion else moved
+        key^=ZOBRIST_SQUARES[moved][start]^ZOBRIST_SQUARES[placed][end]
+        self.updateEvaluation(move)
+        bitboards[moved]^=1<<start
+        bitboards[placed]^=1<<end
+        occupied[color]^=(1<<start)|(1<<end)
+        captured=move.pieceCaptured
+        if captured!='--':
+            capturedSq=move.startRow*8+move.endCol if move.isEnpassantMove else end
+            bitboards[captured]^=1<<capturedSq
+            occupied[captured[0]]^=1<<capturedSq
+            mailbox[capturedSq]='--'
+            key^=ZOBRIST_SQUARES[captured][capturedSq]
+        mailbox[start]='--'
+        mailbox[end]=placed
+        if move.isCastleMove:
+            rookStart,rookEnd=(end+1,end-1) if end>start else (end-2,end+1)
+            rook=color+'R'
+            rookBits=(1<<rookStart)|(1<<rookEnd)
+            bitboards[rook]^=rookBits
+            occupied[color]^=rookBits
+            mailbox[rookStart]='--'
+            mailbox[rookEnd]=rook
+            key^=ZOBRIST_SQUARES[rook][rookStart]^ZOBRIST_SQUARES[rook][rookEnd]
+        if placed[1]=='K':
+            if color=='w':
+                self.whiteKingLocation=(move.endRow,move.endCol)
+            else:
+                self.blackKingLocation=(move.endRow,move.endCol)
+        self.undoLog.append((self.castling,self.enpassantPossible,self.halfmoveClock))
+        self.castling&=CASTLING_KEPT[start]&CASTLING_KEPT[end]
+        if moved[1]=='p':
+            self.enpassantPossible=((move.startRow+move.endRow)//2,move.startCol) if abs(end-start)==16 else ()
+            self.halfmoveClock=0
+        else:
+            self.enpassantPossible=()
+            self.halfmoveClock=0 if captured!='--' else self.halfmoveClock+1
+        self.moveLog.append(move)
+        self.whiteToMove=not self.whiteToMove
+        if self.whiteToMove:
+            self.fullmoveNumber+=1
+        key^=ZOBRIST_CASTLING[self.castling]
+        if self.enpassantPossible:
+            key^=self.enpassantZobrist()
+        self.zobristKey=key
+        self.zobristLog.append(key)
+        self.repetitionCounts[key]=self.repetitionCounts.get(key,0)+1
+        self.boardView=self.locationsView=None
+        if self.checkConsistency:
+            self.verifyBitboards()
+            self.verifyEvaluation()
+
+    def undoMove(self):
+        if len(self.moveLog)!=0:
+            bitboards,occupied,mailbox=self.bitboards,self.occupied,self.mailbox
+            move=self.moveLog.pop()
+            moved=move.pieceMoved
+            color=moved[0]
+            start=move.startRow*8+move.startCol
+            end=move.endRow*8+move.endCol
+            placed=mailbox[end]
+            bitboards[moved]^=1<<start
+            bitboards[placed]^=1<<end
+            occupied[color]^=(1<<start)|(1<<end)
+            mailbox[start]=moved
+            mailbox[end]='--'
+            captured=move.pieceCaptured
+            if captured!='--':
+                capturedSq=move.startRow*8+move.endCol if move.isEnpassantMove else end
+                bitboards[captured]^=1<<capturedSq
+                occupied[captured[0]]^=1<<capturedSq
+                mailbox[capturedSq]=captured
+            if move.isCastleMove:
+                rookStart,rookEnd=(end+1,end-1) if end>start else (end-2,end+1)
+                rook=color+'R'
+                rookBits=(1<<rookStart)|(1<<rookEnd)
+                bitboards[rook]^=rookBits
+                occupied[color]^=rookBits
+                mailbox[rookStart]=rook
+                mailbox[rookEnd]='--'
+            if moved[1]=='K':
+                if color=='w':
+                    self.whiteKingLocation=(move.startRow,move.startCol)
+                else:
+                    self.blackKingLocation=(move.startRow,move.startCol)
+            self.whiteToMove=not self.whiteToMove
+            if not self.whiteToMove:
+                self.fullmoveNumber-=1
+            self.castling,self.enpassantPossible,self.halfmoveClock=self.undoLog.pop()
+            key=self.zobristLog.pop()
+            if self.repetitionCounts[key]==1:
+                del self.repetitionCounts[key]
+            else:
+                self.repetitionCounts[key]-=1
+            self.zobristKey=self.zobristLog[-1]
+            self.material,self.midgameScore,self.endgameScore,self.phase=self.evaluationLog.pop()
+            self.boardView=self.locationsView=None
+            if self.checkConsistency:
+                self.verifyBitboards()
+                self.verifyEvaluation()
+
+    '''
+    Bitboard of the pieces of the given colour attacking sq
+    '''
+    def attackersTo(self,sq,occupied,color):
+        bitboards=self.bitboards
+        queens=bitboards[color+'Q']
+        return ((PAWN_ATTACKS['b' if color=='w' else 'w'][sq]&bitboards[color+'p'])
+                |(KNIGHT_ATTACKS[sq]&bitboards[color+'N'])
+                |(KING_ATTACKS[sq]&bitboards[color+'K'])
+                |(rookAttacks(sq,occupied)&(bitboards[color+'R']|queens))
+                |(bishopAttacks(sq,occupied)&(bitboards[color+'B']|queens)))
+
+    def squareAttackedBy(self,r,c,color):
+        return self.attackersTo(r*8+c,self.occupied['w']|self.occupied['b'],color)!=0
+
+    def squareUnderAttack(self,r,c):
+        return self.squareAttackedBy(r,c,'b' if self.whiteToMove else 'w')
+
+    '''
+    The king is taken out of the occupancy so it can't shield a square behind it on a checking ray
+    '''
+    def squareAttackedAfterKingMove(self,r,c):
+        ally,enemy=('w','b') if self.whiteToMove else ('b','w')
+        occupied=(self.occupied['w']|self.occupied['b'])^self.bitboards[ally+'K']
+        return self.attackersTo(r*8+c,occupied,enemy)!=0
+
+    def inCheck(self):
+        ally,enemy=('w','b') if self.whiteToMove else ('b','w')
+        return self.attackersTo(self.bitboards[ally+'K'].bit_length()-1,self.occupied['w']|self.occupied['b'],enemy)!=0
+
+    '''
+    All moves considering checks (see generateMoves)
+    - captures / quiets: generate only the captures and promotions or only the other moves, by masking
+      the target squares (the checkmate/stalemate flags are only updated when both are generated)
+    '''
+    def getValidMoves(self,captures=True,quiets=True):
+        moves,checkers=self.generateMoves(captures,quiets,~0)
+        if not (captures and quiets):
+            return moves
+        if len(moves)==0:
+            if checkers:
+                self.checkMate=True
+            else:
+                self.staleMate=True
+        else:
+            self.checkMate=False
+            self.staleMate=False
+        return moves
+
+    '''
+    Legal moves of the piece on r, c only (used to check a hash or killer move is playable)
+    '''
+    def getValidMovesFrom(self,r,c):
+        return self.generateMoves(True,True,1<<(r*8+c))[0]
+
+    '''
+    Legal moves of the pieces in fromMask. Returns (moves, bitboard of the pieces giving check).
+    Checkers and pinned pieces come from rays out of the king; pinned pieces are limited to their pin line
+    and, in check, all other moves to the squares that capture or block the checker
+    '''
+    def generateMoves(self,captures,quiets,fromMask):
+        ally,enemy=('w','b') if self.whiteToMove else ('b','w')
+        bitboards=self.bitboards
+        own,their=self.occupied[ally],self.occupied[enemy]
+        occupied=own|their
+        stageMask=(their if captures else 0)|(~occupied if quiets else 0)
+        kingSq=bitboards[ally+'K'].bit_length()-1
+        checkers=self.attackersTo(kingSq,occupied,enemy)
+        moves=[]
+
+        if checkers&(checkers-1)==0:#at most one checker, pieces other than the king may move
+            if checkers:
+                checkSq=checkers.bit_length()-1
+                targetMask=checkers|BETWEEN[kingSq][checkSq]
+            else:
+                targetMask=~own
+            pinLines={}
+            enemyQueens=bitboards[enemy+'Q']
+            snipers=((ROOK_LINES[kingSq]&(bitboards[enemy+'R']|enemyQueens))
+                     |(BISHOP_LINES[kingSq]&(bitboards[enemy+'B']|enemyQueens)))
+            while snipers:
+                sniper=snipers&-snipers
+                snipers^=sniper
+                between=BETWEEN[kingSq][sniper.bit_length()-1]
+                blockers=between&occupied
+                if blockers and blockers&(blockers-1)==0 and blockers&own:
+                    pinLines[blockers.bit_length()-1]=between|sniper
+            if bitboards[ally+'p']&fromMask:
+                self.getPawnBitboardMoves(ally,enemy,kingSq,occupied,their,targetMask,pinLines,moves,captures,quiets,fromMask)
+            for kind,attacks in (('N',None),('B',BISHOP_RAYS),('R',ROOK_RAYS),('Q',None)):
+                pieces=bitboards[ally+kind]&fromMask
+                while pieces:
+                    piece=pieces&-pieces
+                    pieces^=piece
+                    sq=piece.bit_length()-1
+                    if kind=='N':
+                        if sq in pinLines:
+                            continue
+                        targets=KNIGHT_ATTACKS[sq]
+                    elif kind=='Q':
+                        targets=rookAttacks(sq,occupied)|bishopAttacks(sq,occupied)
+                    else:
+                        targets=slidingAttacks(sq,occupied,attacks)
+                    targets&=~own&targetMask&stageMask
+                    if sq in pinLines:
+                        targets&=pinLines[sq]
+                    self.addBitboardMoves(sq,targets,moves)
+
+        kingBit=1<<kingSq
+        if not kingBit&fromMask:
+            return moves,checkers
+        #king moves, tested with the king off the board so it can't shield a square behind it
+        targets=KING_ATTACKS[kingSq]&~own&stageMask
+        withoutKing=occupied^kingBit
+        while targets:
+            target=targets&-targets
+            targets^=target
+            sq=target.bit_length()-1
+            if not self.attackersTo(sq,withoutKing,enemy):
+                moves.append(internedMove(kingSq,sq,self.mailbox))
+
+        if not checkers and quiets:
+            self.getCastleBitboardMoves(ally,enemy,kingSq,occupied,moves)
+        return moves,checkers
+
+    '''
+    Add a move from sq to every square in targets
+    '''
+    def addBitboardMoves(self,sq,targets,moves):
+        start=SQUARES[sq]
+        mailbox=self.mailbox
+        moved=mailbox[sq]
+        cache=MOVE_CACHE
+        while targets:
+            target=targets&-targets
+            targets^=target
+            end=target.bit_length()-1
+            move=cache.get((start,SQUARES[end],moved,mailbox[end],False,False))
+            if move is None:
+                move=internedMove(sq,end,mailbox)
+            moves.append(move)
+
+    '''
+    Pawn pushes, captures and en passant for the side to move.
+    A push to the last rank is a promotion and belongs to the captures stage, the other pushes to the quiets
+    '''
+    def getPawnBitboardMoves(self,ally,enemy,kingSq,occupied,their,targetMask,pinLines,moves,captures=True,quiets=True,fromMask=~0):
+        mailbox=self.mailbox
+        forward=-8 if ally=='w' else 8
+        startRow=6 if ally=='w' else 1
+        epSq=self.enpassantPossible[0]*8+self.enpassantPossible[1] if self.enpassantPossible else None
+        if not captures:
+            epSq=None
+        lastRank=0xff if ally=='w' else 0xff<<56
+        pushMask=(lastRank if captures else 0)|(~lastRank if quiets else 0)
+        pawns=self.bitboards[ally+'p']&fromMask
+        while pawns:
+            pawn=pawns&-pawns
+            pawns^=pawn
+            sq=pawn.bit_length()-1
+            allowed=targetMask&pinLines.get(sq,~0)
+            one=sq+forward
+            if 0<=one<64 and not (occupied>>one)&1:#a pawn on its last rank (only from a hand-made position) can't push
+                if ((allowed&pushMask)>>one)&1:
+                    moves.append(internedMove(sq,one,mailbox))
+                two=one+forward
+                if quiets and sq//8==startRow and not (occupied>>two)&1 and (allowed>>two)&1:
+                    moves.append(internedMove(sq,two,mailbox))
+            attacks=PAWN_ATTACKS[ally][sq]
+            if captures:
+                self.addBitboardMoves(sq,attacks&their&allowed,moves)
+            if epSq is not None and (attacks>>epSq)&1:
+                #both pawns leave their squares: check the king directly in the resulting position
+                capturedSq=epSq-forward
+                after=(occupied^pawn^(1<<capturedSq))|(1<<epSq)
+                bitboards=self.bitboards
+                queens=bitboards[enemy+'Q']
+                if not ((KNIGHT_ATTACKS[kingSq]&bitboards[enemy+'N'])
+                        or (PAWN_ATTACKS[ally][kingSq]&bitboards[enemy+'p']&~(1<<capturedSq))
+                        or (rookAttacks(kingSq,after)&(bitboards[enemy+'R']|queens))
+                        or (bishopAttacks(kingSq,after)&(bitboards[enemy+'B']|queens))):
+                    moves.append(internedMove(sq,epSq,mailbox,isEnpassantMove=True))
+
+    '''
+    Castle moves: rights left, squares between king and rook empty and the king's path not attacked
+    '''
+    def getCastleBitboardMoves(self,ally,enemy,kingSq,occupied,moves):
+        castling=self.castling if ally=='w' else self.castling>>2
+        kingside,queenside=castling&1,castling&2
+        if kingside and not occupied&((1<<(kingSq+1))|(1<<(kingSq+2))) and \
+                not self.attackersTo(kingSq+1,occupied,enemy) and not self.attackersTo(kingSq+2,occupied,enemy):
+            moves.append(internedMove(kingSq,kingSq+2,self.mailbox,isCastleMove=True))
+        if queenside and not occupied&((1<<(kingSq-1))|(1<<(kingSq-2))|(1<<(kingSq-3))) and \
+                not self.attackersTo(kingSq-1,occupied,enemy) and not self.attackersTo(kingSq-2,occupied,enemy):
+            moves.append(internedMove(kingSq,kingSq-2,self.mailbox,isCastleMove=True))
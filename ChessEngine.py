@@ -1,14 +1,69 @@
 #holds current state of board
 #tells valid moves
 
+import random
+from ChessEvaluation import MATERIAL,MIDGAME,ENDGAME,PHASE,computeTotals,taper,pieceValues
+
+ROOK_DIRECTIONS=((-1,0),(0,-1),(1,0),(0,1))
+BISHOP_DIRECTIONS=((-1,-1),(-1,1),(1,-1),(1,1))
+KNIGHT_DIRECTIONS=((-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1))
+KING_DIRECTIONS=ROOK_DIRECTIONS+BISHOP_DIRECTIONS
+PIECE_DIRECTIONS={'N':(KNIGHT_DIRECTIONS,False),'K':(KING_DIRECTIONS,False),'B':(BISHOP_DIRECTIONS,True),
+                  'R':(ROOK_DIRECTIONS,True),'Q':(KING_DIRECTIONS,True)}  # directions and whether the piece slides
+fenPieces={'P':'wp','N':'wN','B':'wB','R':'wR','Q':'wQ','K':'wK','p':'bp','n':'bN','b':'bB','r':'bR','q':'bQ','k':'bK'}
+
+#Zobrist keys: one random 64-bit number per (piece, square), castling rights combination, en passant file
+#and side to move. Fixed seed so every process computes the same keys for the same position
+zobristRandom=random.Random(20240611)
+ZOBRIST_PIECES={color+kind:[[zobristRandom.getrandbits(64) for c in range(8)] for r in range(8)]
+                for color in 'wb' for kind in 'pRNBQK'}
+ZOBRIST_CASTLING=[zobristRandom.getrandbits(64) for i in range(16)]
+ZOBRIST_ENPASSANT=[zobristRandom.getrandbits(64) for c in range(8)]
+ZOBRIST_BLACK_TO_MOVE=zobristRandom.getrandbits(64)
+
+'''
+Exact dead positions by material: the pieces, as (piece, row, col), can't mate in any line of play.
+That is king against king, a single knight or bishop against a bare king, or nothing but bishops that all
+stand on squares of one colour (king and knight against king and knight, for example, is not dead:
+a mate exists if the loser helps)
+'''
+def isDeadMaterial(pieces):
+    knights=0
+    bishopColors=set()
+    for piece,r,c in pieces:
+        kind=piece[1]
+        if kind=='N':
+            knights+=1
+        elif kind=='B':
+            bishopColors.add((r+c)%2)
+        elif kind!='K':
+            return False
+    if knights:
+        return knights==1 and not bishopColors
+    return len(bishopColors)<=1
+
+'''
+MVV-LVA order of a capture or promotion: most valuable victim first, then least valuable attacker
+'''
+def captureOrder(move):
+    score=-pieceValues[move.pieceMoved[1]]//10
+    if move.pieceCaptured!='--':
+        score+=pieceValues[move.pieceCaptured[1]]*10
+    if move.isPawnPromotion:
+        score+=pieceValues['Q']*10-pieceValues['p']*10
+    return score
+
 class GameState():
     '''
     Initialize the game state.
     - The board is an 8x8 2D list.
     - 'w'/'b' prefix for color, 'p'/'R'/'N'/'B'/'Q'/'K' for type.
     - '--' represents an empty square.
+    - trackAttacks: keep an AttackMap of both sides up to date in makeMove/undoMove
+    - checkConsistency: after every makeMove/undoMove verify the piece lists, evaluation totals and attack map against the board (for tests)
+    - fen: start from this position instead of the initial one
     '''
-    def __init__(self):
+    def __init__(self,trackAttacks=False,checkConsistency=False,fen=None):
         self.board=[
             ['bR','bN','bB','bQ','bK','bB','bN','bR'],
             ['bp' for i in range(8)],
@@ -29,21 +84,346 @@ class GameState():
         self.checkMate=False 
         self.staleMate=False
         
+        self.pins={}  # pinned pieces of the side to move, only set while getValidMoves generates moves
         self.enpassantPossible = ()  # coordinates for the square where en passant capture is possible
         self.enpassantPossibleLog = [self.enpassantPossible]
         self.currentCastlingRight = CastleRights(True, True, True, True)
         self.castleRightsLog = [CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.wqs,
                                              self.currentCastlingRight.bks, self.currentCastlingRight.bqs)]
+        self.attackMap=AttackMap(self.board) if trackAttacks else None
+        self.checkConsistency=checkConsistency
+        self.rebuildPieceLocations()
+        self.halfmoveClock=0  # plies since the last capture or pawn move, for the 50-move rule
+        self.halfmoveClockLog=[self.halfmoveClock]
+        self.fullmoveNumber=1
+        self.resetZobrist()
+        self.resetEvaluation()
+        if fen is not None:
+            self.loadFen(fen)
+
+    '''
+    Set up the position of a FEN string. The move history starts over from it
+    '''
+    def loadFen(self,fen):
+        fields=fen.split()
+        if len(fields)<4:
+            raise ValueError('FEN needs at least 4 fields: '+fen)
+        ranks=fields[0].split('/')
+        if len(ranks)!=8:
+            raise ValueError('FEN needs 8 ranks: '+fen)
+        board=[]
+        for rank in ranks:
+            row=[]
+            for ch in rank:
+                if ch.isdigit():
+                    row.extend(['--']*int(ch))
+                elif ch in fenPieces:
+                    row.append(fenPieces[ch])
+                else:
+                    raise ValueError('bad piece %r in FEN: %s'%(ch,fen))
+            if len(row)!=8:
+                raise ValueError('rank %r is not 8 squares in FEN: %s'%(rank,fen))
+            board.append(row)
+        if 'wp' in board[0]+board[7] or 'bp' in board[0]+board[7]:
+            raise ValueError('pawn on the first or last rank in FEN: '+fen)
+        self.board=board
+        self.whiteKingLocation=self.blackKingLocation=()
+        for r in range(8):
+            for c in range(8):
+                if board[r][c]=='wK':
+                    self.whiteKingLocation=(r,c)
+                elif board[r][c]=='bK':
+                    self.blackKingLocation=(r,c)
+        if not self.whiteKingLocation or not self.blackKingLocation:
+            raise ValueError('FEN needs both kings: '+fen)
+        self.whiteToMove=fields[1]=='w'
+        castling=fields[2]
+        self.currentCastlingRight=CastleRights('K' in castling,'k' in castling,'Q' in castling,'q' in castling)
+        self.castleRightsLog=[CastleRights(self.currentCastlingRight.wks,self.currentCastlingRight.bks,
+                                           self.currentCastlingRight.wqs,self.currentCastlingRight.bqs)]
+        ep=fields[3]
+        self.enpassantPossible=() if ep=='-' else (Move.ranksToRows[ep[1]],Move.filesToCols[ep[0]])
+        self.enpassantPossibleLog=[self.enpassantPossible]
+        self.halfmoveClock=int(fields[4]) if len(fields)>4 else 0
+        self.halfmoveClockLog=[self.halfmoveClock]
+        self.fullmoveNumber=int(fields[5]) if len(fields)>5 else 1
+        self.moveLog=[]
+        self.checkMate=False
+        self.staleMate=False
+        self.rebuildPieceLocations()
+        if self.attackMap is not None:
+            self.attackMap.rebuild(self.board)
+        self.resetZobrist()
+        self.resetEvaluation()
+
+    '''
+    The current position as a FEN string
+    '''
+    def getFen(self):
+        ranks=[]
+        for row in self.board:
+            rank=''
+            empty=0
+            for piece in row:
+                if piece=='--':
+                    empty+=1
+                    continue
+                if empty:
+                    rank+=str(empty)
+                    empty=0
+                rank+=piece[1].upper() if piece[0]=='w' else piece[1].lower()
+            if empty:
+                rank+=str(empty)
+            ranks.append(rank)
+        rights=self.currentCastlingRight
+        castling=('K' if rights.wks else '')+('Q' if rights.wqs else '')+('k' if rights.bks else '')+('q' if rights.bqs else '')
+        ep=Move.colsToFiles[self.enpassantPossible[1]]+Move.rowsToRanks[self.enpassantPossible[0]] if self.enpassantPossible else '-'
+        return '%s %s %s %s %d %d'%('/'.join(ranks),'w' if self.whiteToMove else 'b',castling or '-',ep,
+                                   self.halfmoveClock,self.fullmoveNumber)
+
+    '''
+    Snapshot of the current position for analysis, much cheaper than copy.deepcopy.
+    The copy starts with an empty moveLog (it can't undo past this position) but keeps the keys that can
+    still repeat, so draw detection carries over
+    '''
+    def copy(self):
+        gs=self.__class__.__new__(self.__class__)
+        gs.board=[row[:] for row in self.board]
+        gs.moveFunctions={'p':gs.getPawnMoves,'R':gs.getRookMoves,
+                          'B':gs.getBishopMoves,'N':gs.getKnightMoves,
+                          'Q':gs.getQueenMoves,'K':gs.getKingMoves}
+        gs.whiteToMove=self.whiteToMove
+        gs.moveLog=[]
+        gs.whiteKingLocation=self.whiteKingLocation
+        gs.blackKingLocation=self.blackKingLocation
+        gs.checkMate=self.checkMate
+        gs.staleMate=self.staleMate
+        gs.pins={}
+        gs.enpassantPossible=self.enpassantPossible
+        gs.enpassantPossibleLog=[self.enpassantPossible]
+        rights=self.currentCastlingRight
+        gs.currentCastlingRight=CastleRights(rights.wks,rights.bks,rights.wqs,rights.bqs)
+        gs.castleRightsLog=[CastleRights(rights.wks,rights.bks,rights.wqs,rights.bqs)]
+        if self.attackMap is not None:
+            gs.attackMap=AttackMap.__new__(AttackMap)
+            gs.attackMap.counts={color:[row[:] for row in counts] for color,counts in self.attackMap.counts.items()}
+        else:
+            gs.attackMap=None
+        gs.checkConsistency=self.checkConsistency
+        gs.pieceLocations={'w':set(self.pieceLocations['w']),'b':set(self.pieceLocations['b'])}
+        gs.halfmoveClock=self.halfmoveClock
+        gs.halfmoveClockLog=[self.halfmoveClock]
+        gs.fullmoveNumber=self.fullmoveNumber
+        gs.zobristKey=self.zobristKey
+        gs.zobristLog=self.zobristLog[max(0,len(self.zobristLog)-1-self.halfmoveClock):]
+        gs.repetitionCounts={}
+        for key in gs.zobristLog:
+            gs.repetitionCounts[key]=gs.repetitionCounts.get(key,0)+1
+        gs.material,gs.midgameScore,gs.endgameScore,gs.phase=self.material,self.midgameScore,self.endgameScore,self.phase
+        gs.evaluationLog=[]
+        return gs
         
     
+    '''
+    Recompute the piece lists from the board.
+    pieceLocations['w'] / pieceLocations['b'] hold the (row, col) of every piece of that colour,
+    so move generation only visits occupied squares; makeMove/undoMove keep them up to date
+    '''
+    def rebuildPieceLocations(self):
+        self.pieceLocations={'w':set(),'b':set()}
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c]!='--':
+                    self.pieceLocations[self.board[r][c][0]].add((r,c))
+
+    '''
+    The piece on r, c ('--' if empty)
+    '''
+    def pieceAt(self,r,c):
+        return self.board[r][c]
+
+    '''
+    (piece, row, col) of every piece, White's first
+    '''
+    def pieces(self):
+        board=self.board
+        return [(board[r][c],r,c) for color in 'wb' for r,c in self.pieceLocations[color]]
+
+    '''
+    Number of pieces on the board, kings included
+    '''
+    def pieceCount(self):
+        return len(self.pieceLocations['w'])+len(self.pieceLocations['b'])
+
+    '''
+    Determine if the piece lists agree with the board
+    '''
+    def pieceLocationsMatchBoard(self):
+        for color in 'wb':
+            onBoard={(r,c) for r in range(8) for c in range(8) if self.board[r][c][0]==color}
+            if onBoard!=self.pieceLocations[color]:
+                return False
+        return True
+
+    '''
+    Raise if the piece lists disagree with the board (used by the checkConsistency mode)
+    '''
+    def verifyPieceLocations(self):
+        if not self.pieceLocationsMatchBoard():
+            raise RuntimeError('piece lists out of sync with the board after '+
+                               (self.moveLog[-1].getChessNotation() if self.moveLog else 'setup'))
+
+    '''
+    Start the evaluation totals from the current board (after setting up a position by hand).
+    material, midgameScore, endgameScore (White minus Black) and phase are kept up to date by makeMove;
+    evaluationLog holds the totals before every move in moveLog so undoMove can restore them
+    '''
+    def resetEvaluation(self):
+        self.material,self.midgameScore,self.endgameScore,self.phase=computeTotals(self.board)
+        self.evaluationLog=[]
+
+    '''
+    Raise if the evaluation totals disagree with a recount of the board (used by the checkConsistency mode)
+    '''
+    def verifyEvaluation(self):
+        if (self.material,self.midgameScore,self.endgameScore,self.phase)!=computeTotals(self.board):
+            raise RuntimeError('evaluation totals out of sync with the board after '+
+                               (self.moveLog[-1].getChessNotation() if self.moveLog else 'setup'))
+
+    '''
+    Raise if the incremental attack map disagrees with a recount of the board (used by the checkConsistency mode)
+    '''
+    def verifyAttackMap(self):
+        if self.attackMap is not None and not self.attackMap.matches(self.board):
+            raise RuntimeError('attack map out of sync with the board after '+
+                               (self.moveLog[-1].getChessNotation() if self.moveLog else 'setup'))
+
+    '''
+    Static evaluation in O(1) from the running totals: material plus piece-square scores blended from the
+    middlegame to the endgame tables as pieces come off. Positive is good for the side to move
+    '''
+    def evaluate(self):
+        score=taper(self.material,self.midgameScore,self.endgameScore,self.phase)
+        return score if self.whiteToMove else -score
+
+    '''
+    Update the evaluation totals for a move about to be made: the moved piece (a Queen if it promotes),
+    the captured piece (beside the end square for en passant) and the rook of a castle move
+    '''
+    def updateEvaluation(self,move):
+        self.evaluationLog.append((self.material,self.midgameScore,self.endgameScore,self.phase))
+        moved=move.pieceMoved
+        placed=moved[0]+'Q' if move.isPawnPromotion else moved
+        midgame=self.midgameScore-MIDGAME[moved][move.startRow][move.startCol]+MIDGAME[placed][move.endRow][move.endCol]
+        endgame=self.endgameScore-ENDGAME[moved][move.startRow][move.startCol]+ENDGAME[placed][move.endRow][move.endCol]
+        material=self.material+MATERIAL[placed]-MATERIAL[moved]
+        phase=self.phase+PHASE[placed]-PHASE[moved]
+        captured=move.pieceCaptured
+        if captured!='--':
+            row=move.startRow if move.isEnpassantMove else move.endRow
+            midgame-=MIDGAME[captured][row][move.endCol]
+            endgame-=ENDGAME[captured][row][move.endCol]
+            material-=MATERIAL[captured]
+            phase-=PHASE[captured]
+        if move.isCastleMove:
+            rook=moved[0]+'R'
+            start,end=(move.endCol+1,move.endCol-1) if move.endCol-move.startCol==2 else (move.endCol-2,move.endCol+1)
+            midgame+=MIDGAME[rook][move.endRow][end]-MIDGAME[rook][move.endRow][start]
+            endgame+=ENDGAME[rook][move.endRow][end]-ENDGAME[rook][move.endRow][start]
+        self.material,self.midgameScore,self.endgameScore,self.phase=material,midgame,endgame,phase
+
+    '''
+    Compute the Zobrist key of the current position from scratch
+    '''
+    def computeZobristKey(self):
+        key=0
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c]!='--':
+                    key^=ZOBRIST_PIECES[self.board[r][c]][r][c]
+        key^=self.castlingZobrist()^self.enpassantZobrist()
+        if not self.whiteToMove:
+            key^=ZOBRIST_BLACK_TO_MOVE
+        return key
+
+    '''
+    Start the key history from the current position (after setting up a position by hand)
+    - zobristLog: key of every position in the game, alongside moveLog
+    - repetitionCounts: key -> how often the position occurred, for O(1) threefold repetition
+    '''
+    def resetZobrist(self):
+        self.zobristKey=self.computeZobristKey()
+        self.zobristLog=[self.zobristKey]
+        self.repetitionCounts={self.zobristKey:1}
+
+    '''
+    Key part for the current castling rights
+    '''
+    def castlingZobrist(self):
+        rights=self.currentCastlingRight
+        return ZOBRIST_CASTLING[rights.wks|rights.wqs<<1|rights.bks<<2|rights.bqs<<3]
+
+    '''
+    The en passant file only counts when a pawn of the side to move stands ready to capture,
+    so positions that differ only by an unusable en passant square hash alike
+    '''
+    def enpassantZobrist(self):
+        if not self.enpassantPossible:
+            return 0
+        r,c=self.enpassantPossible
+        pawnRow,pawn=(r+1,'wp') if self.whiteToMove else (r-1,'bp')
+        if (c>0 and self.board[pawnRow][c-1]==pawn) or (c<7 and self.board[pawnRow][c+1]==pawn):
+            return ZOBRIST_ENPASSANT[c]
+        return 0
+
+    '''
+    Determine if the current position has occurred three times
+    '''
+    def isThreefoldRepetition(self):
+        return self.repetitionCounts[self.zobristKey]>=3
+
+    '''
+    Determine if 50 moves by each side passed without a capture or pawn move
+    '''
+    def isFiftyMoveDraw(self):
+        return self.halfmoveClock>=100
+
+    '''
+    Determine if neither side can ever checkmate, whatever is played (see isDeadMaterial)
+    '''
+    def isInsufficientMaterial(self):
+        return isDeadMaterial(self.pieces())
+
     '''
     Takes a Move parameter and executes it (does not work for castling, pawn promotion, and en-passant)
     '''
     def makeMove(self,move):
+        if self.attackMap is not None:
+            changedSquares=self.attackMap.changedSquares(move)
+            self.attackMap.removeAround(self.board,changedSquares)
+        #take out the old castling rights and en passant file, put the new ones back in at the end
+        key=self.zobristKey^self.castlingZobrist()^self.enpassantZobrist()^ZOBRIST_BLACK_TO_MOVE
+        key^=ZOBRIST_PIECES[move.pieceMoved][move.startRow][move.startCol]
+        if move.isPawnPromotion:
+            key^=ZOBRIST_PIECES[move.pieceMoved[0]+'Q'][move.endRow][move.endCol]
+        else:
+            key^=ZOBRIST_PIECES[move.pieceMoved][move.endRow][move.endCol]
+        if move.isEnpassantMove:
+            key^=ZOBRIST_PIECES[move.pieceCaptured][move.startRow][move.endCol]
+        elif move.pieceCaptured!='--':
+            key^=ZOBRIST_PIECES[move.pieceCaptured][move.endRow][move.endCol]
+        self.updateEvaluation(move)
         self.board[move.startRow][move.startCol]='--'
         self.board[move.endRow][move.endCol]=move.pieceMoved
+        locations=self.pieceLocations[move.pieceMoved[0]]
+        locations.remove((move.startRow,move.startCol))
+        locations.add((move.endRow,move.endCol))
+        if move.pieceCaptured!='--' and not move.isEnpassantMove:
+            self.pieceLocations[move.pieceCaptured[0]].remove((move.endRow,move.endCol))
         self.moveLog.append(move)
         self.whiteToMove= not self.whiteToMove
+        if self.whiteToMove:
+            self.fullmoveNumber+=1
         #update king's location if moved
         if move.pieceMoved=='wK':
             self.whiteKingLocation=(move.endRow,move.endCol)
@@ -57,6 +437,7 @@ class GameState():
         #enpassant move
         if move.isEnpassantMove:
             self.board[move.startRow][move.endCol]='--'
+            self.pieceLocations[move.pieceCaptured[0]].remove((move.startRow,move.endCol))
         #update enpassant possible variable
         if move.pieceMoved[1]=='p' and abs(move.startRow - move.endRow)==2:
             self.enpassantPossible = ((move.startRow+move.endRow)//2,move.startCol)
@@ -68,14 +449,37 @@ class GameState():
             if move.endCol-move.startCol==2:#kingside castle
                 self.board[move.endRow][move.endCol-1]=self.board[move.endRow][move.endCol+1]
                 self.board[move.endRow][move.endCol+1]='--'
+                locations.remove((move.endRow,move.endCol+1))
+                locations.add((move.endRow,move.endCol-1))
+                rook=ZOBRIST_PIECES[move.pieceMoved[0]+'R'][move.endRow]
+                key^=rook[move.endCol+1]^rook[move.endCol-1]
             else:#queenside castle 
                 self.board[move.endRow][move.endCol+1]=self.board[move.endRow][move.endCol-2]
                 self.board[move.endRow][move.endCol-2]='--'
+                locations.remove((move.endRow,move.endCol-2))
+                locations.add((move.endRow,move.endCol+1))
+                rook=ZOBRIST_PIECES[move.pieceMoved[0]+'R'][move.endRow]
+                key^=rook[move.endCol-2]^rook[move.endCol+1]
         # update castling rights
         self.UpdateCastleRights(move)
         self.castleRightsLog.append(CastleRights(self.currentCastlingRight.wks, self.currentCastlingRight.bks,
                                                  self.currentCastlingRight.wqs, self.currentCastlingRight.bqs))
         self.enpassantPossibleLog.append(self.enpassantPossible)
+        key^=self.castlingZobrist()^self.enpassantZobrist()
+        self.zobristKey=key
+        self.zobristLog.append(key)
+        self.repetitionCounts[key]=self.repetitionCounts.get(key,0)+1
+        if move.pieceMoved[1]=='p' or move.pieceCaptured!='--':
+            self.halfmoveClock=0
+        else:
+            self.halfmoveClock+=1
+        self.halfmoveClockLog.append(self.halfmoveClock)
+        if self.attackMap is not None:
+            self.attackMap.addAround(self.board,changedSquares)
+        if self.checkConsistency:
+            self.verifyPieceLocations()
+            self.verifyEvaluation()
+            self.verifyAttackMap()
 
     '''
     Undo the last move made
@@ -83,9 +487,20 @@ class GameState():
     def undoMove(self):
         if len(self.moveLog)!=0:
             move=self.moveLog.pop()
+            if self.attackMap is not None:
+                changedSquares=self.attackMap.changedSquares(move)
+                self.attackMap.removeAround(self.board,changedSquares)
             self.board[move.startRow][move.startCol]=move.pieceMoved
             self.board[move.endRow][move.endCol]=move.pieceCaptured
+            locations=self.pieceLocations[move.pieceMoved[0]]
+            locations.remove((move.endRow,move.endCol))
+            locations.add((move.startRow,move.startCol))
+            if move.pieceCaptured!='--':
+                self.pieceLocations[move.pieceCaptured[0]].add((move.startRow,move.endCol) if move.isEnpassantMove
+                                                               else (move.endRow,move.endCol))
             self.whiteToMove= not self.whiteToMove
+            if not self.whiteToMove:
+                self.fullmoveNumber-=1
             #update king's location if moved
             if move.pieceMoved=='wK':
                 self.whiteKingLocation=(move.startRow,move.startCol)
@@ -100,17 +515,39 @@ class GameState():
             self.enpassantPossibleLog.pop()
             self.enpassantPossible = self.enpassantPossibleLog[-1]
 
+            # undo key and halfmove clock
+            key=self.zobristLog.pop()
+            if self.repetitionCounts[key]==1:
+                del self.repetitionCounts[key]
+            else:
+                self.repetitionCounts[key]-=1
+            self.zobristKey=self.zobristLog[-1]
+            self.halfmoveClockLog.pop()
+            self.halfmoveClock=self.halfmoveClockLog[-1]
+            self.material,self.midgameScore,self.endgameScore,self.phase=self.evaluationLog.pop()
+
             # undo castle rights
             self.castleRightsLog.pop()
-            self.currentCastlingRight=self.castleRightsLog[-1]
+            castleRights=self.castleRightsLog[-1] #copy, UpdateCastleRights mutates the current rights in place
+            self.currentCastlingRight=CastleRights(castleRights.wks,castleRights.bks,castleRights.wqs,castleRights.bqs)
             #undo castle move
             if move.isCastleMove:
                 if move.endCol-move.startCol==2:#kingside castle
                     self.board[move.endRow][move.endCol+1]=self.board[move.endRow][move.endCol-1]
                     self.board[move.endRow][move.endCol-1]='--'
+                    locations.remove((move.endRow,move.endCol-1))
+                    locations.add((move.endRow,move.endCol+1))
                 else:#queenside castle 
                     self.board[move.endRow][move.endCol-2]=self.board[move.endRow][move.endCol+1]
                     self.board[move.endRow][move.endCol+1]='--'
+                    locations.remove((move.endRow,move.endCol+1))
+                    locations.add((move.endRow,move.endCol-2))
+            if self.attackMap is not None:
+                self.attackMap.addAround(self.board,changedSquares)
+            if self.checkConsistency:
+                self.verifyPieceLocations()
+                self.verifyEvaluation()
+                self.verifyAttackMap()
 
     '''
     Update the castle rights given the move
@@ -134,38 +571,215 @@ class GameState():
                     self.currentCastlingRight.bqs=False
                 elif move.startCol==7:
                     self.currentCastlingRight.bks=False
+        #a rook captured on its starting square takes its castling right with it
+        if move.pieceCaptured=='wR':
+            if move.endRow==7:
+                if move.endCol==0:
+                    self.currentCastlingRight.wqs=False
+                elif move.endCol==7:
+                    self.currentCastlingRight.wks=False
+        elif move.pieceCaptured=='bR':
+            if move.endRow==0:
+                if move.endCol==0:
+                    self.currentCastlingRight.bqs=False
+                elif move.endCol==7:
+                    self.currentCastlingRight.bks=False
 
     '''
-    All moves considering checks
+    All moves considering checks.
+    Checkers and pinned pieces are found once by looking outwards from the king, so only legal moves are emitted
+    and no move has to be made and undone to test it
+    - captures / quiets: generate only one stage, the captures and promotions or the other moves
+      (the checkmate/stalemate flags are only updated when both are generated)
     '''
-    def getValidMoves(self):
-        tempEnpassantPossible = self.enpassantPossible
-        tempCastleRights = CastleRights(self.currentCastlingRight.wks,self.currentCastlingRight.bks,
-                                        self.currentCastlingRight.wqs,self.currentCastlingRight.bqs)
-        moves=self.getAllPossibleMoves()
-        if self.whiteToMove:
-            self.getCastleMoves(self.whiteKingLocation[0],self.whiteKingLocation[1],moves)
+    def getValidMoves(self,captures=True,quiets=True):
+        kingRow,kingCol=self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        inCheck,pins,checks=self.checkForPinsAndChecks()
+        self.pins=pins
+        if captures and quiets:
+            moves=self.getAllPossibleMoves()
         else:
-            self.getCastleMoves(self.blackKingLocation[0],self.blackKingLocation[1],moves)
-        for i in range(len(moves)-1,-1,-1):
-            self.makeMove(moves[i])
-            self.whiteToMove=not self.whiteToMove #coz make move already changes this
-            if self.inCheck():
-                moves.remove(moves[i])
-            self.whiteToMove=not self.whiteToMove
-            self.undoMove()
-        if len(moves)==0:
-            if self.inCheck():
-                self.checkMate=True 
-            else:
-                self.staleMate=True 
-        else: #needed coz we might do undo
-            self.checkMate=False 
-            self.staleMate=False
-        self.enpassantPossible = tempEnpassantPossible
-        self.currentCastlingRight=tempCastleRights
+            moves=[]
+            for r,c in self.pieceLocations['w' if self.whiteToMove else 'b']:
+                self.getStageMoves(r,c,moves,captures)
+        self.pins={}
+        moves=self.legalMoves(moves,checks,kingRow,kingCol)
+        if not inCheck and quiets:
+            self.getCastleMoves(kingRow,kingCol,moves)
+        if captures and quiets:
+            if len(moves)==0:
+                if inCheck:
+                    self.checkMate=True
+                else:
+                    self.staleMate=True
+            else: #needed coz we might do undo
+                self.checkMate=False
+                self.staleMate=False
         return moves
-    
+
+    '''
+    Legal moves of the piece on r, c only (used to check a hash or killer move is playable)
+    '''
+    def getValidMovesFrom(self,r,c):
+        kingRow,kingCol=self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        inCheck,pins,checks=self.checkForPinsAndChecks()
+        self.pins=pins
+        moves=[]
+        self.moveFunctions[self.board[r][c][1]](r,c,moves)
+        self.pins={}
+        moves=self.legalMoves(moves,checks,kingRow,kingCol)
+        if not inCheck and (r,c)==(kingRow,kingCol):
+            self.getCastleMoves(kingRow,kingCol,moves)
+        return moves
+
+    '''
+    Staged move picker for the search, a generator of legal moves:
+    the hash move, captures and promotions by MVV-LVA, the killer moves, then quiet moves by history score.
+    Each stage is only generated once the previous one is used up, so a beta cutoff early on skips the rest.
+    - hashMoveID: moveID of the best move stored for this position (0 for none)
+    - killers: quiet moves that caused cutoffs at this ply in sibling positions
+    - history: (piece, endRow, endCol) -> score used to order the quiet moves
+    The caller must restore the position before asking for the next move
+    '''
+    def getStagedMoves(self,hashMoveID=0,killers=(),history=None):
+        if hashMoveID:
+            r,c=hashMoveID//1000,hashMoveID//100%10
+            if self.pieceAt(r,c)[0]==('w' if self.whiteToMove else 'b'):
+                for move in self.getValidMovesFrom(r,c):
+                    if move.moveID==hashMoveID:
+                        yield move
+                        break
+        captures=self.getValidMoves(quiets=False)
+        captures.sort(key=captureOrder,reverse=True)
+        for move in captures:
+            if move.moveID!=hashMoveID:
+                yield move
+        tried=[hashMoveID]
+        for killer in killers:
+            if killer is None or killer.moveID in tried or self.pieceAt(killer.startRow,killer.startCol)!=killer.pieceMoved \
+                    or self.pieceAt(killer.endRow,killer.endCol)!='--' or killer.isPawnPromotion:
+                continue
+            for move in self.getValidMovesFrom(killer.startRow,killer.startCol):
+                if move.moveID==killer.moveID and not move.isEnpassantMove:
+                    tried.append(move.moveID)
+                    yield move
+                    break
+        quiets=self.getValidMoves(captures=False)
+        if history:
+            quiets.sort(key=lambda move:history.get((move.pieceMoved,move.endRow,move.endCol),0),reverse=True)
+        for move in quiets:
+            if move.moveID not in tried:
+                yield move
+
+    '''
+    Keep the moves that don't leave the king in check, given the checks found by checkForPinsAndChecks
+    (the moves already respect the pins)
+    '''
+    def legalMoves(self,moves,checks,kingRow,kingCol):
+        if len(checks)==1:#block the check, capture the checker or move the king
+            checkRow,checkCol,dr,dc=checks[0]
+            if self.board[checkRow][checkCol][1]=='N':
+                validSquares={(checkRow,checkCol)}
+            else:
+                validSquares=set()
+                for i in range(1,8):
+                    square=(kingRow+dr*i,kingCol+dc*i)
+                    validSquares.add(square)
+                    if square==(checkRow,checkCol):
+                        break
+            moves=[move for move in moves if move.pieceMoved[1]=='K' or (move.endRow,move.endCol) in validSquares
+                   or (move.isEnpassantMove and (move.startRow,move.endCol)==(checkRow,checkCol))]
+        elif len(checks)>1:#double check, only the king can move
+            moves=[move for move in moves if move.pieceMoved[1]=='K']
+        return [move for move in moves if self.isLegalKingOrEnpassantMove(move,kingRow,kingCol)]
+
+    '''
+    Pins and checks only cover pieces standing between the king and an attacker, so king moves and en passant
+    captures (which take a second pawn off the board) are tested separately
+    '''
+    def isLegalKingOrEnpassantMove(self,move,kingRow,kingCol):
+        if move.pieceMoved[1]=='K':
+            return not self.squareAttackedAfterKingMove(move.endRow,move.endCol)
+        if move.isEnpassantMove and move.startRow==kingRow:
+            #both pawns leave the king's rank at once, look for a rook or queen behind them
+            enemy='b' if self.whiteToMove else 'w'
+            dc=1 if move.startCol>kingCol else -1
+            c=kingCol+dc
+            while 0<=c<8:
+                if c!=move.startCol and c!=move.endCol:
+                    piece=self.board[kingRow][c]
+                    if piece!='--':
+                        return not (piece[0]==enemy and piece[1] in 'RQ')
+                c+=dc
+        return True
+
+    '''
+    Determine if the king of the side to move would be attacked after moving to r, c
+    '''
+    def squareAttackedAfterKingMove(self,r,c):
+        enemy='b' if self.whiteToMove else 'w'
+        kingRow,kingCol=self.whiteKingLocation if self.whiteToMove else self.blackKingLocation
+        #no enemy ray ends on a king that is not in check, so the attack map is exact for its moves
+        if self.attackMap is not None and not self.attackMap.isAttacked(kingRow,kingCol,enemy):
+            return self.attackMap.isAttacked(r,c,enemy)
+        #otherwise take the king off the board so it can't hide behind itself on a checking ray
+        king=self.board[kingRow][kingCol]
+        self.board[kingRow][kingCol]='--'
+        attacked=self.squareAttackedBy(r,c,enemy)
+        self.board[kingRow][kingCol]=king
+        return attacked
+
+    '''
+    Look outwards from the king of the side to move.
+    Returns (inCheck, pins, checks): pins maps (row, col) of a pinned piece to the direction from the king,
+    checks is a list of (row, col, dr, dc) for every checking piece
+    '''
+    def checkForPinsAndChecks(self):
+        pins={}
+        checks=[]
+        if self.whiteToMove:
+            enemy,ally='b','w'
+            r,c=self.whiteKingLocation
+        else:
+            enemy,ally='w','b'
+            r,c=self.blackKingLocation
+        directions=KING_DIRECTIONS
+        for j in range(8):
+            dr,dc=directions[j]
+            possiblePin=None
+            for i in range(1,8):
+                nr,nc=r+dr*i,c+dc*i
+                if not (0<=nr<8 and 0<=nc<8):
+                    break
+                piece=self.board[nr][nc]
+                if piece[0]==ally:
+                    if possiblePin is None:
+                        possiblePin=(nr,nc)
+                    else:#second allied piece, no pin or check this way
+                        break
+                elif piece[0]==enemy:
+                    kind=piece[1]
+                    #orthogonal rook, diagonal bishop, adjacent diagonal pawn, any queen, adjacent king
+                    if (j<4 and kind=='R') or (j>=4 and kind=='B') or kind=='Q' or (i==1 and kind=='K') or \
+                            (i==1 and kind=='p' and ((enemy=='w' and dr==1 and j>=4) or (enemy=='b' and dr==-1 and j>=4))):
+                        if possiblePin is None:
+                            checks.append((nr,nc,dr,dc))
+                        else:
+                            pins[possiblePin]=(dr,dc)
+                    break
+        for dr,dc in KNIGHT_DIRECTIONS:
+            nr,nc=r+dr,c+dc
+            if 0<=nr<8 and 0<=nc<8 and self.board[nr][nc]==enemy+'N':
+                checks.append((nr,nc,dr,dc))
+        return len(checks)>0,pins,checks
+
+    '''
+    Determine if a piece at r, c may move in direction dr, dc given the current pins
+    '''
+    def pinAllows(self,r,c,dr,dc):
+        pinDirection=self.pins.get((r,c))
+        return pinDirection is None or pinDirection==(dr,dc) or pinDirection==(-dr,-dc)
+
     '''
     Determine if the current player is in check
     '''
@@ -178,12 +792,44 @@ class GameState():
     Determine if the enemy can attack the square r, c
     '''
     def squareUnderAttack(self,r,c):
-        self.whiteToMove= not self.whiteToMove 
-        oppMoves=self.getAllPossibleMoves()
-        self.whiteToMove = not self.whiteToMove 
-        for move in oppMoves:
-            if move.endRow==r and move.endCol==c:
-                return True 
+        enemy='b' if self.whiteToMove else 'w'
+        if self.attackMap is not None:
+            return self.attackMap.isAttacked(r,c,enemy)
+        return self.squareAttackedBy(r,c,enemy)
+
+    '''
+    Determine if a piece of the given color ('w'/'b') attacks the square r, c.
+    Looks outwards from the square (pawn diagonals, knight jumps, king neighbours, sliding rays)
+    instead of generating the attacker's moves
+    '''
+    def squareAttackedBy(self,r,c,color):
+        board=self.board
+        pawnRow=r+1 if color=='w' else r-1#white pawns attack upwards, so they sit one row below
+        if 0<=pawnRow<8:
+            pawn=color+'p'
+            if (c>0 and board[pawnRow][c-1]==pawn) or (c<7 and board[pawnRow][c+1]==pawn):
+                return True
+        knight=color+'N'
+        for dr,dc in KNIGHT_DIRECTIONS:
+            nr,nc=r+dr,c+dc
+            if 0<=nr<8 and 0<=nc<8 and board[nr][nc]==knight:
+                return True
+        king=color+'K'
+        for dr,dc in KING_DIRECTIONS:
+            nr,nc=r+dr,c+dc
+            if 0<=nr<8 and 0<=nc<8 and board[nr][nc]==king:
+                return True
+        queen=color+'Q'
+        for slider,directions in ((color+'R',ROOK_DIRECTIONS),(color+'B',BISHOP_DIRECTIONS)):
+            for dr,dc in directions:
+                nr,nc=r+dr,c+dc
+                while 0<=nr<8 and 0<=nc<8:
+                    piece=board[nr][nc]
+                    if piece!='--':
+                        if piece==slider or piece==queen:
+                            return True
+                        break
+                    nr,nc=nr+dr,nc+dc
         return False
     
     '''
@@ -191,47 +837,91 @@ class GameState():
     '''
     def getAllPossibleMoves(self):
         moves=[]
-        for r in range(len(self.board)):
-            for c in range(len(self.board[r])):
-                turn,piece=self.board[r][c][0],self.board[r][c][1]
-                if (turn=='w' and self.whiteToMove) or (turn=='b' and not self.whiteToMove):
-                    self.moveFunctions[piece](r,c,moves)#calls appropriate move function based on piece
+        #only the side to move's pieces, in board order so the move list order stays the same
+        for r,c in sorted(self.pieceLocations['w' if self.whiteToMove else 'b']):
+            self.moveFunctions[self.board[r][c][1]](r,c,moves)#calls appropriate move function based on piece
         return moves
 
+    '''
+    Add the moves of one stage for the piece on r, c: its captures and promotions (captures=True)
+    or its other, quiet moves. Castling is left to getCastleMoves
+    '''
+    def getStageMoves(self,r,c,moves,captures):
+        board=self.board
+        color,kind=board[r][c]
+        enemy='b' if color=='w' else 'w'
+        if kind=='p':
+            dr=-1 if color=='w' else 1
+            nr=r+dr
+            if not 0<=nr<8:
+                return
+            promotion=nr==0 or nr==7
+            if board[nr][c]=='--' and self.pinAllows(r,c,dr,0):
+                if promotion==captures:
+                    moves.append(Move.interned((r,c),(nr,c),board))
+                if not captures and r==(6 if color=='w' else 1) and board[nr+dr][c]=='--':
+                    moves.append(Move.interned((r,c),(nr+dr,c),board))
+            if captures:
+                for dc in (-1,1):
+                    nc=c+dc
+                    if 0<=nc<8 and self.pinAllows(r,c,dr,dc):
+                        if board[nr][nc][0]==enemy:
+                            moves.append(Move.interned((r,c),(nr,nc),board))
+                        elif (nr,nc)==self.enpassantPossible:
+                            moves.append(Move.interned((r,c),(nr,nc),board,isEnpassantMove=True))
+            return
+        directions,slides=PIECE_DIRECTIONS[kind]
+        for dr,dc in directions:
+            if not self.pinAllows(r,c,dr,dc):
+                continue
+            nr,nc=r+dr,c+dc
+            while 0<=nr<8 and 0<=nc<8:
+                target=board[nr][nc]
+                if target=='--':
+                    if not captures:
+                        moves.append(Move.interned((r,c),(nr,nc),board))
+                else:
+                    if captures and target[0]==enemy:
+                        moves.append(Move.interned((r,c),(nr,nc),board))
+                    break
+                if not slides:
+                    break
+                nr,nc=nr+dr,nc+dc
+
     '''
     Get all the pawn moves for the pawn located at row, col and add these moves to the list
     '''
     def getPawnMoves(self,r,c,moves):
         if self.whiteToMove:
-            if self.board[r-1][c]=='--':#1 step forward by white pawn
-                moves.append(Move((r,c),(r-1,c),self.board))
+            if self.board[r-1][c]=='--' and self.pinAllows(r,c,-1,0):#1 step forward by white pawn
+                moves.append(Move.interned((r,c),(r-1,c),self.board))
                 if r==6 and self.board[r-2][c]=='--':
-                    moves.append(Move((r,c),(r-2,c),self.board))
-            if c-1>=0:
+                    moves.append(Move.interned((r,c),(r-2,c),self.board))
+            if c-1>=0 and self.pinAllows(r,c,-1,-1):
                 if self.board[r-1][c-1][0]=='b':
-                    moves.append(Move((r,c),(r-1,c-1),self.board))
+                    moves.append(Move.interned((r,c),(r-1,c-1),self.board))
                 elif (r-1,c-1)==self.enpassantPossible:
-                    moves.append(Move((r,c),(r-1,c-1),self.board,isEnpassantMove=True))
-            if c+1<=7:
+                    moves.append(Move.interned((r,c),(r-1,c-1),self.board,isEnpassantMove=True))
+            if c+1<=7 and self.pinAllows(r,c,-1,1):
                 if self.board[r-1][c+1][0]=='b':
-                    moves.append(Move((r,c),(r-1,c+1),self.board))
+                    moves.append(Move.interned((r,c),(r-1,c+1),self.board))
                 elif (r-1,c+1)==self.enpassantPossible:
-                    moves.append(Move((r,c),(r-1,c+1),self.board,isEnpassantMove=True))
+                    moves.append(Move.interned((r,c),(r-1,c+1),self.board,isEnpassantMove=True))
         else:
-            if r+1<=7 and self.board[r+1][c]=='--':#1 step forward by black pawn
-                moves.append(Move((r,c),(r+1,c),self.board))
+            if r+1<=7 and self.board[r+1][c]=='--' and self.pinAllows(r,c,1,0):#1 step forward by black pawn
+                moves.append(Move.interned((r,c),(r+1,c),self.board))
                 if r==1 and self.board[r+2][c]=='--':
-                    moves.append(Move((r,c),(r+2,c),self.board))
-            if c-1>=0:
+                    moves.append(Move.interned((r,c),(r+2,c),self.board))
+            if c-1>=0 and self.pinAllows(r,c,1,-1):
                 if self.board[r+1][c-1][0]=='w':
-                    moves.append(Move((r,c),(r+1,c-1),self.board))
+                    moves.append(Move.interned((r,c),(r+1,c-1),self.board))
                 elif (r+1,c-1)==self.enpassantPossible:
-                    moves.append(Move((r,c),(r+1,c-1),self.board,isEnpassantMove=True))
-            if c+1<=7:
+                    moves.append(Move.interned((r,c),(r+1,c-1),self.board,isEnpassantMove=True))
+            if c+1<=7 and self.pinAllows(r,c,1,1):
                 if self.board[r+1][c+1][0]=='w':
-                    moves.append(Move((r,c),(r+1,c+1),self.board))
+                    moves.append(Move.interned((r,c),(r+1,c+1),self.board))
                 elif (r+1,c+1)==self.enpassantPossible:
-                    moves.append(Move((r,c),(r+1,c+1),self.board,isEnpassantMove=True))
+                    moves.append(Move.interned((r,c),(r+1,c+1),self.board,isEnpassantMove=True))
             
 
 
@@ -242,13 +932,15 @@ class GameState():
         directions=[(0,1),(0,-1),(1,0),(-1,0)]
         enemy='b' if self.whiteToMove else 'w'
         for dr,dc in directions:
+            if not self.pinAllows(r,c,dr,dc):
+                continue
             nr,nc=r,c
             while 0<=nr+dr and nr+dr<8 and 0<=nc+dc and nc+dc<8:
                 nr,nc=nr+dr,nc+dc
                 if self.board[nr][nc]=='--':
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                 elif self.board[nr][nc][0]==enemy:
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                     break
                 else:
                     break
@@ -260,13 +952,15 @@ class GameState():
         directions=[(1,1),(1,-1),(-1,1),(-1,-1)]
         enemy='b' if self.whiteToMove else 'w'
         for dr,dc in directions:
+            if not self.pinAllows(r,c,dr,dc):
+                continue
             nr,nc=r,c
             while 0<=nr+dr and nr+dr<8 and 0<=nc+dc and nc+dc<8:
                 nr,nc=nr+dr,nc+dc
                 if self.board[nr][nc]=='--':
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                 elif self.board[nr][nc][0]==enemy:
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                     break
                 else:
                     break
@@ -275,15 +969,17 @@ class GameState():
     Get all the knight moves for the knight located at row, col and add these moves to the list
     '''
     def getKnightMoves(self,r,c,moves):
+        if (r,c) in self.pins:#a pinned knight can never stay on the pin line
+            return
         directions=[(1,2),(1,-2),(-1,2),(-1,-2),(2,1),(2,-1),(-2,1),(-2,-1)]
         enemy='b' if self.whiteToMove else 'w'
         for dr,dc in directions:
             if 0<=r+dr<8 and 0<=c+dc<8:
                 nr,nc=r+dr,c+dc
                 if self.board[nr][nc]=='--':
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                 elif self.board[nr][nc][0]==enemy:
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                 else:
                     pass
 
@@ -300,18 +996,16 @@ class GameState():
             if 0<=nr+dr and nr+dr<8 and 0<=nc+dc and nc+dc<8:
                 nr,nc=nr+dr,nc+dc
                 if self.board[nr][nc]=='--':
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                 elif self.board[nr][nc][0]==enemy:
-                    moves.append(Move((r,c),(nr,nc),self.board))
+                    moves.append(Move.interned((r,c),(nr,nc),self.board))
                 else:
                     pass
 
     '''
     Generate all valid castle moves for the king at (r, c) and add them to the list of moves
     '''
-    def getCastleMoves(self,r,c,moves):
-        if self.inCheck():
-            return 
+    def getCastleMoves(self,r,c,moves):#only called when not in check
         if (self.whiteToMove and self.currentCastlingRight.wks) or (not self.whiteToMove and self.currentCastlingRight.bks):
             self.getKingsideCastleMoves(r,c,moves) 
         if (self.whiteToMove and self.currentCastlingRight.wqs) or (not self.whiteToMove and self.currentCastlingRight.bqs):
@@ -323,7 +1017,7 @@ class GameState():
     def getKingsideCastleMoves(self,r,c,moves):
         if self.board[r][c+1]=='--' and self.board[r][c+2]=='--':
             if not self.squareUnderAttack(r,c+1) and not self.squareUnderAttack(r,c+2):
-                moves.append(Move((r,c),(r,c+2),self.board,isCastleMove=True))
+                moves.append(Move.interned((r,c),(r,c+2),self.board,isCastleMove=True))
 
     '''
     Generate queenside castle moves
@@ -331,7 +1025,7 @@ class GameState():
     def getQueensideCastleMoves(self, r, c, moves):
         if self.board[r][c - 1] == '--' and self.board[r][c - 2] == '--' and self.board[r][c - 3] == '--':
             if not self.squareUnderAttack(r, c - 1) and not self.squareUnderAttack(r, c - 2):
-                moves.append(Move((r,c),(r,c-2),self.board,isCastleMove=True))
+                moves.append(Move.interned((r,c),(r,c-2),self.board,isCastleMove=True))
             
 
     '''
@@ -357,7 +1051,121 @@ class CastleRights():
 
 
 
+class AttackMap():
+    '''
+    Initialize the attack map.
+    - counts['w'][r][c] / counts['b'][r][c]: number of white / black pieces attacking the square
+    - Kept up to date by GameState.makeMove/undoMove: only pieces standing on a changed square
+      and sliders whose rays reach one are removed before the board changes and added back after
+    '''
+    def __init__(self,board):
+        self.rebuild(board)
+
+    '''
+    Recount every attack from scratch
+    '''
+    def rebuild(self,board):
+        self.counts={'w':[[0]*8 for i in range(8)],'b':[[0]*8 for i in range(8)]}
+        for r in range(8):
+            for c in range(8):
+                if board[r][c]!='--':
+                    self.addPiece(board,r,c,1)
+
+    '''
+    Determine if the given color attacks the square r, c
+    '''
+    def isAttacked(self,r,c,color):
+        return self.counts[color][r][c]>0
+
+    '''
+    Add (delta=1) or remove (delta=-1) the attacks of the piece on r, c
+    '''
+    def addPiece(self,board,r,c,delta):
+        color,kind=board[r][c][0],board[r][c][1]
+        counts=self.counts[color]
+        if kind=='p':
+            nr=r-1 if color=='w' else r+1
+            if 0<=nr<8:
+                if c>0:
+                    counts[nr][c-1]+=delta
+                if c<7:
+                    counts[nr][c+1]+=delta
+        elif kind=='N' or kind=='K':
+            for dr,dc in (KNIGHT_DIRECTIONS if kind=='N' else KING_DIRECTIONS):
+                nr,nc=r+dr,c+dc
+                if 0<=nr<8 and 0<=nc<8:
+                    counts[nr][nc]+=delta
+        else:
+            directions=ROOK_DIRECTIONS if kind=='R' else BISHOP_DIRECTIONS if kind=='B' else KING_DIRECTIONS
+            for dr,dc in directions:
+                nr,nc=r+dr,c+dc
+                while 0<=nr<8 and 0<=nc<8:
+                    counts[nr][nc]+=delta
+                    if board[nr][nc]!='--':
+                        break
+                    nr,nc=nr+dr,nc+dc
+
+    '''
+    The squares whose contents the move changes
+    '''
+    def changedSquares(self,move):
+        squares=[(move.startRow,move.startCol),(move.endRow,move.endCol)]
+        if move.isEnpassantMove:
+            squares.append((move.startRow,move.endCol))
+        if move.isCastleMove:
+            if move.endCol-move.startCol==2:
+                squares+=[(move.endRow,move.endCol+1),(move.endRow,move.endCol-1)]
+            else:
+                squares+=[(move.endRow,move.endCol-2),(move.endRow,move.endCol+1)]
+        return squares
+
+    '''
+    The pieces whose attacks depend on the given squares: the pieces on them and every slider seeing one
+    '''
+    def affectedPieces(self,board,squares):
+        pieces=set()
+        for r,c in squares:
+            if board[r][c]!='--':
+                pieces.add((r,c))
+            for j in range(8):
+                dr,dc=KING_DIRECTIONS[j]
+                nr,nc=r+dr,c+dc
+                while 0<=nr<8 and 0<=nc<8:
+                    piece=board[nr][nc]
+                    if piece!='--':
+                        kind=piece[1]
+                        if kind=='Q' or (j<4 and kind=='R') or (j>=4 and kind=='B'):
+                            pieces.add((nr,nc))
+                        break
+                    nr,nc=nr+dr,nc+dc
+        return pieces
+
+    '''
+    Take out the attacks that a change of the given squares can affect (call before the board changes)
+    '''
+    def removeAround(self,board,squares):
+        for r,c in self.affectedPieces(board,squares):
+            self.addPiece(board,r,c,-1)
+
+    '''
+    Put back the attacks around the given squares (call after the board changed)
+    '''
+    def addAround(self,board,squares):
+        for r,c in self.affectedPieces(board,squares):
+            self.addPiece(board,r,c,1)
+
+    '''
+    Consistency check: compare the incremental counts against a recount of the board
+    '''
+    def matches(self,board):
+        return self.counts==AttackMap(board).counts
+
+
 class Move():
+    #no per-instance __dict__; generated moves are shared via interned(), so a Move must never be modified
+    __slots__=('startRow','startCol','endRow','endCol','pieceMoved','pieceCaptured',
+               'isPawnPromotion','isEnpassantMove','isCastleMove','moveID')
+    cache={}  # (startSq, endSq, pieceMoved, pieceCaptured, isEnpassantMove, isCastleMove) -> Move
 
     ranksToRows={'1':7,'2':6,'3':5,'4':4,'5':3,'6':2,'7':1,'8':0}
     rowsToRanks={v:k for k,v in ranksToRows.items()}
@@ -390,6 +1198,19 @@ class Move():
 
         self.moveID=self.startRow*1000+self.startCol*100+self.endRow*10+self.endCol
 
+    '''
+    The shared Move for these squares, pieces and flags, created on first use.
+    Used by move generation so positions don't allocate a new object per move;
+    the cache is bounded by the number of distinct (squares, pieces, flags) combinations
+    '''
+    @classmethod
+    def interned(cls,startSq,endSq,board,isEnpassantMove=False,isCastleMove=False):
+        key=(startSq,endSq,board[startSq[0]][startSq[1]],board[endSq[0]][endSq[1]],isEnpassantMove,isCastleMove)
+        move=cls.cache.get(key)
+        if move is None:
+            move=cls.cache[key]=cls(startSq,endSq,board,isEnpassantMove,isCastleMove)
+        return move
+
     '''
     Overriding the equals method
     '''
@@ -398,6 +1219,12 @@ class Move():
             return self.moveID==other.moveID
         return False
 
+    '''
+    Equal moves (same start and end square) hash alike, so moves can be used in sets and dict keys
+    '''
+    def __hash__(self):
+        return self.moveID
+
     '''
     Get the chess notation of the move
     '''
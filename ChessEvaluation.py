@@ -0,0 +1,119 @@
+#evaluation terms shared by the engine and the search
+#material plus piece-square scores tapered between middlegame and endgame tables by the material left on the board
+
+pieceValues={'p':100,'N':320,'B':330,'R':500,'Q':900,'K':0}
+
+'''
+Middlegame piece-square tables from White's point of view, row 0 is the 8th rank (same layout as GameState.board).
+Black uses the same tables mirrored vertically
+'''
+pawnScores=[[0,0,0,0,0,0,0,0],
+            [50,50,50,50,50,50,50,50],
+            [10,10,20,30,30,20,10,10],
+            [5,5,10,25,25,10,5,5],
+            [0,0,0,20,20,0,0,0],
+            [5,-5,-10,0,0,-10,-5,5],
+            [5,10,10,-20,-20,10,10,5],
+            [0,0,0,0,0,0,0,0]]
+knightScores=[[-50,-40,-30,-30,-30,-30,-40,-50],
+              [-40,-20,0,0,0,0,-20,-40],
+              [-30,0,10,15,15,10,0,-30],
+              [-30,5,15,20,20,15,5,-30],
+              [-30,0,15,20,20,15,0,-30],
+              [-30,5,10,15,15,10,5,-30],
+              [-40,-20,0,5,5,0,-20,-40],
+              [-50,-40,-30,-30,-30,-30,-40,-50]]
+bishopScores=[[-20,-10,-10,-10,-10,-10,-10,-20],
+              [-10,0,0,0,0,0,0,-10],
+              [-10,0,5,10,10,5,0,-10],
+              [-10,5,5,10,10,5,5,-10],
+              [-10,0,10,10,10,10,0,-10],
+              [-10,10,10,10,10,10,10,-10],
+              [-10,5,0,0,0,0,5,-10],
+              [-20,-10,-10,-10,-10,-10,-10,-20]]
+rookScores=[[0,0,0,0,0,0,0,0],
+            [5,10,10,10,10,10,10,5],
+            [-5,0,0,0,0,0,0,-5],
+            [-5,0,0,0,0,0,0,-5],
+            [-5,0,0,0,0,0,0,-5],
+            [-5,0,0,0,0,0,0,-5],
+            [-5,0,0,0,0,0,0,-5],
+            [0,0,0,5,5,0,0,0]]
+queenScores=[[-20,-10,-10,-5,-5,-10,-10,-20],
+             [-10,0,0,0,0,0,0,-10],
+             [-10,0,5,5,5,5,0,-10],
+             [-5,0,5,5,5,5,0,-5],
+             [0,0,5,5,5,5,0,-5],
+             [-10,5,5,5,5,5,0,-10],
+             [-10,0,5,0,0,0,0,-10],
+             [-20,-10,-10,-5,-5,-10,-10,-20]]
+kingScores=[[-30,-40,-40,-50,-50,-40,-40,-30],
+            [-30,-40,-40,-50,-50,-40,-40,-30],
+            [-30,-40,-40,-50,-50,-40,-40,-30],
+            [-30,-40,-40,-50,-50,-40,-40,-30],
+            [-20,-30,-30,-40,-40,-30,-30,-20],
+            [-10,-20,-20,-20,-20,-20,-20,-10],
+            [20,20,0,0,0,0,20,20],
+            [20,30,10,0,0,10,30,20]]
+midgameScores={'p':pawnScores,'N':knightScores,'B':bishopScores,'R':rookScores,'Q':queenScores,'K':kingScores}
+
+'''
+Endgame tables: pawns gain value as they advance and the king heads for the centre;
+the other pieces keep their middlegame tables
+'''
+pawnEndgameScores=[[0,0,0,0,0,0,0,0],
+                   [80,80,80,80,80,80,80,80],
+                   [50,50,50,50,50,50,50,50],
+                   [30,30,30,30,30,30,30,30],
+                   [15,15,15,15,15,15,15,15],
+                   [5,5,5,5,5,5,5,5],
+                   [0,0,0,0,0,0,0,0],
+                   [0,0,0,0,0,0,0,0]]
+kingEndgameScores=[[-50,-40,-30,-20,-20,-30,-40,-50],
+                   [-30,-20,-10,0,0,-10,-20,-30],
+                   [-30,-10,20,30,30,20,-10,-30],
+                   [-30,-10,30,40,40,30,-10,-30],
+                   [-30,-10,30,40,40,30,-10,-30],
+                   [-30,-10,20,30,30,20,-10,-30],
+                   [-30,-30,0,0,0,0,-30,-30],
+                   [-50,-30,-30,-30,-30,-30,-30,-50]]
+endgameScores=dict(midgameScores,p=pawnEndgameScores,K=kingEndgameScores)
+
+PHASE_WEIGHTS={'p':0,'N':1,'B':1,'R':2,'Q':4,'K':0}
+TOTAL_PHASE=24  # the phase of the starting position: all minor and major pieces on the board
+
+'''
+Per piece ('wp', 'bK', ...) lookups used by the running totals in GameState, signed so White is positive:
+MATERIAL[piece], MIDGAME[piece][r][c], ENDGAME[piece][r][c] and PHASE[piece]
+'''
+def signedTable(table,color):
+    if color=='w':
+        return [row[:] for row in table]
+    return [[-score for score in row] for row in table[::-1]]
+
+MATERIAL={color+kind:pieceValues[kind]*(1 if color=='w' else -1) for color in 'wb' for kind in pieceValues}
+MIDGAME={color+kind:signedTable(midgameScores[kind],color) for color in 'wb' for kind in pieceValues}
+ENDGAME={color+kind:signedTable(endgameScores[kind],color) for color in 'wb' for kind in pieceValues}
+PHASE={color+kind:PHASE_WEIGHTS[kind] for color in 'wb' for kind in pieceValues}
+
+'''
+Blend the middlegame and endgame scores by the phase (TOTAL_PHASE is all middlegame, 0 all endgame)
+'''
+def taper(material,midgame,endgame,phase):
+    phase=min(phase,TOTAL_PHASE)
+    return material+(midgame*phase+endgame*(TOTAL_PHASE-phase))//TOTAL_PHASE
+
+'''
+Running totals (material, midgame, endgame, phase) of a board recomputed square by square
+'''
+def computeTotals(board):
+    material=midgame=endgame=phase=0
+    for r in range(8):
+        for c in range(8):
+            piece=board[r][c]
+            if piece!='--':
+                material+=MATERIAL[piece]
+                midgame+=MIDGAME[piece][r][c]
+                endgame+=ENDGAME[piece][r][c]
+                phase+=PHASE[piece]
+    return material,midgame,endgame,phase
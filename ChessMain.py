@@ -1,11 +1,26 @@
+import argparse
+import sys
 import pygame as p
+import ChessAI
+import ChessBook
 import ChessEngine 
+import ChessProfile
+import ChessTablebase
+import ChessWorker
 
 width=height=512
 dimension=8
 sq_size=width//dimension
 max_fps=15
+ai_think_time=1.0  # seconds per computer move
+ai_hash_mb=16  # transposition table size of the computer player
+board_colors=[(206, 238, 210),(92, 166, 110)]
+highlight_color=(246, 246, 105)
 IMAGES={}
+BOARD_IMAGE=[]  # the empty board, drawn once
+FONTS={}
+TEXTS={}  # text -> rendered (shadow, text) surfaces
+ENGINE_EVENT=p.USEREVENT+1  # posted by the engine worker when it has a result
 
 '''
 Initialize a global dictionary of images. This will be called exactly once in the main
@@ -14,29 +29,60 @@ def loadImages():
     pieces=['bR','bN','bB','bQ','bK','bB','bN','bR','bp','wR','wN','wB','wQ','wK','wB','wN','wR','wp'] 
     for piece in pieces:
         IMAGES[piece]=p.transform.scale(p.image.load("images/"+piece+".png"),(sq_size,sq_size))
+    board=p.Surface((width,height))
+    for r in range(dimension):
+        for c in range(dimension):
+            board.fill(board_colors[(r+c)%2],p.Rect(c*sq_size,r*sq_size,sq_size,sq_size))
+    BOARD_IMAGE[:]=[board]
 
 
 
 '''
-The main driver for our code. This will handle user input and updating the graphics
+The main driver for our code. This will handle user input and updating the graphics.
+Move generation and the computer's search run on an EngineWorker thread, so the window keeps redrawing
+and answering input at max_fps while the engine thinks.
+The loop sleeps until the next event (input or an engine result) and only redraws the squares that changed
+since the last frame, so an idle window uses next to no CPU
+- whiteAI / blackAI: the computer plays that side
+- ponder: against a human, the computer keeps searching on the human's time to fill its transposition table
+- book: a ChessBook.OpeningBook the computer plays from before it starts searching
+- tablebases: a ChessTablebase.Tablebases the computer's search uses for small endgames
 '''
-def main():
+def main(whiteAI=False,blackAI=False,ponder=True,book=None,tablebases=None):
     p.init()
     screen=p.display.set_mode((width,height))
     clock=p.time.Clock()
     screen.fill(p.Color("white"))
     gs=ChessEngine.GameState()
-    validMoves=gs.getValidMoves()
-    moveMade=False
+    validMoves=None  # legal moves of the current position, None until the worker has sent them
+    moveMade=True  # ask the worker for the first position's moves
     loadImages()
     sqSelected=()
     playerClicks=[]
+    #one searcher for the whole game so its transposition table carries over between moves
+    searcher=(ChessAI.Searcher(ai_think_time,info=ChessAI.printInfo,ttSizeMB=ai_hash_mb,tablebases=tablebases)
+              if whiteAI or blackAI else None)
+    worker=ChessWorker.EngineWorker(searcher,notify=lambda:p.event.post(p.event.Event(ENGINE_EVENT)))
+    searchJob=None
+    ponderJob=None
     running=True
+    gameOver=False
+    p.event.set_blocked(None)#nothing but these wakes the loop up
+    p.event.set_allowed([p.QUIT,p.MOUSEBUTTONDOWN,p.KEYDOWN,p.VIDEOEXPOSE,p.WINDOWEXPOSED,ENGINE_EVENT])
+    shown=None  # (board, selected square, status text) on the screen, None to redraw everything
     while running:
-        for e in p.event.get():
-            if e.type==p.QUIT:
+        humanTurn=not (whiteAI if gs.whiteToMove else blackAI)
+        events=p.event.get()
+        if not events and not moveMade:
+            events=[p.event.wait()]#idle until something happens
+        for e in events:
+            if e.type==p.VIDEOEXPOSE or e.type==p.WINDOWEXPOSED:
+                shown=None
+            elif e.type==p.QUIT:
                 running=False
-            elif e.type==p.MOUSEBUTTONDOWN:
+            elif e.type==p.MOUSEBUTTONDOWN and searchJob is not None:
+                searchJob.stop()#move now: the computer plays the best move it has found so far
+            elif e.type==p.MOUSEBUTTONDOWN and humanTurn and not gameOver and validMoves is not None:
                 #print(validMoves)
                 location=p.mouse.get_pos()
                 col=location[0]//sq_size
@@ -63,45 +109,117 @@ def main():
             elif e.type==p.KEYDOWN:
                 if e.key == p.K_ESCAPE:  #exit Escape key pressed
                     running = False
-                elif e.key==p.K_z:#undo when z is pressed
+                elif e.key==p.K_z:#undo when z is pressed, dropping whatever the engine was doing
+                    worker.cancelAll()
                     gs.undoMove()
+                    if not (whiteAI and blackAI) and (whiteAI if gs.whiteToMove else blackAI):
+                        gs.undoMove()#also take back the computer's reply so it is the human's turn again
                     moveMade=True
-        if moveMade:
-            validMoves=gs.getValidMoves()
+                    sqSelected=()
+                    playerClicks=[]
+
+        #results of the engine work
+        for job in worker.poll():
+            if job.kind=='moves':
+                validMoves,gs.checkMate,gs.staleMate=job.result
+            elif job is searchJob:
+                searchJob=None
+                if job.result is not None:
+                    gs.makeMove(job.result)
+                    moveMade=True
+
+        if moveMade:#new position: the old one's work is stale, ask for the new legal moves
+            worker.cancelAll()
+            searchJob=ponderJob=None
+            validMoves=None
+            gs.checkMate=gs.staleMate=False
+            worker.submit('moves',gs)
             moveMade=False
+            humanTurn=not (whiteAI if gs.whiteToMove else blackAI)
 
-        drawGameState(screen,gs)
-        
-        if gs.checkMate:
-            gameover=True 
-            if gs.whiteToMove:
-                drawText(screen,'Black Wins by Checkmate')
-            else:
-                drawText(screen,'White Wins by Checkmate')
-        elif gs.staleMate:
-            gameover=True 
-            drawText(screen,'Stalemate')
+        status=gameOverText(gs) if validMoves is not None else None
+        gameOver=status is not None
 
+        #computer move (from the opening book while the position is in it), or pondering while the human thinks
+        if validMoves is not None and not gameOver:
+            bookMove=book.pickMove(gs,validMoves) if book is not None and not humanTurn and searchJob is None else None
+            if bookMove is not None:
+                gs.makeMove(bookMove)
+                validMoves=None
+                moveMade=True
+            elif not humanTurn and searchJob is None:
+                searchJob=worker.submit('search',gs)
+            elif humanTurn and ponder and searcher is not None and ponderJob is None:
+                ponderJob=worker.submit('ponder',gs)
 
-        clock.tick(max_fps)
+        shown=drawFrame(screen,gs,sqSelected,status,shown)
+        clock.tick(max_fps)#caps the redraw rate when events come in bursts
+    worker.shutdown()
+
+'''
+Bring the window up to date and return what it now shows, (board, selected square, status text).
+shown is what the last frame showed, None to redraw everything
+'''
+def drawFrame(screen,gs,sqSelected,status,shown):
+    if shown is None or status!=shown[2]:#first frame, exposed window or the text changed
+        drawGameState(screen,gs,sqSelected)
+        if status is not None:
+            drawText(screen,status)
         p.display.flip()
+    else:
+        dirty={(r,c) for r in range(dimension) for c in range(dimension) if gs.board[r][c]!=shown[0][r][c]}
+        if sqSelected!=shown[1]:
+            dirty.update(square for square in (sqSelected,shown[1]) if square)
+        if dirty:
+            p.display.update(drawSquares(screen,gs.board,dirty,sqSelected))
+    return ([row[:] for row in gs.board],sqSelected,status)
+
+'''
+The text to show over the board when the game is over, None while it goes on
+'''
+def gameOverText(gs):
+    if gs.checkMate:
+        return 'Black Wins by Checkmate' if gs.whiteToMove else 'White Wins by Checkmate'
+    if gs.staleMate:
+        return 'Stalemate'
+    if gs.isThreefoldRepetition():
+        return 'Draw by Repetition'
+    if gs.isFiftyMoveDraw():
+        return 'Draw by 50-Move Rule'
+    if gs.isInsufficientMaterial():
+        return 'Draw by Insufficient Material'
+    return None
 
 '''
 Responsible for all the graphics within a current game state
 '''
-def drawGameState(screen,gs):
+def drawGameState(screen,gs,sqSelected=()):
     drawBoard(screen)
+    if sqSelected:
+        screen.fill(highlight_color,p.Rect(sqSelected[1]*sq_size,sqSelected[0]*sq_size,sq_size,sq_size))
     drawPieces(screen,gs.board)
 
 '''
-Draw the squares on the board. The top left square is always light
+Draw the squares on the board (pre-rendered once in loadImages). The top left square is always light
 '''
 def drawBoard(screen):
-    colors=[(206, 238, 210),(92, 166, 110)]
-    for r in range(dimension):
-        for c in range(dimension):
-            color=colors[(r+c)%2]
-            p.draw.rect(screen,color,p.Rect(c*sq_size,r*sq_size,sq_size,sq_size))
+    screen.blit(BOARD_IMAGE[0],(0,0))
+
+'''
+Redraw only the given squares (and the selection highlight). Returns their rects for p.display.update
+'''
+def drawSquares(screen,board,squares,sqSelected=()):
+    rects=[]
+    for r,c in squares:
+        rect=p.Rect(c*sq_size,r*sq_size,sq_size,sq_size)
+        if (r,c)==sqSelected:
+            screen.fill(highlight_color,rect)
+        else:
+            screen.blit(BOARD_IMAGE[0],rect,rect)
+        if board[r][c]!='--':
+            screen.blit(IMAGES[board[r][c]],rect)
+        rects.append(rect)
+    return rects
 
 '''
 Draw the pieces on the board using the current GameState.board
@@ -117,12 +235,38 @@ def drawPieces(screen,board):
 Draws the text on the screen
 '''
 def drawText(screen,text):
-    font=p.font.SysFont("Helvitca",32,True,False)
-    textObject=font.render(text,0,p.Color("Gray"))
+    if text not in TEXTS:#fonts and rendered text are made once and reused
+        if 'text' not in FONTS:
+            FONTS['text']=p.font.SysFont("Helvitca",32,True,False)
+        font=FONTS['text']
+        TEXTS[text]=(font.render(text,0,p.Color("Gray")),font.render(text,0,p.Color('Black')))
+    shadow,textObject=TEXTS[text]
     textLocation=p.Rect(0,0,width,height).move(width/2 - textObject.get_width()/2,height/2 - textObject.get_height()/2)
-    screen.blit(textObject,textLocation)
-    textObject=font.render(text,0,p.Color('Black'))
+    screen.blit(shadow,textLocation)
     screen.blit(textObject,textLocation.move(2,2))
 
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    parser=argparse.ArgumentParser(description='Play chess')
+    parser.add_argument('--ai',choices=('white','black','both'),help='let the computer play this side')
+    parser.add_argument('--no-ponder',action='store_true',help="don't let the computer think on your time")
+    parser.add_argument('--book',help='opening book file (see ChessBook.py) for the computer')
+    parser.add_argument('--tablebases',help='directory of endgame tables (see ChessTablebase.py) for the computer')
+    parser.add_argument('--profile-json',help='instrument the engine and frame drawing, write the report here on exit')
+    parser.add_argument('--profile-pstats',help='same, as a cProfile-compatible stats file')
+    args=parser.parse_args()
+    profiling=args.profile_json or args.profile_pstats
+    if profiling:
+        ChessProfile.register(sys.modules[__name__],'drawFrame','gui')
+        ChessProfile.enable()
+    book=ChessBook.OpeningBook(args.book) if args.book else None
+    tablebases=ChessTablebase.Tablebases(args.tablebases) if args.tablebases else None
+    main(whiteAI=args.ai in ('white','both'),blackAI=args.ai in ('black','both'),ponder=not args.no_ponder,book=book,
+         tablebases=tablebases)
+    if book is not None:
+        book.close()
+    if profiling:
+        ChessProfile.disable()
+        if args.profile_json:
+            ChessProfile.writeJson(args.profile_json)
+        if args.profile_pstats:
+            ChessProfile.writePstats(args.profile_pstats)
\ No newline at end of file
@@ -0,0 +1,257 @@
+#streaming PGN validator for large game archives
+#games are read one at a time, replayed through GameState.getValidMoves and written out as JSON lines,
+#so memory stays flat however big the archive is
+
+import argparse
+import concurrent.futures
+import gzip
+import json
+import re
+import sys
+import time
+import ChessEngine
+import ChessPerft
+
+RESULTS=('1-0','0-1','1/2-1/2','*')
+TOKEN=re.compile(r'\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s(){};$.]+')
+SAN=re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?[+#]?[!?]*$')
+CASTLE=re.compile(r'^([O0]-[O0](-[O0])?)[+#]?[!?]*$')
+
+class PgnError(Exception):
+    '''
+    A move that can't be played: status is 'illegal' (no such legal move), 'ambiguous', 'unsupported'
+    (underpromotion, the engine always promotes to a Queen) or 'parse' (not SAN at all)
+    '''
+    def __init__(self,status,san):
+        Exception.__init__(self,'%s move %s'%(status,san))
+        self.status=status
+        self.san=san
+
+'''
+Open a PGN archive for reading as text; gzip is recognised by its magic bytes, '-' is stdin
+'''
+def openPgn(path):
+    if path=='-':
+        return sys.stdin
+    with open(path,'rb') as f:
+        magic=f.read(2)
+    if magic==b'\x1f\x8b':
+        return gzip.open(path,'rt',encoding='utf-8',errors='replace')
+    return open(path,encoding='utf-8',errors='replace')
+
+'''
+Generator of (headers, movetext) for every game in a stream of PGN lines
+'''
+def readGames(lines):
+    headers={}
+    movetext=[]
+    inComment=False
+    for line in lines:
+        line=line.strip()
+        if not inComment and line.startswith('['):
+            if movetext:
+                yield headers,' '.join(movetext)
+                headers={}
+                movetext=[]
+            match=re.match(r'\[(\w+)\s+"(.*)"\]',line)
+            if match:
+                headers[match.group(1)]=match.group(2).replace('\\"','"')
+            continue
+        if line.startswith('%'):#escape line
+            continue
+        if line:
+            movetext.append(line)
+            inComment=line.rfind('{')>line.rfind('}') or (inComment and '}' not in line)
+    if headers or movetext:
+        yield headers,' '.join(movetext)
+
+'''
+The main-line SAN moves of a movetext and its result token (None if missing).
+Comments, variations, NAGs and move numbers are skipped
+'''
+def parseMovetext(movetext):
+    sans=[]
+    depth=0
+    for token in TOKEN.findall(movetext):
+        first=token[0]
+        if token=='(':
+            depth+=1
+        elif token==')':
+            depth=max(0,depth-1)
+        elif depth or first in '{;$' or (first.isdigit() and token.endswith('.')):
+            continue
+        elif token in RESULTS:
+            return sans,token
+        else:
+            sans.append(token)
+    return sans,None
+
+'''
+Find the legal move a SAN string stands for. Raises PgnError
+'''
+def sanToMove(san,moves):
+    castle=CASTLE.match(san)
+    if castle:
+        endCol=2 if castle.group(2) else 6
+        for move in moves:
+            if move.isCastleMove and move.endCol==endCol:
+                return move
+        raise PgnError('illegal',san)
+    match=SAN.match(san)
+    if not match:
+        raise PgnError('parse',san)
+    piece,fromFile,fromRank,target,promotion=match.groups()
+    piece=piece or 'p'
+    endRow,endCol=ChessEngine.Move.ranksToRows[target[1]],ChessEngine.Move.filesToCols[target[0]]
+    startCol=ChessEngine.Move.filesToCols[fromFile] if fromFile else None
+    startRow=ChessEngine.Move.ranksToRows[fromRank] if fromRank else None
+    found=None
+    for move in moves:
+        if (move.endRow==endRow and move.endCol==endCol and move.pieceMoved[1]==piece and not move.isCastleMove and
+                (startCol is None or move.startCol==startCol) and (startRow is None or move.startRow==startRow)):
+            if found is not None:
+                raise PgnError('ambiguous',san)
+            found=move
+    if found is None or (promotion and not found.isPawnPromotion):
+        raise PgnError('illegal',san)
+    if promotion and promotion!='Q':
+        raise PgnError('unsupported',san)
+    return found
+
+'''
+Replay one game. Returns its result dict:
+- index, headers, result (the result token of the movetext)
+- status: 'ok', 'fen' for an unreadable FEN tag, the PgnError status of the first bad move with
+  error/ply (0-based) of that move, or 'error' with error/ply when the engine itself fails on the game
+- plies: moves replayed, fen: position after them, termination: 'checkmate', 'stalemate',
+  'repetition', 'fiftyMove', 'insufficientMaterial' or None for the final position (not for 'error')
+- fens: the FEN after every ply, only if allFens
+A game never raises: one broken game gets its status line and the rest of the archive goes on
+'''
+def validateGame(index,headers,movetext,allFens=False,backend='list'):
+    record={'index':index,'headers':headers}
+    try:
+        gs=ChessPerft.newGameState(headers.get('FEN',ChessPerft.POSITIONS[0]['fen']),backend=backend)
+    except Exception as e:
+        record.update(status='fen',error=str(e),plies=0)
+        return record
+    sans,result=parseMovetext(movetext)
+    record['result']=result
+    fens=[] if allFens else None
+    status='ok'
+    try:
+        moves=gs.getValidMoves()
+        for ply,san in enumerate(sans):
+            try:
+                move=sanToMove(san,moves)
+            except PgnError as e:
+                status=e.status
+                record['error']=san
+                record['ply']=ply
+                break
+            gs.makeMove(move)
+            if allFens:
+                fens.append(gs.getFen())
+            moves=gs.getValidMoves()
+        record['fen']=gs.getFen()
+        if gs.checkMate:
+            record['termination']='checkmate'
+        elif gs.staleMate:
+            record['termination']='stalemate'
+        elif gs.isThreefoldRepetition():
+            record['termination']='repetition'
+        elif gs.isFiftyMoveDraw():
+            record['termination']='fiftyMove'
+        elif gs.isInsufficientMaterial():
+            record['termination']='insufficientMaterial'
+        else:
+            record['termination']=None
+    except Exception as e:#an engine failure
+        status='error'
+        record['error']='%s: %s'%(type(e).__name__,e)
+        record['ply']=len(gs.moveLog)
+    record['status']=status
+    record['plies']=len(gs.moveLog)
+    if allFens:
+        record['fens']=fens
+    return record
+
+'''
+Worker: validate a chunk of (index, headers, movetext)
+'''
+def validateChunk(chunk,allFens,backend):
+    return [validateGame(index,headers,movetext,allFens,backend) for index,headers,movetext in chunk]
+
+def chunked(games,chunkSize):
+    chunk=[]
+    for index,(headers,movetext) in enumerate(games):
+        chunk.append((index,headers,movetext))
+        if len(chunk)==chunkSize:
+            yield chunk
+            chunk=[]
+    if chunk:
+        yield chunk
+
+'''
+Generator of result dicts, in archive order.
+With workers > 1 chunks of games go to a process pool; at most 2 chunks per worker are in flight,
+so memory is bounded by the chunk size rather than the archive size
+'''
+def validateGames(games,workers=1,chunkSize=64,allFens=False,backend='list'):
+    if workers<=1:
+        for index,(headers,movetext) in enumerate(games):
+            yield validateGame(index,headers,movetext,allFens,backend)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending=[]
+        for chunk in chunked(games,chunkSize):
+            pending.append(executor.submit(validateChunk,chunk,allFens,backend))
+            if len(pending)>=2*workers:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Validate PGN archives (plain or gzip) against ChessEngine')
+    parser.add_argument('pgn',nargs='+',help="PGN files, '-' for stdin")
+    parser.add_argument('--out',default='-',help='JSON lines output file (default stdout)')
+    parser.add_argument('--workers',type=int,default=1,help='worker processes (default 1, in-process)')
+    parser.add_argument('--chunk',type=int,default=64,help='games per worker task')
+    parser.add_argument('--fens',action='store_true',help='include the FEN after every ply')
+    parser.add_argument('--backend',choices=('list','bitboard'),default='list',help='GameState board representation')
+    parser.add_argument('--progress',type=int,default=10000,help='report throughput every N games (0 = only at the end)')
+    args=parser.parse_args(argv)
+
+    def games():
+        for path in args.pgn:
+            f=openPgn(path)
+            try:
+                yield from readGames(f)
+            finally:
+                if f is not sys.stdin:
+                    f.close()
+
+    out=sys.stdout if args.out=='-' else open(args.out,'w')
+    counts={}
+    plies=0
+    start=time.perf_counter()
+    try:
+        for n,record in enumerate(validateGames(games(),args.workers,args.chunk,args.fens,args.backend),1):
+            out.write(json.dumps(record)+'\n')
+            counts[record['status']]=counts.get(record['status'],0)+1
+            plies+=record['plies']
+            if args.progress and n%args.progress==0:
+                seconds=time.perf_counter()-start
+                print('%d games  %.0f games/sec  %.0f plies/sec'%(n,n/seconds,plies/seconds),file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds=time.perf_counter()-start
+    games=sum(counts.values())
+    print('%d games  %d plies  %.2fs  %.0f games/sec  %.0f plies/sec  %s'%(games,plies,seconds,
+          games/seconds if seconds>0 else 0,plies/seconds if seconds>0 else 0,
+          '  '.join('%s %d'%item for item in sorted(counts.items()))),file=sys.stderr)
+    return 0 if counts.get('ok',0)==games else 1
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#multi-core perft and search with a process pool
+#positions go to the workers as FEN strings plus the repetition history, never as pickled GameState objects
+
+import argparse
+import concurrent.futures
+import sys
+import time
+import ChessAI
+import ChessPerft
+
+'''
+Compact, picklable form of a position: its FEN and the keys of the earlier positions that can still repeat
+'''
+def packPosition(gs):
+    return (gs.getFen(),tuple(gs.zobristLog[max(0,len(gs.zobristLog)-1-gs.halfmoveClock):-1]))
+
+def unpackPosition(packed,backend='list'):
+    fen,history=packed
+    gs=ChessPerft.newGameState(fen,backend=backend)
+    for key in history:
+        gs.repetitionCounts[key]=gs.repetitionCounts.get(key,0)+1
+    return gs
+
+'''
+Worker: perft of one packed position
+'''
+def perftWorker(packed,depth,backend):
+    return ChessPerft.perft(unpackPosition(packed,backend),depth)
+
+'''
+Worker: iterative deepening search. Returns (depth, score, best move notation, nodes) for every completed depth
+'''
+def searchWorker(packed,rootMoveIDs,timeLimit,maxDepth,ttSizeMB,startDepth,backend):
+    gs=unpackPosition(packed,backend)
+    results=[]
+    searcher=ChessAI.Searcher(timeLimit=timeLimit,maxDepth=maxDepth,ttSizeMB=ttSizeMB,
+                              info=lambda info:results.append((info['depth'],info['score'],info['pv'][0] if info['pv'] else None,
+                                                               info['nodes'])))
+    searcher.search(gs,rootMoveIDs=rootMoveIDs,startDepth=startDepth)
+    return results,searcher.nodes
+
+'''
+Perft split by root move across the pool. Returns the total node count
+'''
+def parallelPerft(executor,gs,depth,backend='list'):
+    if depth<=1:
+        return ChessPerft.perft(gs,depth)
+    futures=[]
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        futures.append(executor.submit(perftWorker,packPosition(gs),depth-1,backend))
+        gs.undoMove()
+    return sum(future.result() for future in futures)
+
+'''
+Parallel search of the position.
+- 'split': the root moves are dealt round-robin to the workers, each searches only its share; the answer is
+  the best move at the deepest depth every worker completed
+- 'lazy': shared-nothing Lazy SMP, every worker searches the whole position with its own transposition table,
+  odd workers start one depth deeper so they diverge; the deepest result wins
+Returns (best move notation, score, depth, total nodes)
+'''
+def parallelSearch(executor,gs,workers,timeLimit=1.0,maxDepth=ChessAI.MAX_PLY,mode='split',ttSizeMB=16,backend='list'):
+    packed=packPosition(gs)
+    if mode=='split':
+        searcher=ChessAI.Searcher(maxDepth=1,ttSizeMB=0)
+        searcher.search(gs)#one shallow pass for a sensible move order before dealing them out
+        moves=gs.getValidMoves()
+        if len(moves)==0:
+            return None,0,0,0
+        best=searcher.bestMove
+        moves.sort(key=lambda move:move!=best)
+        shares=[[move.moveID for move in moves[i::workers]] for i in range(min(workers,len(moves)))]
+        futures=[executor.submit(searchWorker,packed,share,timeLimit,maxDepth,ttSizeMB,1,backend) for share in shares]
+    else:
+        futures=[executor.submit(searchWorker,packed,None,timeLimit,maxDepth,ttSizeMB,1+i%2,backend)
+                 for i in range(workers)]
+    outcomes=[future.result() for future in futures]
+    nodes=sum(workerNodes for _,workerNodes in outcomes)
+    results=[workerResults for workerResults,_ in outcomes if workerResults]
+    if not results:
+        return None,0,0,nodes
+    if mode=='split':
+        depth=min(workerResults[-1][0] for workerResults in results)
+        candidates=[next(r for r in workerResults if r[0]==depth) for workerResults in results]
+    else:
+        depth=max(workerResults[-1][0] for workerResults in results)
+        candidates=[workerResults[-1] for workerResults in results if workerResults[-1][0]==depth]
+    best=max(candidates,key=lambda r:r[1])
+    return best[2],best[1],depth,nodes
+
+'''
+Start the pool's processes before anything is timed
+'''
+def warmUp(executor,workers):
+    list(executor.map(abs,range(workers)))
+
+def benchmarkPerft(fen,depth,workerCounts,backend,out=sys.stdout):
+    baseline=None
+    for workers in workerCounts:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            warmUp(executor,workers)
+            gs=ChessPerft.newGameState(fen,backend=backend)
+            start=time.perf_counter()
+            nodes=parallelPerft(executor,gs,depth,backend)
+            seconds=time.perf_counter()-start
+        baseline=baseline or seconds
+        print('workers %2d  nodes %10d  %8.3fs  %10.0f nps  speedup %.2fx'%(workers,nodes,seconds,nodes/seconds,
+              baseline/seconds),file=out)
+
+'''
+timeLimit None searches to maxDepth and compares the time to reach it
+'''
+def benchmarkSearch(fen,timeLimit,maxDepth,mode,workerCounts,ttSizeMB,backend,out=sys.stdout):
+    baseline=None
+    for workers in workerCounts:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+            warmUp(executor,workers)
+            gs=ChessPerft.newGameState(fen,backend=backend)
+            start=time.perf_counter()
+            move,score,depth,nodes=parallelSearch(executor,gs,workers,timeLimit if timeLimit is not None else float('inf'),
+                                                  maxDepth,mode,ttSizeMB,backend)
+            seconds=time.perf_counter()-start
+        nps=nodes/seconds
+        #with a fixed depth the time to reach it is compared, with a time budget the node rate
+        speedup=(baseline/seconds if timeLimit is None else nps/baseline) if baseline else 1.0
+        if baseline is None:
+            baseline=seconds if timeLimit is None else nps
+        print('workers %2d  %s  move %s  score %d  depth %d  nodes %d  %.2fs  %.0f nps  speedup %.2fx'%(
+              workers,mode,move,score,depth,nodes,seconds,nps,speedup),file=out)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Parallel perft and search for ChessEngine')
+    parser.add_argument('command',choices=('perft','search'))
+    parser.add_argument('--fen',default=ChessPerft.POSITIONS[1]['fen'],help='position (default Kiwipete)')
+    parser.add_argument('--depth',type=int,help='perft depth (default 3) or fixed search depth')
+    parser.add_argument('--time',type=float,help='search time per run in seconds (default 5 unless --depth)')
+    parser.add_argument('--mode',choices=('split','lazy'),default='split',help='search parallelism')
+    parser.add_argument('--workers',default='1,2,4',help='comma separated worker counts to compare')
+    parser.add_argument('--hash',type=int,default=16,help='transposition table MB per worker')
+    parser.add_argument('--backend',choices=('list','bitboard'),default='list',help='GameState board representation')
+    args=parser.parse_args(argv)
+    workerCounts=[int(workers) for workers in args.workers.split(',')]
+    if args.command=='perft':
+        benchmarkPerft(args.fen,args.depth or 3,workerCounts,args.backend)
+    else:
+        timeLimit=args.time if args.time is not None or args.depth else 5.0
+        benchmarkSearch(args.fen,timeLimit,args.depth or ChessAI.MAX_PLY,args.mode,workerCounts,args.hash,args.backend)
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#perft (performance test) for the move generator
+#counts leaf nodes of the legal move tree and measures nodes/sec
+
+import argparse
+import json
+import sys
+import time
+import ChessBitboard
+import ChessEngine
+
+'''
+Reference positions with their known node counts per depth.
+The engine always promotes to a Queen, so only depths whose trees contain no pawn promotions are listed;
+at those depths the counts are identical to the published (all-promotions) numbers.
+'''
+POSITIONS=[
+    {'name':'startpos','fen':'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+     'nodes':{1:20,2:400,3:8902,4:197281,5:4865609}},
+    {'name':'kiwipete','fen':'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+     'nodes':{1:48,2:2039,3:97862}},
+    {'name':'position3','fen':'8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     'nodes':{1:14,2:191,3:2812,4:43238,5:674624}},
+    {'name':'position4','fen':'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     'nodes':{1:6}},
+    {'name':'illegal_ep_1','fen':'3k4/3p4/8/K1P4r/8/8/8/8 b - - 0 1',
+     'nodes':{1:18,2:92,3:1670,4:10138}},
+    {'name':'illegal_ep_2','fen':'8/8/4k3/8/2p5/8/B2P2K1/8 w - - 0 1',
+     'nodes':{1:13,2:102,3:1266,4:10276}},
+    {'name':'ep_gives_check','fen':'8/8/1k6/2b5/2pP4/8/5K2/8 b - d3 0 1',
+     'nodes':{1:15,2:126,3:1928,4:13931}},
+    {'name':'castling_all','fen':'r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1',
+     'nodes':{1:26,2:568,3:13744,4:314346}},
+    {'name':'short_castle_check','fen':'5k2/8/8/8/8/8/8/4K2R w K - 0 1',
+     'nodes':{1:15,2:66,3:1198,4:6399,6:661072}},
+    {'name':'long_castle_check','fen':'3k4/8/8/8/8/8/8/R3K3 w Q - 0 1',
+     'nodes':{1:16,2:71,3:1286,4:7418,6:803711}},
+    {'name':'castle_rook_capture','fen':'r3k2r/1b4bq/8/8/8/8/7B/R3K2R w KQkq - 0 1',
+     'nodes':{1:26,2:1141,3:27826,4:1274206}},
+    {'name':'castle_prevented','fen':'r3k2r/8/3Q4/8/8/5q2/8/R3K2R b KQkq - 0 1',
+     'nodes':{1:44,2:1494,3:50509,4:1720476}},
+]
+
+'''
+Build the GameState for a FEN on the chosen backend ('list' or 'bitboard')
+'''
+def newGameState(fen,trackAttacks=False,backend='list',checkConsistency=False):
+    if backend=='bitboard':
+        return ChessBitboard.BitboardGameState(checkConsistency=checkConsistency,fen=fen)
+    return ChessEngine.GameState(trackAttacks=trackAttacks,checkConsistency=checkConsistency,fen=fen)
+
+'''
+Count the leaf nodes of the legal move tree of the given depth
+'''
+def perft(gs,depth):
+    moves=gs.getValidMoves()
+    if depth<=1:
+        return len(moves) if depth==1 else 1
+    nodes=0
+    for move in moves:
+        gs.makeMove(move)
+        nodes+=perft(gs,depth-1)
+        gs.undoMove()
+    return nodes
+
+'''
+Perft split by root move. Returns a list of (notation, nodes)
+'''
+def divide(gs,depth):
+    results=[]
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        results.append((move.getChessNotation(),perft(gs,depth-1)))
+        gs.undoMove()
+    return results
+
+'''
+Run perft on a FEN and time it. Returns (nodes, seconds)
+'''
+def timedPerft(fen,depth,trackAttacks=False,backend='list',checkConsistency=False):
+    gs=newGameState(fen,trackAttacks,backend,checkConsistency)
+    start=time.perf_counter()
+    nodes=perft(gs,depth)
+    return nodes,time.perf_counter()-start
+
+'''
+Run every reference position up to maxDepth and compare against the known counts.
+Returns a list of result dicts, one per (position, depth)
+'''
+def runSuite(maxDepth,names=None,out=sys.stdout,trackAttacks=False,backend='list',checkConsistency=False):
+    results=[]
+    for pos in POSITIONS:
+        if names and pos['name'] not in names:
+            continue
+        for depth in sorted(pos['nodes']):
+            if depth>maxDepth:
+                break
+            nodes,seconds=timedPerft(pos['fen'],depth,trackAttacks,backend,checkConsistency)
+            expected=pos['nodes'][depth]
+            nps=nodes/seconds if seconds>0 else float('inf')
+            result={'name':pos['name'],'depth':depth,'nodes':nodes,'expected':expected,
+                    'ok':nodes==expected,'seconds':seconds,'nps':nps}
+            results.append(result)
+            print('%-20s depth %d  nodes %10d  %s  %8.3fs  %10.0f nps'%(pos['name'],depth,nodes,
+                  'ok  ' if result['ok'] else 'FAIL (expected %d)'%expected,seconds,nps),file=out)
+    return results
+
+'''
+Aggregate nodes/sec over a suite run
+'''
+def totalNps(results):
+    nodes=sum(r['nodes'] for r in results)
+    seconds=sum(r['seconds'] for r in results)
+    return nodes/seconds if seconds>0 else float('inf')
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Perft node counts and move generation speed for ChessEngine')
+    parser.add_argument('--depth',type=int,default=3,help='maximum depth (default 3)')
+    parser.add_argument('--fen',help='run a single position instead of the reference suite')
+    parser.add_argument('--position',action='append',help='only run the named reference position(s)')
+    parser.add_argument('--divide',action='store_true',help='print node counts per root move (needs --fen or --position)')
+    parser.add_argument('--attack-map',action='store_true',help='keep an incremental AttackMap during the search')
+    parser.add_argument('--backend',choices=('list','bitboard'),default='list',help='GameState board representation')
+    parser.add_argument('--check-consistency',action='store_true',help='verify the piece lists, evaluation and attack map after every move (slow)')
+    parser.add_argument('--list',action='store_true',help='list the reference positions and exit')
+    parser.add_argument('--min-nps',type=float,help='fail if the aggregate nodes/sec is below this')
+    parser.add_argument('--baseline',help='JSON file from --save-baseline; fail if nodes/sec regresses')
+    parser.add_argument('--tolerance',type=float,default=0.2,help='allowed nodes/sec drop vs baseline (default 0.2)')
+    parser.add_argument('--save-baseline',help='write the aggregate nodes/sec of this run to a JSON file')
+    args=parser.parse_args(argv)
+
+    if args.attack_map and args.backend!='list':
+        parser.error('--attack-map is only available on the list backend')
+
+    if args.list:
+        for pos in POSITIONS:
+            print('%-20s %s  depths %s'%(pos['name'],pos['fen'],sorted(pos['nodes'])))
+        return 0
+
+    if args.divide:
+        if args.fen:
+            fen=args.fen
+        elif args.position:
+            fen=next(pos['fen'] for pos in POSITIONS if pos['name']==args.position[0])
+        else:
+            parser.error('--divide needs --fen or --position')
+        start=time.perf_counter()
+        results=divide(newGameState(fen,args.attack_map,args.backend,args.check_consistency),args.depth)
+        seconds=time.perf_counter()-start
+        for notation,nodes in results:
+            print('%s: %d'%(notation,nodes))
+        total=sum(nodes for _,nodes in results)
+        print('\nmoves %d  nodes %d  %.3fs  %.0f nps'%(len(results),total,seconds,total/seconds if seconds>0 else 0))
+        return 0
+
+    if args.fen:
+        for depth in range(1,args.depth+1):
+            nodes,seconds=timedPerft(args.fen,depth,args.attack_map,args.backend,args.check_consistency)
+            print('depth %d  nodes %10d  %8.3fs  %10.0f nps'%(depth,nodes,seconds,nodes/seconds if seconds>0 else 0))
+        return 0
+
+    results=runSuite(args.depth,args.position,trackAttacks=args.attack_map,backend=args.backend,
+                     checkConsistency=args.check_consistency)
+    failed=[r for r in results if not r['ok']]
+    nps=totalNps(results)
+    print('\ntotal %d nodes, %.0f nps'%(sum(r['nodes'] for r in results),nps))
+    status=0
+    if failed:
+        print('FAIL: %d node count mismatch(es)'%len(failed),file=sys.stderr)
+        status=1
+    if args.min_nps is not None and nps<args.min_nps:
+        print('FAIL: %.0f nps is below the minimum of %.0f'%(nps,args.min_nps),file=sys.stderr)
+        status=1
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline=json.load(f)
+        floor=baseline['nps']*(1-args.tolerance)
+        if nps<floor:
+            print('FAIL: %.0f nps regressed more than %d%% from the baseline %.0f nps'%(nps,args.tolerance*100,baseline['nps']),
+                  file=sys.stderr)
+            status=1
+    if args.save_baseline and not failed:
+        with open(args.save_baseline,'w') as f:
+            json.dump({'depth':args.depth,'nodes':sum(r['nodes'] for r in results),'nps':nps},f,indent=2)
+    return status
+
+if __name__=="__main__":
+    sys.exit(main())
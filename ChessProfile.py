@@ -0,0 +1,287 @@
+#opt-in instrumentation of the engine's hot paths
+#enable() swaps timing wrappers into the classes and modules in HOOKS, disable() puts the original functions back,
+#so with profiling off the engine runs exactly the code it always did, with no flag tests on the hot path
+
+import argparse
+import contextlib
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+import ChessAI
+import ChessBitboard
+import ChessEngine
+import ChessPerft
+
+#(owner, attribute, category); a subclass override is instrumented separately from the method it overrides
+HOOKS=[
+    (ChessEngine.GameState,'getValidMoves','generation'),
+    (ChessEngine.GameState,'getValidMovesFrom','generation'),
+    (ChessEngine.GameState,'getAllPossibleMoves','generation'),
+    (ChessEngine.GameState,'legalMoves','legality'),
+    (ChessEngine.GameState,'checkForPinsAndChecks','legality'),
+    (ChessEngine.GameState,'isLegalKingOrEnpassantMove','legality'),
+    (ChessEngine.GameState,'inCheck','attack'),
+    (ChessEngine.GameState,'squareUnderAttack','attack'),
+    (ChessEngine.GameState,'squareAttackedBy','attack'),
+    (ChessEngine.GameState,'squareAttackedAfterKingMove','attack'),
+    (ChessEngine.GameState,'makeMove','makeUndo'),
+    (ChessEngine.GameState,'undoMove','makeUndo'),
+    (ChessEngine.GameState,'evaluate','evaluation'),
+    (ChessEngine.Move,'__init__','allocation'),
+    (ChessEngine.Move,'interned','allocation'),
+    (ChessBitboard.BitboardGameState,'getValidMoves','generation'),
+    (ChessBitboard.BitboardGameState,'getValidMovesFrom','generation'),
+    (ChessBitboard.BitboardGameState,'generateMoves','generation'),
+    (ChessBitboard.BitboardGameState,'inCheck','attack'),
+    (ChessBitboard.BitboardGameState,'squareUnderAttack','attack'),
+    (ChessBitboard.BitboardGameState,'squareAttackedBy','attack'),
+    (ChessBitboard.BitboardGameState,'squareAttackedAfterKingMove','attack'),
+    (ChessBitboard.BitboardGameState,'makeMove','makeUndo'),
+    (ChessBitboard.BitboardGameState,'undoMove','makeUndo'),
+]
+
+originals={}  # (owner, attribute) -> the attribute as it was before enable()
+categories={}  # key -> category
+threadStates=[]  # the ThreadState of every thread that ran an instrumented call
+lock=threading.Lock()
+local=threading.local()
+
+class ThreadState():
+    '''
+    Initialize the measurements of one thread, merged by report()
+    - stats: key -> [calls, total seconds, own seconds (without instrumented callees), max seconds, callers]
+      where callers maps the calling key (None at the top) to [calls, total seconds, own seconds]
+    - stack: [key, seconds spent in instrumented callees] of the instrumented calls in progress
+    '''
+    def __init__(self):
+        self.stats={}
+        self.stack=[]
+
+def threadState():
+    try:
+        return local.state
+    except AttributeError:
+        state=local.state=ThreadState()
+        with lock:
+            threadStates.append(state)
+        return state
+
+'''
+Name a function is reported under, e.g. 'GameState.makeMove' or 'ChessMain.drawFrame'
+'''
+def hookKey(owner,attribute):
+    name=owner.__name__
+    if name=='__main__':#a script registering its own functions is reported under its file name
+        name=os.path.splitext(os.path.basename(owner.__file__))[0]
+    return '%s.%s'%(name,attribute)
+
+def timed(key,function):
+    perfCounter=time.perf_counter
+    def wrapper(*args,**kwargs):
+        state=threadState()
+        stack=state.stack
+        caller=stack[-1][0] if stack else None
+        frame=[key,0.0]
+        stack.append(frame)
+        start=perfCounter()
+        try:
+            return function(*args,**kwargs)
+        finally:
+            elapsed=perfCounter()-start
+            stack.pop()
+            if stack:
+                stack[-1][1]+=elapsed
+            own=elapsed-frame[1]
+            entry=state.stats.get(key)
+            if entry is None:
+                entry=state.stats[key]=[0,0.0,0.0,0.0,{}]
+            entry[0]+=1
+            entry[1]+=elapsed
+            entry[2]+=own
+            if elapsed>entry[3]:
+                entry[3]=elapsed
+            callers=entry[4]
+            byCaller=callers.get(caller)
+            if byCaller is None:
+                byCaller=callers[caller]=[0,0.0,0.0]
+            byCaller[0]+=1
+            byCaller[1]+=elapsed
+            byCaller[2]+=own
+    wrapper.__wrapped__=function
+    wrapper.__name__=getattr(function,'__name__',key)
+    return wrapper
+
+'''
+Add a function to instrument, e.g. register(sys.modules[__name__],'drawFrame','gui') from a script.
+Takes effect at the next enable()
+'''
+def register(owner,attribute,category):
+    if not any(o is owner and a==attribute for o,a,c in HOOKS):
+        HOOKS.append((owner,attribute,category))
+
+def isEnabled():
+    return bool(originals)
+
+'''
+Install the wrappers. Only attributes the owner defines itself are wrapped, so an inherited method is
+not counted twice
+'''
+def enable():
+    for owner,attribute,category in HOOKS:
+        if (owner,attribute) in originals or attribute not in vars(owner):
+            continue
+        original=vars(owner)[attribute]
+        key=hookKey(owner,attribute)
+        categories[key]=category
+        originals[(owner,attribute)]=original
+        if isinstance(original,classmethod):
+            setattr(owner,attribute,classmethod(timed(key,original.__func__)))
+        else:
+            setattr(owner,attribute,timed(key,original))
+
+def disable():
+    for (owner,attribute),original in originals.items():
+        setattr(owner,attribute,original)
+    originals.clear()
+
+'''
+Forget everything measured so far
+'''
+def reset():
+    with lock:
+        for state in threadStates:
+            state.stats.clear()
+
+'''
+Measure the code inside the with block: reset, enable, and disable again at the end
+'''
+@contextlib.contextmanager
+def profiled():
+    reset()
+    enable()
+    try:
+        yield
+    finally:
+        disable()
+
+def mergedStats():
+    merged={}
+    with lock:
+        states=list(threadStates)
+    for state in states:
+        for key,(calls,total,own,longest,callers) in list(state.stats.items()):
+            entry=merged.setdefault(key,[0,0.0,0.0,0.0,{}])
+            entry[0]+=calls
+            entry[1]+=total
+            entry[2]+=own
+            entry[3]=max(entry[3],longest)
+            for caller,(callerCalls,callerTotal,callerOwn) in list(callers.items()):
+                byCaller=entry[4].setdefault(caller,[0,0.0,0.0])
+                byCaller[0]+=callerCalls
+                byCaller[1]+=callerTotal
+                byCaller[2]+=callerOwn
+    return merged
+
+'''
+The measurements as a JSON-ready dict:
+- functions: key -> calls, seconds (including callees), ownSeconds, meanMicroseconds, maxMicroseconds, category, callers
+- categories: category -> calls and ownSeconds summed over its functions
+- perGeneration: attack tests, legality calls, Move.interned lookups and new Move objects per getValidMoves
+'''
+def report():
+    merged=mergedStats()
+    functions={}
+    byCategory={}
+    for key,(calls,total,own,longest,callers) in sorted(merged.items(),key=lambda item:-item[1][2]):
+        category=categories.get(key,'other')
+        functions[key]={'category':category,'calls':calls,'seconds':total,'ownSeconds':own,
+                        'meanMicroseconds':total/calls*1e6,'maxMicroseconds':longest*1e6,
+                        'callers':{str(caller):callerCalls for caller,(callerCalls,_,_) in callers.items()}}
+        summary=byCategory.setdefault(category,{'calls':0,'ownSeconds':0.0})
+        summary['calls']+=calls
+        summary['ownSeconds']+=own
+    generations=sum(merged[key][0] for key in merged if key.endswith('.getValidMoves'))
+    perGeneration={}
+    if generations:
+        for name,category in (('attackTests','attack'),('legalityCalls','legality')):
+            if category in byCategory:
+                perGeneration[name]=byCategory[category]['calls']/generations
+        for name,key in (('moveLookups','Move.interned'),('movesAllocated','Move.__init__')):
+            if key in merged:
+                perGeneration[name]=merged[key][0]/generations
+    return {'functions':functions,'categories':byCategory,'generations':generations,'perGeneration':perGeneration}
+
+def writeJson(path,extra=None):
+    data=report()
+    if extra:
+        data.update(extra)
+    with open(path,'w') as f:
+        json.dump(data,f,indent=1)
+
+'''
+Write the measurements in the marshal format of cProfile/pstats, so pstats.Stats(path), snakeviz or gprof2dot
+read them like a cProfile run restricted to the instrumented functions
+'''
+def writePstats(path):
+    merged=mergedStats()
+    def label(key):
+        owner,attribute=next(((o,a) for o,a,c in HOOKS if hookKey(o,a)==key),(None,None))
+        function=originals.get((owner,attribute)) or (vars(owner).get(attribute) if owner is not None else None)
+        function=getattr(function,'__func__',function)
+        function=getattr(function,'__wrapped__',function)
+        code=getattr(function,'__code__',None)
+        if code is None:
+            return ('~',0,key)
+        return (code.co_filename,code.co_firstlineno,key)
+    stats={}
+    for key,(calls,total,own,longest,callers) in merged.items():
+        callerStats={label(caller):(callerCalls,callerCalls,callerOwn,callerTotal)
+                     for caller,(callerCalls,callerTotal,callerOwn) in callers.items() if caller is not None}
+        stats[label(key)]=(calls,calls,own,total,callerStats)
+    with open(path,'wb') as f:
+        marshal.dump(stats,f)
+
+def printReport(data,out=sys.stdout,limit=20):
+    print('%-44s %10s %10s %10s %10s'%('function','calls','own s','total s','mean us'),file=out)
+    for key,entry in list(data['functions'].items())[:limit]:
+        print('%-44s %10d %10.3f %10.3f %10.2f'%(key,entry['calls'],entry['ownSeconds'],entry['seconds'],
+              entry['meanMicroseconds']),file=out)
+    if data['perGeneration']:
+        print('per getValidMoves: '+'  '.join('%s %.1f'%item for item in data['perGeneration'].items()),file=out)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Profile ChessEngine hot paths on a perft or search run')
+    parser.add_argument('command',choices=('perft','search'))
+    parser.add_argument('--fen',default=ChessPerft.POSITIONS[1]['fen'],help='position (default Kiwipete)')
+    parser.add_argument('--depth',type=int,default=3,help='perft depth, or fixed search depth')
+    parser.add_argument('--time',type=float,help='search time in seconds instead of a fixed depth')
+    parser.add_argument('--backend',choices=('list','bitboard'),default='list',help='GameState board representation')
+    parser.add_argument('--json',help='write the report as JSON')
+    parser.add_argument('--pstats',help='write a cProfile-compatible stats file')
+    args=parser.parse_args(argv)
+    gs=ChessPerft.newGameState(args.fen,backend=args.backend)
+    start=time.perf_counter()
+    with profiled():
+        if args.command=='perft':
+            result=ChessPerft.perft(gs,args.depth)
+        else:
+            searcher=ChessAI.Searcher(timeLimit=args.time if args.time else float('inf'),
+                                      maxDepth=ChessAI.MAX_PLY if args.time else args.depth)
+            move=searcher.search(gs)
+            result=move.getChessNotation() if move else None
+        seconds=time.perf_counter()-start
+    data=report()
+    print('%s %s  %.2fs (instrumented)'%(args.command,result,seconds))
+    printReport(data)
+    if args.json:
+        writeJson(args.json,{'command':args.command,'fen':args.fen,'depth':args.depth,'backend':args.backend,
+                             'result':result,'seconds':seconds})
+    if args.pstats:
+        writePstats(args.pstats)
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,537 @@
+#headless game server: many GameState sessions behind one asyncio event loop
+#the protocol is one JSON object per line in each direction over TCP or a Unix socket. Legal moves and move
+#application run on a thread pool and searches on a process pool, so the event loop only parses, routes and replies
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import random
+import resource
+import sys
+import threading
+import time
+import ChessAI
+import ChessBook
+import ChessEngine
+import ChessParallel
+import ChessPerft
+import ChessTablebase
+
+COMMANDS=('new','moves','move','undo','fen','go','close','stats')
+LATENCY_SAMPLES=10000  # recent latencies kept per command for the percentiles
+
+class ProtocolError(Exception):
+    pass
+
+
+class Session():
+    '''
+    Initialize a session.
+    - id: the number clients address it by
+    - gs: its GameState; only touched by one request at a time (lock)
+    - lock: an asyncio.Lock serialising the requests of this session, so the executor threads never share a GameState
+    - validMoves: legal moves of the current position, None until computed
+    - requests, seconds, maxSeconds: request count, total and worst latency of this session
+    '''
+    def __init__(self,id,gs):
+        self.id=id
+        self.gs=gs
+        self.lock=asyncio.Lock()
+        self.validMoves=None
+        self.requests=0
+        self.seconds=0.0
+        self.maxSeconds=0.0
+
+'''
+Game over status of a position whose legal moves were just generated: 'checkmate', 'stalemate',
+'repetition', 'fiftyMove', 'insufficientMaterial' or None
+'''
+def gameStatus(gs):
+    if gs.checkMate:
+        return 'checkmate'
+    if gs.staleMate:
+        return 'stalemate'
+    if gs.isThreefoldRepetition():
+        return 'repetition'
+    if gs.isFiftyMoveDraw():
+        return 'fiftyMove'
+    if gs.isInsufficientMaterial():
+        return 'insufficientMaterial'
+    return None
+
+'''
+Executor jobs on a session's GameState. Each returns the new legal moves so the session never has to
+generate them on the event loop
+'''
+def legalMoves(gs):
+    return gs.getValidMoves()
+
+def playMove(gs,move):
+    gs.makeMove(move)
+    return gs.getValidMoves()
+
+def takeBack(gs):
+    gs.undoMove()
+    return gs.getValidMoves()
+
+'''
+Find the legal move for coordinate notation like 'e2e4' (a trailing 'q' for promotion is accepted,
+the engine always promotes to a Queen)
+'''
+def parseMove(text,moves):
+    if not isinstance(text,str) or len(text) not in (4,5) or (len(text)==5 and text[4].lower()!='q'):
+        raise ProtocolError('bad move %r'%(text,))
+    for move in moves:
+        if move.getChessNotation()==text[:4]:
+            return move
+    raise ProtocolError('illegal move %s'%text)
+
+workerConfig=(16,None)  # (ttSizeMB, tablebaseDir) the searchers of this process are built with
+workerLocal=threading.local()  # searcher: one Searcher per thread, so its transposition table stays warm between requests
+
+def initWorker(ttSizeMB,tablebaseDir=None):
+    global workerConfig
+    workerConfig=(ttSizeMB,tablebaseDir)
+
+'''
+The calling thread's Searcher. A search process runs one request at a time on one thread, but with workers=0
+the searches run on the thread pool, and a Searcher holds the state of the search in progress
+'''
+def workerSearcher():
+    searcher=getattr(workerLocal,'searcher',None)
+    if searcher is None:
+        ttSizeMB,tablebaseDir=workerConfig
+        tablebases=ChessTablebase.Tablebases(tablebaseDir) if tablebaseDir else None
+        searcher=workerLocal.searcher=ChessAI.Searcher(ttSizeMB=ttSizeMB,tablebases=tablebases)
+    return searcher
+
+'''
+Worker: search a packed position. Returns (moveID or 0, score, depth, nodes)
+'''
+def searchWorker(packed,timeLimit,maxDepth,backend):
+    gs=ChessParallel.unpackPosition(packed,backend)
+    searcher=workerSearcher()
+    searcher.timeLimit=timeLimit
+    searcher.maxDepth=min(maxDepth,ChessAI.MAX_PLY)
+    move=searcher.search(gs)
+    return (move.moveID if move else 0,searcher.score,searcher.depth,searcher.nodes)
+
+'''
+Approximate bytes held by one object graph: containers and plain objects are followed, strings, numbers,
+bound methods and Moves (shared via Move.interned) are not counted
+'''
+def deepSize(obj,seen):
+    if id(obj) in seen or isinstance(obj,(str,int,float,bool,type(None),ChessEngine.Move)) or callable(obj):
+        return 0
+    seen.add(id(obj))
+    size=sys.getsizeof(obj)
+    if isinstance(obj,dict):
+        size+=sum(deepSize(key,seen)+deepSize(value,seen) for key,value in obj.items())
+    elif isinstance(obj,(list,tuple,set,frozenset)):
+        size+=sum(deepSize(item,seen) for item in obj)
+    elif hasattr(obj,'__dict__'):
+        size+=deepSize(obj.__dict__,seen)
+    return size
+
+def percentile(sortedValues,fraction):
+    if not sortedValues:
+        return 0.0
+    return sortedValues[min(len(sortedValues)-1,int(fraction*len(sortedValues)))]
+
+
+class GameServer():
+    '''
+    Initialize the server.
+    - sessions: id -> Session for every open session
+    - threads: executor for legal moves, makeMove and undoMove on the sessions' GameStates
+    - processes: executor for searches (None runs them on the thread pool)
+    - maxSessions, maxTime: limits on open sessions and on the time of one search
+    - backend: 'list' or 'bitboard' GameState
+    - book: a ChessBook.OpeningBook "go" plays from before searching (None for no book)
+    - tablebaseDir: directory of ChessTablebase tables every search process opens (None for none)
+    - latencies: command -> the most recent request latencies in seconds; counts: command -> requests served
+    '''
+    def __init__(self,threads=4,workers=1,maxSessions=10000,maxTime=5.0,ttSizeMB=16,backend='list',book=None,tablebaseDir=None):
+        self.sessions={}
+        self.nextId=1
+        self.threads=concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+        self.processes=(concurrent.futures.ProcessPoolExecutor(max_workers=workers,initializer=initWorker,
+                                                               initargs=(ttSizeMB,tablebaseDir)) if workers>0 else None)
+        if self.processes is None:
+            initWorker(ttSizeMB,tablebaseDir)
+        self.maxSessions=maxSessions
+        self.maxTime=maxTime
+        self.backend=backend
+        self.book=book
+        self.latencies={command:collections.deque(maxlen=LATENCY_SAMPLES) for command in COMMANDS}
+        self.counts=dict.fromkeys(COMMANDS,0)
+        self.errors=0
+        self.connections=0
+        self.startTime=time.perf_counter()
+
+    def close(self):
+        self.threads.shutdown(cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(cancel_futures=True)
+
+    '''
+    Serve one client connection until it closes. Requests are handled concurrently (each answer carries the
+    request's id); requests to the same session run in order. The connection's sessions close with it
+    '''
+    async def handleConnection(self,reader,writer):
+        self.connections+=1
+        owned=set()
+        tasks=set()
+        try:
+            while True:
+                line=await reader.readline()
+                if not line:
+                    break
+                task=asyncio.create_task(self.answer(line,owned,writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError,ValueError):#ValueError: a line longer than the stream limit
+            pass
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks,return_exceptions=True)
+            for sessionId in owned:
+                self.sessions.pop(sessionId,None)
+            self.connections-=1
+            writer.close()
+
+    async def answer(self,line,owned,writer):
+        start=time.perf_counter()
+        command=None
+        requestId=None
+        try:
+            request=json.loads(line)
+            if not isinstance(request,dict):
+                raise ProtocolError('request must be a JSON object')
+            requestId=request.get('id')
+            command=request.get('cmd')
+            if command not in COMMANDS:
+                raise ProtocolError('unknown cmd %r'%(command,))
+            response=await self.dispatch(command,request,owned)
+            response['ok']=True
+        except ProtocolError as e:
+            response={'ok':False,'error':str(e)}
+        except ValueError as e:#bad JSON
+            response={'ok':False,'error':str(e)}
+        except Exception as e:#a bug must not leave the client waiting for an answer
+            response={'ok':False,'error':'internal error: %r'%e}
+        if requestId is not None:
+            response['id']=requestId
+        if not response['ok']:
+            self.errors+=1
+        try:
+            writer.write((json.dumps(response)+'\n').encode())
+            await writer.drain()
+        except ConnectionError:
+            return
+        seconds=time.perf_counter()-start
+        if command in self.counts:
+            self.counts[command]+=1
+            self.latencies[command].append(seconds)
+            session=self.sessions.get(response.get('session'))
+            if session is not None:
+                session.requests+=1
+                session.seconds+=seconds
+                session.maxSeconds=max(session.maxSeconds,seconds)
+
+    def session(self,request,owned):
+        sessionId=request.get('session')
+        if not isinstance(sessionId,int) or sessionId not in owned:
+            raise ProtocolError('no session %r on this connection'%(sessionId,))
+        return self.sessions[sessionId]
+
+    async def run(self,function,*args):
+        return await asyncio.get_running_loop().run_in_executor(self.threads,function,*args)
+
+    '''
+    Make sure the session's legal moves are known, generating them off the event loop
+    '''
+    async def ensureMoves(self,session):
+        if session.validMoves is None:
+            session.validMoves=await self.run(legalMoves,session.gs)
+        return session.validMoves
+
+    def position(self,session):
+        gs=session.gs
+        return {'session':session.id,'fen':gs.getFen(),'plies':len(gs.moveLog),'status':gameStatus(gs)}
+
+    async def dispatch(self,command,request,owned):
+        if command=='new':
+            if len(self.sessions)>=self.maxSessions:
+                raise ProtocolError('session limit %d reached'%self.maxSessions)
+            try:
+                gs=ChessPerft.newGameState(request.get('fen',ChessPerft.POSITIONS[0]['fen']),backend=self.backend)
+            except (ValueError,KeyError,IndexError,AttributeError) as e:
+                raise ProtocolError('bad FEN: %s'%e)
+            session=Session(self.nextId,gs)
+            self.nextId+=1
+            await self.ensureMoves(session)#registered only once it works, a failure leaves nothing behind
+            self.sessions[session.id]=session
+            owned.add(session.id)
+            return self.position(session)
+        if command=='stats':
+            return await self.stats(request,owned)
+        session=self.session(request,owned)
+        async with session.lock:
+            if command=='close':
+                owned.discard(session.id)
+                self.sessions.pop(session.id,None)
+                return {'session':session.id}
+            if command=='fen':
+                await self.ensureMoves(session)
+                return self.position(session)
+            if command=='moves':
+                moves=await self.ensureMoves(session)
+                response=self.position(session)
+                response['moves']=[move.getChessNotation() for move in moves]
+                return response
+            if command=='move':
+                move=parseMove(request.get('move'),await self.ensureMoves(session))
+                session.validMoves=None
+                session.validMoves=await self.run(playMove,session.gs,move)
+                return self.position(session)
+            if command=='undo':
+                if not session.gs.moveLog:
+                    raise ProtocolError('nothing to undo')
+                session.validMoves=None
+                session.validMoves=await self.run(takeBack,session.gs)
+                return self.position(session)
+            return await self.go(session,request)
+
+    '''
+    Search the session's position (a book move is answered at once with "book": true); with "play" the best
+    move is also made
+    '''
+    async def go(self,session,request):
+        moves=await self.ensureMoves(session)
+        try:
+            timeLimit=min(float(request.get('time',1.0)),self.maxTime)
+            maxDepth=int(request.get('depth',ChessAI.MAX_PLY))
+        except (TypeError,ValueError):
+            raise ProtocolError('bad time or depth')
+        if maxDepth<1:
+            raise ProtocolError('depth must be at least 1')
+        response={'move':None,'score':0,'depth':0,'nodes':0,'book':False}
+        bookMove=self.book.pickMove(session.gs,moves) if self.book is not None and moves else None
+        if bookMove is not None:
+            response.update(move=bookMove.getChessNotation(),book=True)
+            if request.get('play'):
+                session.validMoves=None
+                session.validMoves=await self.run(playMove,session.gs,bookMove)
+        elif moves:
+            packed=ChessParallel.packPosition(session.gs)
+            executor=self.processes or self.threads
+            moveID,score,depth,nodes=await asyncio.get_running_loop().run_in_executor(
+                executor,searchWorker,packed,timeLimit,maxDepth,self.backend)
+            move=next((move for move in moves if move.moveID==moveID),None)
+            response.update(move=move.getChessNotation() if move else None,score=score,depth=depth,nodes=nodes)
+            if move is not None and request.get('play'):
+                session.validMoves=None
+                session.validMoves=await self.run(playMove,session.gs,move)
+        response.update(self.position(session))
+        return response
+
+    '''
+    Server metrics: sessions, connections, requests and latency percentiles per command, process memory and
+    the approximate memory per session (measured on up to "sample" sessions). With a session id that
+    session's own request count, latencies and bytes are included as sessionStats
+    '''
+    async def stats(self,request,owned):
+        response={'sessions':len(self.sessions),'connections':self.connections,'errors':self.errors,
+                  'uptime':time.perf_counter()-self.startTime,
+                  'maxRssKB':resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+        commands={}
+        for command in COMMANDS:
+            if self.counts[command]:
+                latencies=sorted(self.latencies[command])
+                commands[command]={'requests':self.counts[command],'p50':percentile(latencies,0.5),
+                                   'p99':percentile(latencies,0.99),'max':latencies[-1]}
+        response['commands']=commands
+        sample=list(self.sessions.values())
+        sample=random.sample(sample,min(len(sample),int(request.get('sample',100))))
+        sizes=[await self.sessionBytes(session) for session in sample]
+        response['bytesPerSession']=sum(sizes)//len(sizes) if sizes else 0
+        if request.get('session') is not None:
+            session=self.session(request,owned)
+            response['sessionStats']={'id':session.id,'requests':session.requests,'bytes':await self.sessionBytes(session),
+                                 'meanSeconds':session.seconds/session.requests if session.requests else 0.0,
+                                 'maxSeconds':session.maxSeconds,'plies':len(session.gs.moveLog)}
+        return response
+
+    async def sessionBytes(self,session):
+        async with session.lock:#no executor thread is changing the GameState while it is measured
+            return deepSize(session,set())
+
+async def serve(server,host,port,unixPath=None):
+    if unixPath:
+        listener=await asyncio.start_unix_server(server.handleConnection,path=unixPath,limit=1<<20)
+        where=unixPath
+    else:
+        listener=await asyncio.start_server(server.handleConnection,host,port,limit=1<<20)
+        where='%s:%d'%(host,port)
+    print('serving on %s'%where,file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+class Client():
+    '''
+    Initialize a client on an open connection. Requests may be sent concurrently; answers are matched to them
+    by id
+    - pending: request id -> future of its answer
+    '''
+    def __init__(self,reader,writer):
+        self.reader=reader
+        self.writer=writer
+        self.pending={}
+        self.nextId=1
+        self.listener=asyncio.create_task(self.listen())
+
+    @classmethod
+    async def connect(cls,host='127.0.0.1',port=5555,unixPath=None):
+        if unixPath:
+            reader,writer=await asyncio.open_unix_connection(unixPath,limit=1<<20)
+        else:
+            reader,writer=await asyncio.open_connection(host,port,limit=1<<20)
+        return cls(reader,writer)
+
+    async def listen(self):
+        while True:
+            line=await self.reader.readline()
+            if not line:
+                break
+            response=json.loads(line)
+            future=self.pending.pop(response.get('id'),None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.pending.values():
+            future.set_exception(ConnectionError('server closed the connection'))
+
+    '''
+    Send one command and wait for its answer. Raises ProtocolError if the server reports an error
+    '''
+    async def request(self,command,**fields):
+        requestId=self.nextId
+        self.nextId+=1
+        future=asyncio.get_running_loop().create_future()
+        self.pending[requestId]=future
+        fields.update(cmd=command,id=requestId)
+        self.writer.write((json.dumps(fields)+'\n').encode())
+        await self.writer.drain()
+        response=await future
+        if not response['ok']:
+            raise ProtocolError(response['error'])
+        return response
+
+    async def close(self):
+        self.writer.close()
+        await self.listener
+
+
+'''
+Load generator: every session plays random legal games of up to "plies" moves, asking the server for a search
+every "goEvery" moves (0 never). Returns (latencies by command, requests, errors, seconds, final server stats)
+'''
+async def generateLoad(host,port,unixPath,sessions,connections,duration,plies=80,goEvery=0,goTime=0.05,seed=1):
+    rng=random.Random(seed)
+    latencies=collections.defaultdict(list)
+    counters={'requests':0,'errors':0}
+    clients=[await Client.connect(host,port,unixPath) for i in range(connections)]
+    deadline=time.perf_counter()+duration
+
+    async def timed(client,command,**fields):
+        start=time.perf_counter()
+        try:
+            return await client.request(command,**fields)
+        except ProtocolError:
+            counters['errors']+=1
+            return None
+        finally:
+            latencies[command].append(time.perf_counter()-start)
+            counters['requests']+=1
+
+    async def play(client):
+        while time.perf_counter()<deadline:
+            game=await timed(client,'new')
+            if game is None:
+                return
+            sessionId=game['session']
+            for ply in range(plies):
+                if time.perf_counter()>=deadline:
+                    break
+                if goEvery and ply%goEvery==goEvery-1:
+                    position=await timed(client,'go',session=sessionId,time=goTime,play=True)
+                else:
+                    moves=await timed(client,'moves',session=sessionId)
+                    if moves is None or not moves['moves']:
+                        break
+                    position=await timed(client,'move',session=sessionId,move=rng.choice(moves['moves']))
+                if position is None or position['status'] is not None:
+                    break
+            if time.perf_counter()<deadline:#games still running at the end stay open for the final stats
+                await timed(client,'close',session=sessionId)
+
+    start=time.perf_counter()
+    await asyncio.gather(*(play(clients[i%connections]) for i in range(sessions)))
+    seconds=time.perf_counter()-start
+    stats=await clients[0].request('stats')
+    for client in clients:#closing the connections closes their sessions
+        await client.close()
+    return latencies,counters['requests'],counters['errors'],seconds,stats
+
+def printLoad(latencies,requests,errors,seconds,stats,out=sys.stdout):
+    print('%d requests  %d errors  %.2fs  %.0f requests/sec'%(requests,errors,seconds,requests/seconds),file=out)
+    for command in COMMANDS:
+        if latencies.get(command):
+            values=sorted(latencies[command])
+            print('  %-6s %8d  p50 %7.2fms  p99 %7.2fms  max %7.2fms'%(command,len(values),percentile(values,0.5)*1000,
+                  percentile(values,0.99)*1000,values[-1]*1000),file=out)
+    print('server: %d sessions open  ~%d bytes/session  max RSS %d KB'%(stats['sessions'],stats['bytesPerSession'],
+          stats['maxRssKB']),file=out)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Multi-session chess game server and its load generator')
+    parser.add_argument('command',choices=('serve','load'))
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=5555)
+    parser.add_argument('--unix',help='Unix socket path instead of TCP')
+    parser.add_argument('--threads',type=int,default=4,help='serve: threads for legal moves and make/undo')
+    parser.add_argument('--workers',type=int,default=1,help='serve: search processes (0 = search on the threads)')
+    parser.add_argument('--max-sessions',type=int,default=10000,help='serve: open sessions allowed')
+    parser.add_argument('--max-time',type=float,default=5.0,help='serve: longest search in seconds')
+    parser.add_argument('--hash',type=int,default=16,help='serve: transposition table MB per search process')
+    parser.add_argument('--backend',choices=('list','bitboard'),default='list',help='serve: GameState board representation')
+    parser.add_argument('--book',help='serve: opening book file for "go"')
+    parser.add_argument('--tablebases',help='serve: endgame table directory for "go"')
+    parser.add_argument('--sessions',type=int,default=1000,help='load: concurrent games')
+    parser.add_argument('--connections',type=int,default=10,help='load: connections the games are spread over')
+    parser.add_argument('--duration',type=float,default=10.0,help='load: seconds to run')
+    parser.add_argument('--plies',type=int,default=80,help='load: moves per game before starting a new one')
+    parser.add_argument('--go-every',type=int,default=0,help='load: ask for a search every N moves (0 = never)')
+    parser.add_argument('--go-time',type=float,default=0.05,help='load: seconds per search')
+    args=parser.parse_args(argv)
+    if args.command=='serve':
+        book=ChessBook.OpeningBook(args.book) if args.book else None
+        server=GameServer(args.threads,args.workers,args.max_sessions,args.max_time,args.hash,args.backend,book,args.tablebases)
+        try:
+            asyncio.run(serve(server,args.host,args.port,args.unix))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            if book is not None:
+                book.close()
+    else:
+        printLoad(*asyncio.run(generateLoad(args.host,args.port,args.unix,args.sessions,args.connections,args.duration,
+                                            args.plies,args.go_every,args.go_time)))
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
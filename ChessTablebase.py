@@ -0,0 +1,466 @@
+#endgame tablebases for small material sets (KQK, KRK, KPK, KBNK, ...), built by retrograde analysis
+#every position of a material set gets one byte: draw, or the distance to mate in plies for the side to move.
+#Positions are index-encoded (side to move, white king folded by board symmetry, then 6 bits per piece), so a
+#table is a flat array; probes memory-map the file and read one byte
+
+import argparse
+import array
+import concurrent.futures
+import mmap
+import os
+import struct
+import sys
+import time
+import numpy as np
+import ChessEngine
+
+PIECE_ORDER='KQRBNP'  # pieces of one side are listed king first, then in this order
+HEADER=struct.Struct('<4s8sI')  # magic, material name, number of positions
+MAGIC=b'CTB1'
+DRAW=0
+INVALID=255  # illegal or unreachable index: pieces overlap, the side not to move is in check, ...
+MAX_PLIES=INVALID-2  # a byte holds plies+1
+CHUNK=1<<16  # positions per worker task
+EXTENSION='.ctb'
+DEAD_NAMES=('KK','KBK','KNK')  # dead whatever the squares, so they have no table
+
+'''
+Board symmetries as square maps (square = row*8+col): all 8 for pawnless material, only the left-right mirror
+once pawns are on the board
+'''
+def transform(square,flipRow,flipCol,swap):
+    r,c=divmod(square,8)
+    if swap:
+        r,c=c,r
+    if flipRow:
+        r=7-r
+    if flipCol:
+        c=7-c
+    return r*8+c
+
+SYMMETRIES=[[transform(sq,flipRow,flipCol,swap) for sq in range(64)]
+            for swap in (0,1) for flipRow in (0,1) for flipCol in (0,1)]
+PAWN_SYMMETRIES=[SYMMETRIES[0],SYMMETRIES[1]]  # identity, mirror files
+KING_REGION=[sq for sq in range(64) if sq%8<=3 and 7-sq//8<=sq%8]  # a1-d1-d4 triangle
+PAWN_KING_REGION=[sq for sq in range(64) if sq%8<=3]  # files a-d
+
+'''
+Split a material name like 'KBNK' into the white and black piece strings ('KBN', 'K')
+'''
+def splitName(name):
+    second=name.index('K',1)
+    return name[:second],name[second:]
+
+def sidePieces(kinds):
+    return 'K'+''.join(sorted((kind for kind in kinds if kind!='K'),key=PIECE_ORDER.index))
+
+'''
+Table name of a material set and whether its colours are swapped in the table (the stronger side is white)
+'''
+def materialName(white,black):
+    white,black=sidePieces(white),sidePieces(black)
+    strength=lambda side:(len(side),[-PIECE_ORDER.index(kind) for kind in side])
+    if strength(black)>strength(white):
+        return black+white,True
+    return white+black,False
+
+def dead(pieces,squares):
+    return ChessEngine.isDeadMaterial((color+kind,sq//8,sq%8) for (color,kind),sq in zip(pieces,squares))
+
+
+class Table():
+    '''
+    Initialize the layout of one material set.
+    - name: e.g. 'KQK'; white holds the first side
+    - pieces: (colour, kind) per slot: white king, white pieces, black king, black pieces
+    - symmetries, kingSquares, kingIndex, kingTransform: the board symmetries in use, the white king squares
+      of the folded region, their index and the symmetry that brings each white king square into it
+    - size: number of positions (both sides to move)
+    - data: the memory-mapped table once open() is called
+    '''
+    def __init__(self,name):
+        white,black=splitName(name)
+        if sidePieces(white)+sidePieces(black)!=name or materialName(white,black)!=(name,False):
+            raise ValueError('not a canonical material name: '+name)
+        self.name=name
+        self.pieces=[('w',kind) for kind in white]+[('b',kind) for kind in black]
+        hasPawns='P' in name
+        self.symmetries=PAWN_SYMMETRIES if hasPawns else SYMMETRIES
+        region=PAWN_KING_REGION if hasPawns else KING_REGION
+        self.kingSquares=region
+        self.kingIndex={sq:i for i,sq in enumerate(region)}
+        self.kingTransform=[next(t for t,symmetry in enumerate(self.symmetries) if symmetry[sq] in self.kingIndex)
+                            for sq in range(64)]
+        self.kings=len(region)
+        self.size=2*self.kings*64**(len(self.pieces)-1)
+        self.file=None
+        self.data=None
+
+    '''
+    Index of the position with the pieces on these squares (in slot order)
+    '''
+    def index(self,squares,whiteToMove):
+        symmetry=self.symmetries[self.kingTransform[squares[0]]]
+        index=(0 if whiteToMove else self.kings)+self.kingIndex[symmetry[squares[0]]]
+        for sq in squares[1:]:
+            index=index*64+symmetry[sq]
+        return index
+
+    '''
+    (squares, whiteToMove) of an index
+    '''
+    def decode(self,index):
+        squares=[]
+        for i in range(len(self.pieces)-1):
+            index,sq=divmod(index,64)
+            squares.append(sq)
+        whiteToMove,king=index<self.kings,index%self.kings
+        squares.append(self.kingSquares[king])
+        squares.reverse()
+        return squares,whiteToMove
+
+    def open(self,path):
+        self.file=open(path,'rb')
+        self.data=mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+        magic,name,size=HEADER.unpack_from(self.data,0)
+        if magic!=MAGIC or name.rstrip(b'\0').decode()!=self.name or size!=self.size:
+            self.close()
+            raise ValueError('%s is not the %s table'%(path,self.name))
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.file.close()
+        self.data=self.file=None
+
+    def value(self,index):
+        return self.data[HEADER.size+index]
+
+
+class Tablebases():
+    '''
+    Probe the tables in a directory; each is memory-mapped the first time a position needs it
+    - tables: name -> open Table (None for a table that has no file)
+    - maxPieces: most pieces (kings included) of any table in the directory, so callers can skip probing
+    '''
+    def __init__(self,directory):
+        self.directory=directory
+        self.tables={}
+        names=[entry[:-len(EXTENSION)] for entry in os.listdir(directory) if entry.endswith(EXTENSION)]
+        self.maxPieces=max((len(name) for name in names),default=2)
+
+    def path(self,name):
+        return os.path.join(self.directory,name+EXTENSION)
+
+    def table(self,name):
+        if name not in self.tables:
+            table=None
+            if os.path.exists(self.path(name)):
+                table=Table(name)
+                table.open(self.path(name))
+            self.tables[name]=table
+        return self.tables[name]
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table.close()
+        self.tables={}
+
+    '''
+    Table byte of the position with pieces [(colour, kind)] on squares: DRAW, plies to mate + 1, or None
+    without a table. Dead material is a draw without looking anything up
+    '''
+    def probeValue(self,pieces,squares,whiteToMove):
+        if dead(pieces,squares):
+            return DRAW
+        name,swapped=materialName([kind for color,kind in pieces if color=='w'],[kind for color,kind in pieces if color=='b'])
+        table=self.table(name)
+        if table is None:
+            return None
+        if swapped:#the table has the colours the other way round: swap them and mirror the ranks
+            pieces=[('b' if color=='w' else 'w',kind) for color,kind in pieces]
+            squares=[sq^56 for sq in squares]
+            whiteToMove=not whiteToMove
+        slots={}
+        for piece,sq in zip(pieces,squares):
+            slots.setdefault(piece,[]).append(sq)
+        ordered=[slots[piece].pop() for piece in table.pieces]
+        return table.value(table.index(ordered,whiteToMove))
+
+    '''
+    (wdl, plies) for the side to move of gs: wdl is 1 win, 0 draw, -1 loss, plies the distance to mate (None in a
+    draw). None when no table covers the position, or it has castling rights or a usable en passant capture
+    '''
+    def probe(self,gs):
+        pieces=[]
+        squares=[]
+        for piece,r,c in gs.pieces():
+            pieces.append((piece[0],piece[1].upper()))
+            squares.append(r*8+c)
+        if len(pieces)>self.maxPieces and not dead(pieces,squares):
+            return None
+        rights=gs.currentCastlingRight
+        if rights.wks or rights.wqs or rights.bks or rights.bqs or gs.enpassantZobrist():
+            return None
+        value=self.probeValue(pieces,squares,gs.whiteToMove)
+        if value is None or value==INVALID:
+            return None
+        if value==DRAW:
+            return 0,None
+        plies=value-1
+        return (1 if plies%2 else -1),plies
+
+    '''
+    The best move of gs by the tables: the fastest mate when winning, the longest resistance when losing.
+    Returns (move, wdl, plies) or None if a move leads out of the tables
+    '''
+    def bestMove(self,gs):
+        checkMate,staleMate=gs.checkMate,gs.staleMate
+        best=None
+        for move in gs.getValidMoves():
+            gs.makeMove(move)
+            result=self.probe(gs)
+            gs.undoMove()
+            if result is None:
+                best=None
+                break
+            wdl,plies=result
+            #rank from the mover's side: quick wins first, then draws, then slow losses
+            rank=(1,-plies) if wdl<0 else (0,0) if wdl==0 else (-1,plies)
+            if best is None or rank>best[0]:
+                best=(rank,move,-wdl,plies+1 if plies is not None else None)
+        gs.checkMate,gs.staleMate=checkMate,staleMate
+        return best[1:] if best is not None else None
+
+'''
+Material sets a table's captures and promotions lead to (dead ones left out)
+'''
+def successorNames(name):
+    white,black=splitName(name)
+    names=set()
+    for side,other,isWhite in ((white,black,True),(black,white,False)):
+        for i,kind in enumerate(side):
+            if kind=='K':
+                continue
+            rest=side[:i]+side[i+1:]
+            names.add(materialName(rest,other) if isWhite else materialName(other,rest))
+            if kind=='P':
+                promoted=side[:i]+'Q'+side[i+1:]
+                names.add(materialName(promoted,other) if isWhite else materialName(other,promoted))
+    return sorted(name for name,swapped in names if name not in DEAD_NAMES)
+
+workerState=None  # (GameState, Tablebases) of a generator process
+
+def initWorker(directory):
+    global workerState
+    workerState=(ChessEngine.GameState(fen='4k3/8/8/8/8/8/8/4K3 w - - 0 1'),Tablebases(directory))
+
+'''
+Worker: legal moves of the positions lo..hi-1 of a table, by GameState move generation.
+Returns (kinds, counts, targets, exits):
+- kinds: per position 0 invalid, 1 has moves, 2 checkmated, 3 stalemated
+- counts/targets: number of moves staying in the table and their target indexes
+- exits: (position, table byte after the move) for captures and promotions, which leave the table
+'''
+def analyseChunk(name,lo,hi):
+    gs,tablebases=workerState
+    table=Table(name)
+    pieces=table.pieces
+    codes=[color+('p' if kind=='P' else kind) for color,kind in pieces]
+    blackKing=next(i for i,(color,kind) in enumerate(pieces) if color=='b')
+    board=gs.board
+    kinds=bytearray(hi-lo)
+    counts=array.array('I',bytes(4*(hi-lo)))
+    targets=array.array('I')
+    exits=[]
+    placed=[(r,c) for r in range(8) for c in range(8) if board[r][c]!='--']  # the starting kings or the previous chunk's last position
+    for index in range(lo,hi):
+        squares,whiteToMove=table.decode(index)
+        if len(set(squares))<len(squares) or any(kind=='P' and sq//8 in (0,7) for (color,kind),sq in zip(pieces,squares)):
+            continue
+        for r,c in placed:
+            board[r][c]='--'
+        placed=[divmod(sq,8) for sq in squares]
+        locations={'w':set(),'b':set()}
+        for code,(r,c) in zip(codes,placed):
+            board[r][c]=code
+            locations[code[0]].add((r,c))
+        gs.pieceLocations=locations
+        gs.whiteKingLocation=placed[0]
+        gs.blackKingLocation=placed[blackKing]
+        gs.whiteToMove=whiteToMove
+        waiting=placed[blackKing] if whiteToMove else placed[0]
+        if gs.squareAttackedBy(waiting[0],waiting[1],'w' if whiteToMove else 'b'):
+            continue
+        moves=gs.getValidMoves()
+        local=index-lo
+        if not moves:
+            kinds[local]=2 if gs.checkMate else 3
+            continue
+        kinds[local]=1
+        slotAt={sq:slot for slot,sq in enumerate(squares)}
+        count=0
+        for move in moves:
+            after=list(squares)
+            after[slotAt[move.startRow*8+move.startCol]]=move.endRow*8+move.endCol
+            captured=slotAt.get(move.endRow*8+move.endCol)
+            if captured is None and not move.isPawnPromotion:
+                targets.append(table.index(after,not whiteToMove))
+                count+=1
+                continue
+            afterPieces=list(pieces)
+            if move.isPawnPromotion:
+                afterPieces[slotAt[move.startRow*8+move.startCol]]=(pieces[slotAt[move.startRow*8+move.startCol]][0],'Q')
+            if captured is not None:
+                del afterPieces[captured]
+                del after[captured]
+            value=tablebases.probeValue(afterPieces,after,not whiteToMove)
+            if value is None:
+                raise ValueError('%s needs a table for the material after %s'%(name,move.getChessNotation()))
+            exits.append((local,value))
+        counts[local]=count
+    return bytes(kinds),counts,targets,exits
+
+'''
+Distance to mate of every position from the move graph, by retrograde analysis: checkmates are lost in 0,
+positions with a move to a loss in n are won in n+1, positions whose moves all reach wins (the longest in n)
+are lost in n+1. Whatever is left unresolved is a draw. Returns the table bytes
+'''
+def solve(kinds,counts,targets,exitPositions,exitValues):
+    size=len(kinds)
+    plies=np.full(size,-1,dtype=np.int16)
+    sources=np.repeat(np.arange(size,dtype=np.int32),counts)
+    order=np.argsort(targets,kind='stable')
+    predecessors=sources[order]
+    starts=np.searchsorted(targets[order],np.arange(size+1))
+    exitPlies=exitValues.astype(np.int32)-1  # -1 for a draw
+    drawExit=np.zeros(size,dtype=bool)
+    drawExit[exitPositions[exitPlies<0]]=True
+    winningExit=(exitPlies>=0)&(exitPlies%2==0)  # the opponent is lost after the move
+    losingExit=exitPlies%2==1  # the opponent wins after the move
+    pending=counts.astype(np.int32)
+    np.add.at(pending,exitPositions[losingExit],1)
+    lastExit=int(exitPlies.max()) if len(exitPlies) else -1
+
+    def predecessorsOf(frontier):
+        lengths=starts[frontier+1]-starts[frontier]
+        total=int(lengths.sum())
+        if total==0:
+            return np.zeros(0,dtype=np.int32)
+        offsets=np.repeat(starts[frontier]-np.cumsum(lengths)+lengths,lengths)+np.arange(total)
+        return predecessors[offsets]
+
+    frontier=np.flatnonzero(kinds==2)
+    plies[frontier]=0
+    n=0
+    while (len(frontier) or n<=lastExit) and n<MAX_PLIES:
+        if n%2==0:#losses in n: every predecessor wins in n+1
+            candidates=np.concatenate((predecessorsOf(frontier),exitPositions[winningExit&(exitPlies==n)]))
+            candidates=np.unique(candidates)
+            candidates=candidates[plies[candidates]<0]
+        else:#wins in n: predecessors whose last move to a non-win just went are lost in n+1
+            decremented=np.concatenate((predecessorsOf(frontier),exitPositions[losingExit&(exitPlies==n)]))
+            np.subtract.at(pending,decremented,1)
+            candidates=np.unique(decremented)
+            candidates=candidates[(pending[candidates]==0)&(plies[candidates]<0)&~drawExit[candidates]]
+        plies[candidates]=n+1
+        frontier=candidates
+        n+=1
+    values=np.where(plies>=0,plies+1,DRAW).astype(np.uint8)
+    values[kinds==0]=INVALID
+    return values
+
+'''
+Build one table (its successor tables must already be in directory) over a process pool and write it.
+Returns the table bytes
+'''
+def generateTable(name,directory,executor,workers):
+    table=Table(name)
+    chunks=[(lo,min(lo+CHUNK,table.size)) for lo in range(0,table.size,CHUNK)]
+    kinds=bytearray()
+    counts=[]
+    targets=[]
+    exitPositions=[]
+    exitValues=[]
+    for (lo,hi),(chunkKinds,chunkCounts,chunkTargets,chunkExits) in zip(chunks,executor.map(
+            analyseChunk,[name]*len(chunks),[lo for lo,hi in chunks],[hi for lo,hi in chunks],
+            chunksize=max(1,len(chunks)//(4*workers)))):
+        kinds+=chunkKinds
+        counts.append(np.frombuffer(chunkCounts,dtype=np.uint32))
+        targets.append(np.frombuffer(chunkTargets,dtype=np.uint32))
+        exitPositions.extend(lo+local for local,value in chunkExits)
+        exitValues.extend(value for local,value in chunkExits)
+    values=solve(np.frombuffer(bytes(kinds),dtype=np.uint8),np.concatenate(counts),np.concatenate(targets).astype(np.int64),
+                 np.array(exitPositions,dtype=np.int64),np.array(exitValues,dtype=np.int64))
+    path=os.path.join(directory,name+EXTENSION)
+    with open(path+'.tmp','wb') as f:
+        f.write(HEADER.pack(MAGIC,name.encode(),table.size))
+        f.write(values.tobytes())
+    os.replace(path+'.tmp',path)
+    return values
+
+'''
+Win/draw/loss counts and the longest mate of a table
+'''
+def summary(values):
+    valid=values[values!=INVALID]
+    plies=valid[valid!=DRAW].astype(np.int32)-1
+    return {'positions':len(valid),'wins':int((plies%2==1).sum()),'draws':int((valid==DRAW).sum()),
+            'losses':int((plies%2==0).sum()),'longestMate':int(plies.max()) if len(plies) else 0}
+
+'''
+Generate the named tables and every table they depend on, skipping files that already exist
+'''
+def generate(names,directory,workers=1,out=sys.stdout):
+    os.makedirs(directory,exist_ok=True)
+    ordered=[]
+    def visit(name):
+        if name in ordered:
+            return
+        for successor in successorNames(name):
+            visit(successor)
+        ordered.append(name)
+    for name in names:
+        visit(materialName(*splitName(name))[0])
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,initializer=initWorker,initargs=(directory,)) as executor:
+        for name in ordered:
+            if os.path.exists(os.path.join(directory,name+EXTENSION)):
+                continue
+            start=time.perf_counter()
+            values=generateTable(name,directory,executor,workers)
+            stats=summary(values)
+            print('%-5s %9d positions  wins %8d  draws %8d  losses %8d  longest mate %3d plies  %.1fs'%(
+                  name,stats['positions'],stats['wins'],stats['draws'],stats['losses'],stats['longestMate'],
+                  time.perf_counter()-start),file=out)
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(description='Generate and probe endgame tablebases')
+    subparsers=parser.add_subparsers(dest='command',required=True)
+    build=subparsers.add_parser('generate',help='build tables and the tables they depend on')
+    build.add_argument('names',nargs='+',help='material sets, e.g. KQK KRK KPK KBNK')
+    build.add_argument('--dir',default='tablebases',help='directory of the table files')
+    build.add_argument('--workers',type=int,default=os.cpu_count() or 1,help='worker processes')
+    probe=subparsers.add_parser('probe',help='look a position up')
+    probe.add_argument('fen')
+    probe.add_argument('--dir',default='tablebases',help='directory of the table files')
+    args=parser.parse_args(argv)
+    if args.command=='generate':
+        generate(args.names,args.dir,args.workers)
+        return 0
+    gs=ChessEngine.GameState(fen=args.fen)
+    tablebases=Tablebases(args.dir)
+    start=time.perf_counter()
+    result=tablebases.probe(gs)
+    seconds=time.perf_counter()-start
+    if result is None:
+        print('not in the tables')
+        return 1
+    wdl,plies=result
+    best=tablebases.bestMove(gs)
+    print('%s%s  best move %s  (%.0f us)'%({1:'win',0:'draw',-1:'loss'}[wdl],' in %d plies'%plies if plies is not None else '',
+          best[0].getChessNotation() if best else '-',seconds*1e6))
+    return 0
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#fixed-size transposition table for the search
+#entries live in two flat arrays, so memory use is set once at construction and never grows
+
+from array import array
+
+EXACT,LOWER,UPPER=0,1,2  # bound types: exact score, score is at least (beta cutoff), score is at most (fail low)
+ENTRY_BYTES=16  # 8 bytes key + 8 bytes packed data
+SLOTS_PER_BUCKET=2  # slot 0 keeps the deepest result, slot 1 is always replaced
+SCORE_OFFSET=1<<31
+
+class TranspositionTable():
+    '''
+    Initialize the table.
+    - sizeMB: memory for the entries; rounded down to a power of two number of buckets
+    - keys[i]: Zobrist key of the position in slot i (0 = empty)
+    - data[i]: packed moveID (14 bits) | bound (2) | depth (8) | generation (8) | score + SCORE_OFFSET (32)
+    '''
+    def __init__(self,sizeMB=16):
+        buckets=max(1,int(sizeMB*1024*1024)//(ENTRY_BYTES*SLOTS_PER_BUCKET))
+        self.numBuckets=1<<(buckets.bit_length()-1)
+        self.mask=self.numBuckets-1
+        self.keys=array('Q',bytes(8*SLOTS_PER_BUCKET*self.numBuckets))
+        self.data=array('Q',bytes(8*SLOTS_PER_BUCKET*self.numBuckets))
+        self.generation=0
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes=0
+        self.hits=0
+        self.misses=0
+        self.collisions=0  # probes that found the bucket holding other positions
+        self.stores=0
+        self.overwrites=0  # stores that replaced a different position
+
+    '''
+    Drop every entry
+    '''
+    def clear(self):
+        size=len(self.keys)
+        self.keys=array('Q',bytes(8*size))
+        self.data=array('Q',bytes(8*size))
+        self.generation=0
+        self.resetStats()
+
+    '''
+    Start a new search: entries of older searches become the first to be replaced
+    '''
+    def newSearch(self):
+        self.generation=(self.generation+1)&255
+
+    '''
+    Look up a position. Returns (depth, score, bound, moveID) or None; moveID is 0 when no move was stored
+    '''
+    def probe(self,key):
+        self.probes+=1
+        i=(key&self.mask)*SLOTS_PER_BUCKET
+        keys=self.keys
+        for slot in (i,i+1):
+            if keys[slot]==key:
+                self.hits+=1
+                data=self.data[slot]
+                return ((data>>16)&255,(data>>32)-SCORE_OFFSET,(data>>14)&3,data&16383)
+        self.misses+=1
+        if keys[i] or keys[i+1]:
+            self.collisions+=1
+        return None
+
+    '''
+    Store a search result.
+    The depth-preferred slot takes it if it holds the same position, a shallower result or one from an older
+    search; otherwise it goes to the always-replace slot
+    '''
+    def store(self,key,depth,score,bound,moveID=0):
+        i=(key&self.mask)*SLOTS_PER_BUCKET
+        keys,data=self.keys,self.data
+        stored=data[i]
+        if keys[i]==key or keys[i]==0 or depth>=(stored>>16)&255 or (stored>>24)&255!=self.generation:
+            slot=i
+        else:
+            slot=i+1
+        if keys[slot]!=key and keys[slot]!=0:
+            self.overwrites+=1
+        self.stores+=1
+        keys[slot]=key
+        data[slot]=moveID|bound<<14|min(depth,255)<<16|self.generation<<24|(score+SCORE_OFFSET)<<32
+
+    '''
+    Fraction of slots in use, sampled over the first 1000 slots
+    '''
+    def fill(self):
+        sample=self.keys[:1000]
+        return sum(1 for key in sample if key)/len(sample)
+
+    def stats(self):
+        return {'sizeMB':len(self.keys)*ENTRY_BYTES/(1024*1024),'entries':len(self.keys),
+                'probes':self.probes,'hits':self.hits,'misses':self.misses,'collisions':self.collisions,
+                'stores':self.stores,'overwrites':self.overwrites,
+                'hitRate':self.hits/self.probes if self.probes else 0.0,'fill':self.fill()}
@@ -0,0 +1,119 @@
+#background engine work for the GUI
+#jobs run one at a time on a worker thread against a snapshot of the game and hand their results back
+#through a queue, so the pygame loop never waits on move generation or a search
+
+import queue
+import threading
+
+class Job():
+    '''
+    Initialize a job.
+    - kind: 'moves' (legal moves and the checkmate/stalemate flags), 'search' (the computer's move)
+      or 'ponder' (search on the opponent's time to fill the transposition table; it has no result)
+    - gs: the snapshot the job works on (GameState.copy(), never the GUI's own state)
+    - stopEvent: set by stop(); a search ends early and still reports its best move so far
+    - cancelled: set by cancel(); the job is stopped and its result is dropped
+    - result: filled in by the worker; (moves, checkMate, staleMate) for 'moves', the Move for 'search'
+    '''
+    def __init__(self,kind,gs):
+        self.kind=kind
+        self.gs=gs
+        self.stopEvent=threading.Event()
+        self.cancelled=threading.Event()
+        self.result=None
+
+    def stop(self):
+        self.stopEvent.set()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.stopEvent.set()
+
+
+class EngineWorker():
+    '''
+    Initialize the worker and start its thread.
+    - searcher: the ChessAI.Searcher used by 'search' and 'ponder' jobs (None if nobody needs it);
+      only the worker thread touches it once jobs are submitted
+    - jobs: jobs waiting to run, in order
+    - results: finished jobs that were not cancelled, read by poll()
+    - notify: called on the worker thread whenever a result is ready, e.g. to wake an event loop
+    '''
+    def __init__(self,searcher=None,notify=None):
+        self.searcher=searcher
+        self.notify=notify
+        self.jobs=queue.Queue()
+        self.results=queue.Queue()
+        self.pending=[]  # submitted jobs not yet collected, so cancelAll can reach them
+        self.lock=threading.Lock()
+        self.thread=threading.Thread(target=self.run,name='EngineWorker',daemon=True)
+        self.thread.start()
+
+    '''
+    Queue a job on a snapshot of gs. Returns the Job so the caller can stop or cancel it
+    '''
+    def submit(self,kind,gs):
+        job=Job(kind,gs.copy())
+        with self.lock:
+            self.pending.append(job)
+        self.jobs.put(job)
+        return job
+
+    '''
+    Cancel every job that hasn't been collected yet, e.g. because the position changed under them
+    '''
+    def cancelAll(self):
+        with self.lock:
+            for job in self.pending:
+                job.cancel()
+            self.pending=[]
+
+    '''
+    Finished jobs since the last call, without blocking
+    '''
+    def poll(self):
+        finished=[]
+        while True:
+            try:
+                job=self.results.get_nowait()
+            except queue.Empty:
+                return finished
+            with self.lock:
+                if job in self.pending:
+                    self.pending.remove(job)
+            if not job.cancelled.is_set():
+                finished.append(job)
+
+    def shutdown(self):
+        self.cancelAll()
+        self.jobs.put(None)
+        self.thread.join()
+
+    def run(self):
+        while True:
+            job=self.jobs.get()
+            if job is None:
+                return
+            if job.cancelled.is_set():
+                continue
+            if job.kind=='moves':
+                moves=job.gs.getValidMoves()
+                job.result=(moves,job.gs.checkMate,job.gs.staleMate)
+            else:
+                searcher=self.searcher
+                searcher.stopEvent=job.stopEvent
+                if job.kind=='search':
+                    job.result=searcher.search(job.gs)
+                else:
+                    info,searcher.info=searcher.info,None
+                    searcher.search(job.gs,timeLimit=float('inf'))
+                    searcher.info=info
+                searcher.stopEvent=None
+            if not job.cancelled.is_set():
+                self.results.put(job)
+                if self.notify is not None:
+                    self.notify()
+            else:
+                with self.lock:
+                    if job in self.pending:
+                        self.pending.remove(job)
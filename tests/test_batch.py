@@ -0,0 +1,48 @@
+import random
+import numpy as np
+import ChessBatch
+import ChessEngine
+import ChessPerft
+
+'''
+Positions from random games out of the reference positions, so the batch covers every phase of the game
+'''
+def samplePositions(count=60,seed=1):
+    rng=random.Random(seed)
+    states=[]
+    while len(states)<count:
+        gs=ChessEngine.GameState(fen=rng.choice(ChessPerft.POSITIONS)['fen'])
+        for ply in range(rng.randrange(40)):
+            moves=gs.getValidMoves()
+            if not moves:
+                break
+            gs.makeMove(rng.choice(moves))
+        states.append(gs)
+    return states
+
+def testEvaluateMatchesGameState():
+    states=samplePositions()
+    batch=ChessBatch.PositionBatch.fromStates(states)
+    assert batch.evaluate().tolist()==[gs.evaluate() for gs in states]
+
+def testFenEncodingMatchesStates():
+    states=samplePositions()
+    fens=[gs.getFen() for gs in states]
+    fromStates=ChessBatch.PositionBatch.fromStates(states)
+    fromFens=ChessBatch.PositionBatch.fromFens(fens)
+    assert np.array_equal(fromStates.planes,fromFens.planes)
+    assert np.array_equal(fromStates.clocks,fromFens.clocks)
+    assert fromFens.toFens()==fens
+
+def testAttacksMatchAttackMap():
+    states=samplePositions()
+    attacks=ChessBatch.PositionBatch.fromStates(states).attacks()
+    for gs,planes in zip(states,attacks):
+        counts=ChessEngine.AttackMap(gs.board).counts
+        assert planes.tolist()==[counts['w'],counts['b']]
+
+def testMobilityOfTheSideToMove():
+    states=samplePositions()
+    mobility=ChessBatch.PositionBatch.fromStates(states).mobility()
+    for gs,counts in zip(states,mobility):
+        assert counts[0 if gs.whiteToMove else 1]==len(gs.getAllPossibleMoves())
@@ -0,0 +1,55 @@
+import random
+import pytest
+import ChessBook
+import ChessPerft
+
+#the test positions of the Polyglot book format specification
+SPEC_KEYS=[
+    ([],0x463b96181691fc9c),
+    (['e2e4'],0x823c9b50fd114196),
+    (['e2e4','d7d5'],0x0756b94461c50fb0),
+    (['e2e4','d7d5','e4e5'],0x662fafb965db29d4),
+    (['e2e4','d7d5','e4e5','f7f5'],0x22a48b5a8e47ff78),
+    (['e2e4','d7d5','e4e5','f7f5','e1e2'],0x652a607ca3f242c1),
+    (['e2e4','d7d5','e4e5','f7f5','e1e2','e8f7'],0x00fdd303c946bdd9),
+    (['a2a4','b7b5','h2h4','b5b4','c2c4'],0x3c8123ea7b067637),
+    (['a2a4','b7b5','h2h4','b5b4','c2c4','b4c3','a1a3'],0x5c3f9b829b279560),
+]
+
+def playMoves(gs,notations):
+    for notation in notations:
+        move=next(move for move in gs.getValidMoves() if move.getChessNotation()==notation)
+        gs.makeMove(move)
+
+@pytest.mark.parametrize('backend',['list','bitboard'])
+@pytest.mark.parametrize('notations,key',SPEC_KEYS,ids=range(len(SPEC_KEYS)))
+def testSpecificationKeys(backend,notations,key):
+    gs=ChessPerft.newGameState(ChessPerft.POSITIONS[0]['fen'],backend=backend)
+    playMoves(gs,notations)
+    assert ChessBook.polyglotKey(gs)==key
+
+def testMatchesPythonChess():
+    chess=pytest.importorskip('chess')
+    import chess.polyglot
+    rng=random.Random(11)
+    for position in ChessPerft.POSITIONS:
+        gs=ChessPerft.newGameState(position['fen'])
+        for ply in range(60):
+            assert ChessBook.polyglotKey(gs)==chess.polyglot.zobrist_hash(chess.Board(gs.getFen())),gs.getFen()
+            moves=gs.getValidMoves()
+            if not moves:
+                break
+            gs.makeMove(rng.choice(moves))
+
+def testBuildAndLookup(tmp_path):
+    games=[({'Result':'1-0'},'1. e4 e5 2. Nf3 Nc6 1-0'),({'Result':'0-1'},'1. e4 c5 0-1'),({},'1. d4 d5 *')]
+    weights=ChessBook.collectMoves(games,plies=4)
+    path=tmp_path/'book.bin'
+    assert ChessBook.writeBook(weights,path)==len(weights)
+    gs=ChessPerft.newGameState(ChessPerft.POSITIONS[0]['fen'])
+    with ChessBook.OpeningBook(path) as book:
+        assert [(move.getChessNotation(),weight) for move,weight in book.lookup(gs)]==[('e2e4',2),('d2d4',1)]
+        playMoves(gs,['e2e4'])
+        assert [(move.getChessNotation(),weight) for move,weight in book.lookup(gs)]==[('c7c5',2)]
+        playMoves(gs,['a7a6'])
+        assert book.pickMove(gs) is None
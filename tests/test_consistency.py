@@ -0,0 +1,76 @@
+#random make/undo walks with every incrementally kept structure compared against a recompute from the board
+import random
+import pytest
+import ChessEngine
+import ChessEvaluation
+import ChessPerft
+
+FENS=[pos['fen'] for pos in ChessPerft.POSITIONS]
+
+def bitboardsFromBoard(board):
+    bitboards={color+kind:0 for color in 'wb' for kind in 'pRNBQK'}
+    for r in range(8):
+        for c in range(8):
+            if board[r][c]!='--':
+                bitboards[board[r][c]]|=1<<(r*8+c)
+    return bitboards
+
+def assertConsistent(gs):
+    assert gs.pieceLocationsMatchBoard()
+    assert (gs.material,gs.midgameScore,gs.endgameScore,gs.phase)==ChessEvaluation.computeTotals(gs.board)
+    assert gs.zobristKey==gs.computeZobristKey()
+    if gs.attackMap is not None:
+        assert gs.attackMap.matches(gs.board)
+    if hasattr(gs,'bitboards'):
+        assert gs.bitboards==bitboardsFromBoard(gs.board)
+
+'''
+Play random legal moves, taking some back on the way, and check the state after every step.
+Unwinding everything must give back the starting position exactly
+'''
+def randomWalk(gs,rng,steps=200):
+    startFen,startKey=gs.getFen(),gs.zobristKey
+    for step in range(steps):
+        moves=gs.getValidMoves()
+        if moves and (not gs.moveLog or rng.random()<0.75):
+            gs.makeMove(rng.choice(moves))
+        else:
+            gs.undoMove()
+        assertConsistent(gs)
+    while gs.moveLog:
+        gs.undoMove()
+    assertConsistent(gs)
+    assert gs.getFen()==startFen
+    assert gs.zobristKey==startKey
+
+@pytest.mark.parametrize('backend,trackAttacks',[('list',False),('list',True),('bitboard',False)],
+                         ids=['list','attackMap','bitboard'])
+@pytest.mark.parametrize('fen',FENS,ids=[pos['name'] for pos in ChessPerft.POSITIONS])
+def testRandomMakeUndo(backend,trackAttacks,fen):
+    rng=random.Random(fen)
+    for walk in range(3):
+        randomWalk(ChessPerft.newGameState(fen,trackAttacks,backend,checkConsistency=True),rng)
+
+def corruptAttackMap(gs):
+    gs.attackMap.counts['w'][3][3]+=1
+
+def corruptEvaluation(gs):
+    gs.material+=1
+
+def corruptPieceLists(gs):
+    gs.pieceLocations['w'].add((4,4))
+
+@pytest.mark.parametrize('corrupt,message',[(corruptAttackMap,'attack map'),(corruptEvaluation,'evaluation'),
+                                            (corruptPieceLists,'piece lists')])
+def testConsistencyModeCatchesCorruption(corrupt,message):
+    gs=ChessEngine.GameState(trackAttacks=True,checkConsistency=True)
+    move=gs.getValidMoves()[0]
+    corrupt(gs)
+    with pytest.raises(RuntimeError,match=message):
+        gs.makeMove(move)
+
+def testEvaluateIsFromTheSideToMove():
+    gs=ChessEngine.GameState(fen='4k3/8/8/8/8/8/8/3QK3 w - - 0 1')
+    assert gs.evaluate()>0
+    gs=ChessEngine.GameState(fen='4k3/8/8/8/8/8/8/3QK3 b - - 0 1')
+    assert gs.evaluate()<0
@@ -0,0 +1,68 @@
+import pytest
+import ChessPerft
+
+BACKENDS=['list','bitboard']
+
+def play(gs,notations):
+    for notation in notations:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation()==notation))
+
+def newGame(backend):
+    return ChessPerft.newGameState(ChessPerft.POSITIONS[0]['fen'],backend=backend)
+
+@pytest.mark.parametrize('backend',BACKENDS)
+def testThreefoldRepetition(backend):
+    gs=newGame(backend)
+    shuffle=['g1f3','g8f6','f3g1','f6g8']
+    play(gs,shuffle)
+    assert not gs.isThreefoldRepetition()
+    play(gs,shuffle)
+    assert gs.isThreefoldRepetition()
+    gs.undoMove()
+    assert not gs.isThreefoldRepetition()
+    play(gs,['f6g8'])
+    assert gs.isThreefoldRepetition()
+
+@pytest.mark.parametrize('backend',BACKENDS)
+def testFiftyMoveDraw(backend):
+    gs=newGame(backend)
+    play(gs,['e2e4','e7e5'])
+    play(gs,['g1f3','g8f6','f3g1','f6g8']*25)
+    gs.undoMove()
+    assert gs.halfmoveClock==99
+    assert not gs.isFiftyMoveDraw()
+    play(gs,['f6g8'])
+    assert gs.isFiftyMoveDraw()
+    gs.undoMove()
+    play(gs,['d7d6'])#a pawn move resets the clock
+    assert gs.halfmoveClock==0
+
+@pytest.mark.parametrize('backend',BACKENDS)
+def testEnpassantSquareOnlyCountsWhenItCanBeTaken(backend):
+    gs=newGame(backend)
+    play(gs,['e2e4'])#no black pawn can take on e3
+    key=gs.zobristKey
+    play(gs,['g8f6','g1f3','f6g8','f3g1'])
+    assert gs.zobristKey==key
+    assert gs.repetitionCounts[key]==2
+    gs=newGame(backend)
+    play(gs,['e2e4','g8f6','e4e5','d7d5'])#exd6 is possible
+    key=gs.zobristKey
+    play(gs,['g1f3','f6g8','f3g1','g8f6'])
+    assert gs.zobristKey!=key
+    assert gs.zobristKey==gs.computeZobristKey()
+
+@pytest.mark.parametrize('backend',BACKENDS)
+@pytest.mark.parametrize('fen,dead',[
+    ('8/8/4k3/8/8/3K4/8/8 w - - 0 1',True),
+    ('8/8/4k3/8/8/3K4/8/5B2 w - - 0 1',True),
+    ('8/8/4k3/8/8/3K4/8/6n1 w - - 0 1',True),
+    ('2b5/8/4k3/8/8/3K4/8/5B2 w - - 0 1',True),  # both bishops on light squares
+    ('1b6/8/4k3/8/8/3K4/8/5B2 w - - 0 1',False),
+    ('8/8/4k3/8/8/3K4/8/5NN1 w - - 0 1',False),
+    ('8/8/4k3/8/8/3K4/8/5BN1 w - - 0 1',False),
+    ('8/8/4k3/8/8/3K4/P7/8 w - - 0 1',False),
+    ('8/8/4k3/8/8/3K4/8/7R w - - 0 1',False)],ids=['KvK','KBvK','KvKN','sameColourBishops',
+    'oppositeBishops','KNNvK','KBNvK','KPvK','KRvK'])
+def testInsufficientMaterial(backend,fen,dead):
+    assert ChessPerft.newGameState(fen,backend=backend).isInsufficientMaterial()==dead
@@ -0,0 +1,43 @@
+import pytest
+import ChessBitboard
+import ChessEngine
+import ChessPerft
+
+FENS=[pos['fen'] for pos in ChessPerft.POSITIONS]+[
+    'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq e6 0 2',
+    '4k3/8/8/8/8/8/8/4K2R b K - 37 81',
+]
+
+@pytest.mark.parametrize('stateClass',[ChessEngine.GameState,ChessBitboard.BitboardGameState])
+@pytest.mark.parametrize('fen',FENS)
+def testRoundTrip(stateClass,fen):
+    gs=stateClass(fen=fen)
+    assert gs.getFen()==fen
+    assert stateClass(fen=gs.getFen()).zobristKey==gs.zobristKey
+
+def testInitialPosition():
+    assert ChessEngine.GameState().getFen()==ChessPerft.POSITIONS[0]['fen']
+
+def testMovesUpdateEveryField():
+    gs=ChessEngine.GameState()
+    for notation in ('e2e4','g8f6','g1f3'):
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation()==notation))
+    assert gs.getFen()=='rnbqkb1r/pppppppp/5n2/8/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 2 2'
+    gs.undoMove()
+    gs.undoMove()
+    assert gs.getFen()=='rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+
+def testCopyKeepsPositionAndHistory():
+    gs=ChessEngine.GameState(fen=ChessPerft.POSITIONS[1]['fen'])
+    gs.makeMove(gs.getValidMoves()[0])
+    snapshot=gs.copy()
+    assert snapshot.getFen()==gs.getFen()
+    assert snapshot.zobristKey==gs.zobristKey
+    snapshot.makeMove(snapshot.getValidMoves()[0])
+    assert snapshot.getFen()!=gs.getFen()
+
+@pytest.mark.parametrize('fen',['8/8/8/8 w - - 0 1','rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w',
+                                 'P3k3/8/8/8/8/8/8/4K3 w - - 0 1','4k3/8/8/8/8/8/8/p3K3 b - - 0 1'])
+def testBadFen(fen):
+    with pytest.raises((ValueError,KeyError,IndexError)):
+        ChessEngine.GameState(fen=fen)
@@ -0,0 +1,35 @@
+import concurrent.futures
+import pytest
+import ChessParallel
+import ChessPerft
+
+@pytest.fixture(scope='module')
+def executor():
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        yield executor
+
+@pytest.mark.parametrize('backend',['list','bitboard'])
+@pytest.mark.parametrize('index,depth',[(0,3),(1,2)],ids=['startpos-3','kiwipete-2'])
+def testParallelPerftMatchesPerft(executor,backend,index,depth):
+    fen=ChessPerft.POSITIONS[index]['fen']
+    gs=ChessPerft.newGameState(fen,backend=backend)
+    assert ChessParallel.parallelPerft(executor,gs,depth,backend)==ChessPerft.perft(gs,depth)==ChessPerft.POSITIONS[index]['nodes'][depth]
+
+def testPackedPositionKeepsTheRepetitionHistory():
+    gs=ChessPerft.newGameState(ChessPerft.POSITIONS[0]['fen'])
+    for notation in ['g1f3','g8f6','f3g1','f6g8','g1f3','g8f6','f3g1']:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation()==notation))
+    packed=ChessParallel.packPosition(gs)
+    copy=ChessParallel.unpackPosition(packed)
+    assert copy.getFen()==gs.getFen()
+    assert copy.zobristKey==gs.zobristKey
+    assert copy.repetitionCounts==gs.repetitionCounts
+    copy.makeMove(next(move for move in copy.getValidMoves() if move.getChessNotation()=='f6g8'))
+    assert copy.isThreefoldRepetition()
+
+@pytest.mark.parametrize('mode',['split','lazy'])
+def testParallelSearchReturnsALegalMove(executor,mode):
+    gs=ChessPerft.newGameState(ChessPerft.POSITIONS[1]['fen'])
+    notation,score,depth,nodes=ChessParallel.parallelSearch(executor,gs,2,timeLimit=30,maxDepth=2,mode=mode,ttSizeMB=1)
+    assert notation in [move.getChessNotation() for move in gs.getValidMoves()]
+    assert depth==2 and nodes>0
@@ -0,0 +1,29 @@
+import pytest
+import ChessBitboard
+import ChessPerft
+
+MAX_NODES=100000  # keeps the suite quick; python ChessPerft.py --depth 5 runs the deep counts
+
+CASES=[(pos['name'],pos['fen'],depth,nodes) for pos in ChessPerft.POSITIONS
+       for depth,nodes in sorted(pos['nodes'].items()) if nodes<=MAX_NODES]
+
+@pytest.mark.parametrize('backend,trackAttacks',[('list',False),('list',True),('bitboard',False)],
+                         ids=['list','attackMap','bitboard'])
+@pytest.mark.parametrize('name,fen,depth,nodes',CASES,ids=['%s-%d'%(case[0],case[2]) for case in CASES])
+def testPerft(backend,trackAttacks,name,fen,depth,nodes):
+    assert ChessPerft.perft(ChessPerft.newGameState(fen,trackAttacks,backend),depth)==nodes
+
+def testDivideSumsToPerft():
+    results=ChessPerft.divide(ChessPerft.newGameState(ChessPerft.POSITIONS[1]['fen']),2)
+    assert len(results)==48
+    assert sum(nodes for notation,nodes in results)==2039
+
+def testPawnOnLastRankHasNoMoves():
+    gs=ChessBitboard.BitboardGameState()
+    board=[['--']*8 for i in range(8)]
+    board[0][4],board[7][4]='bK','wK'
+    board[0][0],board[7][7]='wp','bp'
+    gs.board=board
+    assert all((move.startRow,move.startCol)!=(0,0) for move in gs.getValidMoves())
+    gs.whiteToMove=False
+    assert all((move.startRow,move.startCol)!=(7,7) for move in gs.getValidMoves())
@@ -0,0 +1,82 @@
+import io
+import ChessEngine
+import ChessPGN
+
+ARCHIVE='''[Event "Scholar's mate"]
+[Result "1-0"]
+
+1. e4 e5 2. Bc4 {attacking f7} Nc6 3. Qh5 Nf6?? (3... g6 4. Qf3) 4. Qxf7# 1-0
+
+[Event "From a FEN"]
+[FEN "4k3/8/8/8/8/8/8/R3K3 w Q - 0 1"]
+[Result "*"]
+
+1. O-O-O Kf7 *
+
+[Event "Illegal"]
+[Result "*"]
+
+1. e4 e5 2. Ke3 *
+
+[Event "Ambiguous"]
+[FEN "4k3/8/8/8/8/8/4K3/R6R w - - 0 1"]
+[Result "*"]
+
+1. Rd1 *
+
+[Event "Underpromotion"]
+[FEN "4k3/P7/8/8/8/8/8/4K3 w - - 0 1"]
+[Result "*"]
+
+1. a8=N *
+
+[Event "Bad FEN"]
+[FEN "not a fen"]
+[Result "*"]
+
+1. e4 *
+'''
+
+def validate(text):
+    return list(ChessPGN.validateGames(ChessPGN.readGames(io.StringIO(text))))
+
+def testReadGames():
+    games=list(ChessPGN.readGames(io.StringIO(ARCHIVE)))
+    assert len(games)==6
+    assert games[0][0]=={'Event':"Scholar's mate",'Result':'1-0'}
+
+def testParseMovetextSkipsCommentsAndVariations():
+    sans,result=ChessPGN.parseMovetext('1. e4 {best} e5 (1... c5 2. Nf3) 2. Nf3 $1 Nc6 1/2-1/2')
+    assert sans==['e4','e5','Nf3','Nc6']
+    assert result=='1/2-1/2'
+
+def testGoodGames():
+    records=validate(ARCHIVE)
+    mate,castle=records[0],records[1]
+    assert (mate['status'],mate['plies'],mate['termination'],mate['result'])==('ok',7,'checkmate','1-0')
+    assert castle['status']=='ok'
+    assert castle['fen']=='8/5k2/8/8/8/8/8/2KR4 w - - 2 2'
+
+def testBadGames():
+    records=validate(ARCHIVE)
+    assert [(record['status'],record.get('error'),record.get('ply')) for record in records[2:5]]==[
+        ('illegal','Ke3',2),('ambiguous','Rd1',0),('unsupported','a8=N',0)]
+    assert records[5]['status']=='fen'
+
+def testWorkerPoolKeepsArchiveOrder():
+    games=list(ChessPGN.readGames(io.StringIO(ARCHIVE)))*3
+    serial=list(ChessPGN.validateGames(games))
+    parallel=list(ChessPGN.validateGames(games,workers=2,chunkSize=2))
+    assert parallel==serial
+
+def testEngineFailureIsRecordedAndTheRunGoesOn(monkeypatch):
+    makeMove=ChessEngine.GameState.makeMove
+    def failOnKe2(gs,move):
+        if move.getChessNotation()=='e1e2' and move.pieceMoved=='wK':
+            raise RuntimeError('engine bug')
+        makeMove(gs,move)
+    monkeypatch.setattr(ChessEngine.GameState,'makeMove',failOnKe2)
+    records=validate(ARCHIVE.replace('2. Ke3','2. Ke2'))
+    assert len(records)==6
+    assert (records[2]['status'],records[2]['error'],records[2]['ply'])==('error','RuntimeError: engine bug',2)
+    assert records[0]['status']=='ok' and records[3]['status']=='ambiguous'
@@ -0,0 +1,41 @@
+import pytest
+import ChessBitboard
+import ChessEngine
+import ChessPerft
+import ChessProfile
+
+@pytest.fixture(autouse=True)
+def profilingOff():
+    yield
+    ChessProfile.disable()
+
+def testEnableWrapsAndDisableRestores():
+    before={(owner,attribute):vars(owner).get(attribute) for owner,attribute,category in ChessProfile.HOOKS}
+    ChessProfile.enable()
+    assert ChessProfile.isEnabled()
+    for (owner,attribute),original in before.items():
+        if original is not None:
+            assert vars(owner)[attribute] is not original
+    ChessProfile.disable()
+    assert not ChessProfile.isEnabled()
+    assert {(owner,attribute):vars(owner).get(attribute) for owner,attribute,category in ChessProfile.HOOKS}==before
+
+def testBitboardMoveGeneratorIsHooked():
+    hooked={(owner,attribute) for owner,attribute,category in ChessProfile.HOOKS}
+    for attribute in ('getValidMoves','getValidMovesFrom','generateMoves','makeMove','undoMove'):
+        assert (ChessBitboard.BitboardGameState,attribute) in hooked
+
+@pytest.mark.parametrize('backend,owner',[('list','GameState'),('bitboard','BitboardGameState')])
+def testReportCountsCalls(backend,owner):
+    gs=ChessPerft.newGameState(ChessPerft.POSITIONS[0]['fen'],backend=backend)
+    with ChessProfile.profiled():
+        assert ChessPerft.perft(gs,2)==400
+    functions=ChessProfile.report()['functions']
+    assert functions[owner+'.getValidMoves']['calls']==21
+    assert functions[owner+'.makeMove']['calls']==functions[owner+'.undoMove']['calls']==20
+    if backend=='bitboard':
+        assert functions['BitboardGameState.generateMoves']['callers']=={'BitboardGameState.getValidMoves':21}
+    assert ChessProfile.report()['generations']==21
+    ChessProfile.reset()
+    assert ChessProfile.report()['functions']=={}
+    assert not hasattr(ChessEngine.GameState.makeMove,'__wrapped__')
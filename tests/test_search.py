@@ -0,0 +1,54 @@
+import pytest
+import ChessAI
+import ChessPerft
+
+BACKENDS=['list','bitboard']
+FOOLS_MATE=['f2f3','e7e5','g2g4']  # Black mates in 1 with Qh4
+QUEEN_CHECK=['b1a3','f7f5','e2e4','h7h6']  # White mates in 2: Qh5+ g6 Qxg6
+STALEMATE=['e2e3','a7a5','d1h5','a8a6','h5a5','h7h5','h2h4','a6h6','a5c7','f7f6','c7d7','e8f7','d7b7','d8d3',
+           'b7b8','d3h7','b8c8','f7g6','c8e6']  # the shortest known stalemate, Black to move
+
+def position(notations,backend):
+    gs=ChessPerft.newGameState(ChessPerft.POSITIONS[0]['fen'],backend=backend)
+    for notation in notations:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getChessNotation()==notation))
+    return gs
+
+def searcher(maxDepth):
+    return ChessAI.Searcher(timeLimit=60,maxDepth=maxDepth,ttSizeMB=1)
+
+@pytest.mark.parametrize('backend',BACKENDS)
+@pytest.mark.parametrize('notations,best,plies',[(FOOLS_MATE,'d8h4',1),(QUEEN_CHECK,'d1h5',3)],ids=['mateIn1','mateIn2'])
+def testFindsMate(backend,notations,best,plies):
+    gs=position(notations,backend)
+    search=searcher(5)
+    assert search.search(gs).getChessNotation()==best
+    assert search.score==ChessAI.CHECKMATE-plies
+    assert search.depth<5#a mate ends iterative deepening
+
+@pytest.mark.parametrize('backend',BACKENDS)
+def testSearchLeavesThePositionAsItWas(backend):
+    gs=ChessPerft.newGameState(ChessPerft.POSITIONS[1]['fen'],backend=backend)
+    gs.makeMove(gs.getValidMoves()[0])
+    fen,key,plies=gs.getFen(),gs.zobristKey,len(gs.moveLog)
+    assert searcher(3).search(gs) is not None
+    assert (gs.getFen(),gs.zobristKey,len(gs.moveLog))==(fen,key,plies)
+    assert not gs.checkMate and not gs.staleMate
+
+@pytest.mark.parametrize('backend',BACKENDS)
+def testRootMoveIDsLimitTheRootMoves(backend):
+    gs=position(FOOLS_MATE,backend)
+    allowed=[move.moveID for move in gs.getValidMoves() if move.getChessNotation() in ('b8c6','g8f6','a7a6')]
+    search=searcher(3)
+    assert search.search(gs,rootMoveIDs=allowed).moveID in allowed
+    assert search.score<ChessAI.CHECKMATE-ChessAI.MAX_PLY
+
+@pytest.mark.parametrize('backend',BACKENDS)
+@pytest.mark.parametrize('notations',[FOOLS_MATE+['d8h4'],STALEMATE],ids=['checkmate','stalemate'])
+def testNoMoveWhenTheGameIsOver(backend,notations):
+    gs=position(notations,backend)
+    gs.getValidMoves()
+    checkMate,staleMate=gs.checkMate,gs.staleMate
+    assert checkMate or staleMate
+    assert searcher(3).search(gs) is None
+    assert (gs.checkMate,gs.staleMate)==(checkMate,staleMate)
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+import ChessServer
+
+'''
+Run coroutine(client) against a GameServer on a Unix socket and return its result
+'''
+def withServer(tmp_path,coroutine,**options):
+    async def main():
+        server=ChessServer.GameServer(**options)
+        path=str(tmp_path/'server.sock')
+        listener=await asyncio.start_unix_server(server.handleConnection,path=path)
+        try:
+            client=await ChessServer.Client.connect(unixPath=path)
+            try:
+                return await coroutine(client)
+            finally:
+                await client.close()
+        finally:
+            listener.close()
+            await listener.wait_closed()
+            server.close()
+    return asyncio.run(main())
+
+def testPlayAndUndo(tmp_path):
+    async def play(client):
+        session=(await client.request('new'))['session']
+        assert len((await client.request('moves',session=session))['moves'])==20
+        response=await client.request('move',session=session,move='e2e4')
+        assert response['fen']=='rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1'
+        with pytest.raises(ChessServer.ProtocolError,match='illegal'):
+            await client.request('move',session=session,move='e2e4')
+        response=await client.request('undo',session=session)
+        assert response['plies']==0
+        response=await client.request('new',fen='7k/5Q2/6K1/8/8/8/8/8 w - - 0 1')
+        response=await client.request('move',session=response['session'],move='f7g7')
+        return response['status']
+    assert withServer(tmp_path,play,workers=0)=='checkmate'
+
+'''
+Many searches in flight at once must each get their own answer, whether they run on the thread pool
+(workers=0) or in search processes
+'''
+@pytest.mark.parametrize('workers',[0,1])
+def testConcurrentSearches(tmp_path,workers):
+    fens=['r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+          '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+          'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+          '6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1']
+    async def search(client):
+        sessions=[(await client.request('new',fen=fens[i%len(fens)]))['session'] for i in range(20)]
+        legal=[set((await client.request('moves',session=session))['moves']) for session in sessions]
+        answers=await asyncio.gather(*(client.request('go',session=session,depth=2,time=30) for session in sessions))
+        return legal,answers
+    legal,answers=withServer(tmp_path,search,threads=4,workers=workers)
+    for i,(moves,answer) in enumerate(zip(legal,answers)):
+        assert answer['move'] in moves
+        if i%len(fens)==3:#the search stops at the back rank mate it finds at depth 1
+            assert answer['move']=='d1d8'
+        else:
+            assert answer['depth']==2
+
+def testFailedNewLeavesNoSession(tmp_path,monkeypatch):
+    def broken(gs):
+        raise RuntimeError('generator failed')
+    async def create(client):
+        monkeypatch.setattr(ChessServer,'legalMoves',broken)
+        with pytest.raises(ChessServer.ProtocolError,match='generator failed'):
+            await client.request('new')
+        monkeypatch.undo()
+        return (await client.request('stats'))['sessions']
+    assert withServer(tmp_path,create,workers=0)==0
+
+def testGoRejectsDepthBelowOne(tmp_path):
+    async def go(client):
+        session=(await client.request('new'))['session']
+        with pytest.raises(ChessServer.ProtocolError,match='depth'):
+            await client.request('go',session=session,depth=0)
+        return (await client.request('go',session=session,depth=1))['depth']
+    assert withServer(tmp_path,go,workers=0)==1
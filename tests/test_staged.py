@@ -0,0 +1,53 @@
+import pytest
+import ChessEngine
+import ChessPerft
+from ChessEngine import captureOrder
+
+KIWIPETE=ChessPerft.POSITIONS[1]['fen']
+
+def notations(moves):
+    return [move.getChessNotation() for move in moves]
+
+def byNotation(gs,notation):
+    return next(move for move in gs.getValidMoves() if move.getChessNotation()==notation)
+
+def isCapture(move):
+    return move.pieceCaptured!='--' or move.isPawnPromotion
+
+@pytest.mark.parametrize('backend',['list','bitboard'])
+def testStageOrder(backend):
+    gs=ChessPerft.newGameState(KIWIPETE,backend=backend)
+    valid=gs.getValidMoves()
+    hashMove,killers=byNotation(gs,'a1b1'),[byNotation(gs,'e1f1'),byNotation(gs,'g2g3')]
+    staged=list(gs.getStagedMoves(hashMove.moveID,killers,{('wK',7,3):5}))
+    assert len(staged)==len(valid)
+    assert sorted(move.moveID for move in staged)==sorted(move.moveID for move in valid)
+    assert staged[0] is hashMove
+    captures=[move for move in valid if isCapture(move)]
+    assert all(isCapture(move) for move in staged[1:1+len(captures)])
+    scores=[captureOrder(move) for move in staged[1:1+len(captures)]]
+    assert scores==sorted(scores,reverse=True)
+    assert notations(staged[1+len(captures):4+len(captures)])==['e1f1','g2g3','e1d1']#killers, then by history
+    assert not any(isCapture(move) for move in staged[3+len(captures):])
+
+@pytest.mark.parametrize('backend',['list','bitboard'])
+def testCaptureHashMoveIsNotRepeated(backend):
+    gs=ChessPerft.newGameState(KIWIPETE,backend=backend)
+    hashMove=byNotation(gs,'e5f7')
+    staged=list(gs.getStagedMoves(hashMove.moveID))
+    assert staged[0] is hashMove
+    assert notations(staged).count('e5f7')==1
+    assert len(staged)==48
+
+@pytest.mark.parametrize('backend',['list','bitboard'])
+def testStaleHashMoveAndKillersAreIgnored(backend):
+    gs=ChessPerft.newGameState(KIWIPETE,backend=backend)
+    plain=notations(gs.getStagedMoves())
+    other=ChessPerft.newGameState(ChessPerft.POSITIONS[0]['fen'],backend=backend)
+    staleKiller=byNotation(other,'g1f3')#no knight on g1 here
+    blocked=7*1000+0*100+0*10+0  # a1a8 through the a2 pawn
+    emptySquare=5*1000+6*100+4*10+6  # g3g4, g3 is empty
+    blackPiece=0*1000+0*100+0*10+1  # a8b8 is Black's, White is to move
+    for hashMoveID in (blocked,emptySquare,blackPiece):
+        assert notations(gs.getStagedMoves(hashMoveID,[staleKiller,None]))==plain
+    assert len(plain)==48 and len(set(plain))==48
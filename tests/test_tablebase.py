@@ -0,0 +1,104 @@
+#regenerates KQK and KRK and checks every table byte against the positions one move later
+import pytest
+import ChessAI
+import ChessEngine
+import ChessTablebase
+
+@pytest.fixture(scope='module')
+def tablebases(tmp_path_factory):
+    directory=str(tmp_path_factory.mktemp('tablebases'))
+    ChessTablebase.generate(['KQK','KRK'],directory,workers=1)
+    tablebases=ChessTablebase.Tablebases(directory)
+    yield tablebases
+    tablebases.close()
+
+def positionFen(table,squares,whiteToMove):
+    board=[['1']*8 for i in range(8)]
+    for (color,kind),sq in zip(table.pieces,squares):
+        board[sq//8][sq%8]=kind if color=='w' else kind.lower()
+    ranks=[]
+    for row in board:
+        rank=''.join(row)
+        for empty in range(8,1,-1):
+            rank=rank.replace('1'*empty,str(empty))
+        ranks.append(rank)
+    return '/'.join(ranks)+(' w' if whiteToMove else ' b')+' - - 0 1'
+
+'''
+The table byte a position must have given its legal moves: mated is lost in 0, a move to a lost position
+wins one ply after the quickest such loss, a move to a draw draws, and otherwise the position is lost one
+ply after the slowest win
+'''
+def expectedValue(tablebases,gs):
+    moves=gs.getValidMoves()
+    if not moves:
+        return 1 if gs.checkMate else ChessTablebase.DRAW
+    results=[]
+    for move in moves:
+        gs.makeMove(move)
+        results.append(tablebases.probe(gs))
+        gs.undoMove()
+    if None in results:#a successor the tables don't cover: no byte is right
+        return None
+    losses=[plies for wdl,plies in results if wdl<0]
+    if losses:
+        return min(losses)+2
+    if any(wdl==0 for wdl,plies in results):
+        return ChessTablebase.DRAW
+    return max(plies for wdl,plies in results)+2
+
+@pytest.mark.parametrize('name',['KQK','KRK'])
+def testEveryEntryMatchesItsSuccessors(tablebases,name):
+    table=tablebases.table(name)
+    wrong=[]
+    for index in range(table.size):
+        squares,whiteToMove=table.decode(index)
+        value=table.value(index)
+        if len(set(squares))<len(squares):
+            expected=ChessTablebase.INVALID
+        else:
+            gs=ChessEngine.GameState(fen=positionFen(table,squares,whiteToMove))
+            waiting=gs.blackKingLocation if whiteToMove else gs.whiteKingLocation
+            if gs.squareAttackedBy(waiting[0],waiting[1],'w' if whiteToMove else 'b'):
+                expected=ChessTablebase.INVALID
+            else:
+                expected=expectedValue(tablebases,gs)
+        if value!=expected:
+            wrong.append((index,value,expected))
+    assert wrong==[]
+
+@pytest.mark.parametrize('fen,result',[
+    ('Q7/8/8/8/3K4/8/8/2k5 b - - 0 1',(-1,8)),
+    ('8/8/k7/4K3/8/8/8/7R w - - 0 1',(1,15)),
+    ('k7/1Q6/1K6/8/8/8/8/8 b - - 0 1',(-1,0)),
+    ('8/8/8/8/8/2k5/8/K6q w - - 0 1',(-1,4)),
+    ('k7/2Q5/1K6/8/8/8/8/8 b - - 0 1',(0,None)),
+])
+def testProbe(tablebases,fen,result):
+    assert tablebases.probe(ChessEngine.GameState(fen=fen))==result
+
+def testBestMoveMates(tablebases):
+    gs=ChessEngine.GameState(fen='k7/8/1K6/8/8/8/8/6Q1 w - - 0 1')
+    move,wdl,plies=tablebases.bestMove(gs)
+    assert (wdl,plies)==(1,1)
+    gs.makeMove(move)
+    gs.getValidMoves()
+    assert gs.checkMate
+
+def testTablebaseScoresAreMates():
+    searcher=ChessAI.Searcher(ttSizeMB=0)
+    for wdl in (1,-1):
+        for ply in (0,1,ChessAI.MAX_PLY):
+            for plies in (0,ChessAI.MAX_PLY,ChessTablebase.MAX_PLIES):
+                score=searcher.tablebaseScore(wdl,plies,ply)
+                assert abs(score)>=ChessAI.MATE_BOUND
+                assert ChessAI.scoreToTT(score,ply)==searcher.tablebaseScore(wdl,plies,0)
+                assert ChessAI.scoreFromTT(ChessAI.scoreToTT(score,ply),1)==searcher.tablebaseScore(wdl,plies,1)
+
+def testSearchStopsOnTablebaseMate(tablebases):
+    gs=ChessEngine.GameState(fen='k7/8/8/8/8/8/n7/R3K3 w - - 0 1')
+    searcher=ChessAI.Searcher(timeLimit=60,maxDepth=8,tablebases=tablebases)
+    move=searcher.search(gs)
+    assert move.getChessNotation()=='a1a2'
+    assert searcher.score>=ChessAI.MATE_BOUND
+    assert searcher.depth<8
@@ -0,0 +1,56 @@
+import ChessTranspositionTable
+from ChessTranspositionTable import EXACT,LOWER,UPPER
+
+KEY=0x9d39247e33776d41
+
+def sameBucket(tt,n):
+    return KEY+n*tt.numBuckets  # keys that differ only above the index bits
+
+def testStoreAndProbeRoundTrip():
+    tt=ChessTranspositionTable.TranspositionTable(1)
+    for depth,score,bound,moveID in [(5,-1234,LOWER,6444),(0,99990,EXACT,0),(255,-99990,UPPER,7777)]:
+        tt.store(KEY,depth,score,bound,moveID)
+        assert tt.probe(KEY)==(depth,score,bound,moveID)
+    assert tt.probe(KEY+1) is None
+
+def testDepthPreferredSlotSurvivesShallowerCollisions():
+    tt=ChessTranspositionTable.TranspositionTable(1)
+    deep,shallow,other=KEY,sameBucket(tt,1),sameBucket(tt,2)
+    tt.store(deep,6,10,EXACT)
+    tt.store(shallow,2,20,EXACT)
+    assert tt.probe(deep)==(6,10,EXACT,0)
+    assert tt.probe(shallow)==(2,20,EXACT,0)
+    tt.store(other,3,30,EXACT)#the always-replace slot goes
+    assert tt.probe(shallow) is None
+    assert tt.probe(other)==(3,30,EXACT,0)
+    assert tt.probe(deep)==(6,10,EXACT,0)
+    assert tt.overwrites==1
+    tt.store(shallow,7,40,LOWER)#deeper than the preferred slot: it takes that one
+    assert tt.probe(shallow)==(7,40,LOWER,0)
+    assert tt.probe(deep) is None
+
+def testNewSearchAgesTheDepthPreferredSlot():
+    tt=ChessTranspositionTable.TranspositionTable(1)
+    tt.store(KEY,8,10,EXACT)
+    tt.store(sameBucket(tt,1),1,20,EXACT)
+    assert tt.probe(KEY) is not None
+    tt.newSearch()
+    tt.store(sameBucket(tt,2),1,30,EXACT)#an entry of the previous search is replaced even though it is deeper
+    assert tt.probe(KEY) is None
+    assert tt.probe(sameBucket(tt,2))==(1,30,EXACT,0)
+    for i in range(255):
+        tt.newSearch()
+    assert tt.generation==0
+
+def testStatsCountHitsMissesAndCollisions():
+    tt=ChessTranspositionTable.TranspositionTable(1)
+    tt.store(KEY,4,0,EXACT)
+    tt.probe(KEY)
+    tt.probe(sameBucket(tt,1))#a miss in an occupied bucket
+    tt.probe(KEY+1)#a miss in an empty bucket
+    stats=tt.stats()
+    assert (stats['probes'],stats['hits'],stats['misses'],stats['collisions'],stats['stores'])==(3,1,2,1,1)
+    assert stats['hitRate']==1/3
+    tt.clear()
+    assert tt.probe(KEY) is None
+    assert tt.stats()['hits']==0
@@ -0,0 +1,75 @@
+import threading
+import time
+import ChessAI
+import ChessEngine
+import ChessWorker
+
+TIMEOUT=30  # seconds a test waits for the worker before failing instead of hanging
+
+class Notified():
+    def __init__(self):
+        self.event=threading.Event()
+
+    def __call__(self):
+        self.event.set()
+
+    '''
+    Finished jobs, waiting for the worker to report at least one
+    '''
+    def collect(self,worker):
+        assert self.event.wait(TIMEOUT)
+        self.event.clear()
+        return worker.poll()
+
+def newWorker(maxDepth=ChessAI.MAX_PLY):
+    notified=Notified()
+    worker=ChessWorker.EngineWorker(ChessAI.Searcher(timeLimit=0.2,maxDepth=maxDepth,ttSizeMB=1),notify=notified)
+    return worker,notified
+
+def testMovesAndSearchJobsWorkOnASnapshot():
+    worker,notified=newWorker(maxDepth=2)
+    try:
+        gs=ChessEngine.GameState()
+        moves=worker.submit('moves',gs)
+        search=worker.submit('search',gs)
+        gs.makeMove(gs.getValidMoves()[0])#the jobs don't see this
+        finished=[]
+        while len(finished)<2:
+            finished+=notified.collect(worker)
+        assert finished==[moves,search]
+        assert len(moves.result[0])==20 and moves.result[1:]==(False,False)
+        assert search.result in moves.result[0]
+        assert worker.poll()==[]
+    finally:
+        worker.shutdown()
+
+def testCancelAllDropsStaleJobs():
+    worker,notified=newWorker()
+    try:
+        gs=ChessEngine.GameState()
+        ponder=worker.submit('ponder',gs)
+        stale=worker.submit('moves',gs)
+        time.sleep(0.1)
+        worker.cancelAll()
+        assert ponder.cancelled.is_set() and ponder.stopEvent.is_set() and stale.cancelled.is_set()
+        gs.makeMove(gs.getValidMoves()[0])
+        fresh=worker.submit('moves',gs)
+        assert notified.collect(worker)==[fresh]
+        assert stale.result is None
+        assert len(fresh.result[0])==20
+    finally:
+        worker.shutdown()
+
+def testPonderRunsUntilStopped():
+    worker,notified=newWorker()
+    try:
+        ponder=worker.submit('ponder',ChessEngine.GameState())
+        assert not notified.event.wait(0.5)#far past the searcher's 0.2 s limit
+        ponder.stop()
+        assert notified.collect(worker)==[ponder]
+        assert ponder.result is None
+        assert worker.searcher.stopEvent is None
+        assert worker.searcher.timeLimit==0.2
+    finally:
+        worker.shutdown()
+    assert not worker.thread.is_alive()